@@ -0,0 +1,127 @@
+"""Vendor response decoding benchmark.
+
+Builds synthetic Apollo and HIBP payloads of realistic shape (long descriptions, many
+unused fields) and times the current path (json / iter_json_array) against orjson and
+the typed, field-projected utils.fast_json decoders, with each one's peak allocation.
+
+    python benchmarks/json_decode.py [--rounds 20] [--people 100] [--breaches 900]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from models.responses import ApolloOrganizationResponse, ApolloPeopleSearch, HibpCatalogue  # noqa: E402
+from utils import fast_json  # noqa: E402
+from utils.json_stream import iter_json_array  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20
+
+
+def _organization(i: int) -> dict:
+    return {
+        "id": f"org{i:08d}", "name": f"Company {i}", "website_url": f"https://company{i}.com",
+        "primary_domain": f"company{i}.com", "domain": f"company{i}.com", "industry": "retail",
+        "estimated_num_employees": 1000 + i, "short_description": FILLER,
+        "keywords": [f"keyword{k}" for k in range(40)],
+        "technology_names": [f"tech{k}" for k in range(60)],
+        "current_technologies": [{"uid": f"t{k}", "name": f"tech{k}", "category": "Analytics"}
+                                 for k in range(60)],
+        "departmental_head_count": {f"dept{k}": k for k in range(20)},
+        "funding_events": [{"id": f"f{k}", "date": "2021-01-01", "news_url": FILLER[:80]} for k in range(5)],
+    }
+
+
+def _person(i: int) -> dict:
+    return {
+        "id": f"p{i:08d}", "name": f"Person {i}", "first_name": "Person", "last_name": str(i),
+        "title": "Chief Information Security Officer", "email": f"person{i}@example.com",
+        "linkedin_url": f"https://linkedin.com/in/person{i}", "headline": FILLER[:200],
+        "phone_numbers": [{"raw_number": "+1 555 0100", "number": "+15550100", "type": "work"}],
+        "employment_history": [{"organization_name": f"Company {k}", "title": "Engineer",
+                                "description": FILLER} for k in range(6)],
+        "organization": _organization(i),
+    }
+
+
+def _breach(i: int) -> dict:
+    return {
+        "Name": f"Breach{i}", "Title": f"Breach {i}", "Domain": f"company{i}.com",
+        "BreachDate": "2024-03-01", "AddedDate": "2024-04-01T00:00:00Z",
+        "ModifiedDate": "2024-04-01T00:00:00Z", "PwnCount": 100000 + i,
+        "Description": FILLER * 2, "LogoPath": f"https://haveibeenpwned.com/Content/Images/{i}.png",
+        "DataClasses": ["Email addresses", "Names", "Passwords"],
+        "IsVerified": True, "IsFabricated": False, "IsSensitive": False, "IsRetired": False,
+        "IsSpamList": False, "IsMalware": False, "IsSubscriptionFree": False,
+    }
+
+
+def payloads(people: int, breaches: int):
+    return {
+        "apollo organizations/enrich": (
+            json.dumps({"organization": _organization(0)}).encode(), ApolloOrganizationResponse, False),
+        "apollo mixed_people/search": (
+            json.dumps({"people": [_person(i) for i in range(people)],
+                        "pagination": {"page": 1, "per_page": people}}).encode(), ApolloPeopleSearch, False),
+        "hibp breaches": (
+            json.dumps([_breach(i) for i in range(breaches)]).encode(), HibpCatalogue, True),
+    }
+
+
+def measure(decode, data: bytes, rounds: int):
+    """(median ms per decode, peak MiB allocated during one decode)"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        decode(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    result = decode(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return statistics.median(timings), peak / 2 ** 20
+
+
+def decoders(schema, streamed: bool):
+    if streamed:
+        # The current HIBP path: the streamed body, 64 KiB at a time
+        yield "iter_json_array (current)", lambda data: list(
+            iter_json_array(data[i:i + 65536] for i in range(0, len(data), 65536)))
+    else:
+        yield "json.loads (current)", json.loads
+    if orjson is not None:
+        yield "orjson", orjson.loads
+    if fast_json.PROJECTS:
+        yield "fast_json typed", lambda data: fast_json.loads(data, schema)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--people", type=int, default=100)
+    parser.add_argument("--breaches", type=int, default=900)
+    args = parser.parse_args()
+
+    print(f"fast_json backend: {fast_json.BACKEND} (field projection {'on' if fast_json.PROJECTS else 'off'})")
+    for name, (data, schema, streamed) in payloads(args.people, args.breaches).items():
+        print(f"{name}: {len(data) / 2 ** 20:.2f} MiB")
+        for label, decode in decoders(schema, streamed):
+            ms, peak = measure(decode, data, args.rounds)
+            print(f"  {label:28s} {ms:8.2f} ms  peak {peak:7.2f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Startup-time benchmark for scraper.py.
+
+Imports scraper in fresh interpreters, reports the median wall time and the slowest
+imports, and fails (exit 1) if the median is over budget or a heavy module is imported
+eagerly.
+
+    python benchmarks/startup.py [--runs 5] [--budget-ms 400]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Modules only specific commands need; none of these may be loaded by `import scraper`
+HEAVY_MODULES = ["pandas", "numpy", "gspread", "gspread_formatting", "google.oauth2", "spacy", "pydantic", "bs4", "feedparser", "aiohttp"]
+
+CHECK_SNIPPET = (
+    "import sys, scraper; "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def _run_python(args):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=REPO_DIR, capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return elapsed_ms, result
+
+
+def slowest_imports(importtime_stderr: str, top: int = 10):
+    rows = []
+    for line in importtime_stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = line.replace("import time:", "").split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 400)))
+    args = parser.parse_args()
+
+    # Baseline: bare interpreter start, so the report shows what scraper adds on top
+    baseline = statistics.median(_run_python(["-c", "pass"])[0] for _ in range(args.runs))
+    timings = []
+    last = None
+    for _ in range(args.runs):
+        elapsed, last = _run_python(["-X", "importtime", "-c", "import scraper"])
+        timings.append(elapsed)
+    median = statistics.median(timings)
+
+    _, check = _run_python(["-c", CHECK_SNIPPET])
+    eager = [m for m in check.stdout.strip().split(",") if m]
+
+    print(f"interpreter start: {baseline:.0f} ms")
+    print(f"import scraper:    {median:.0f} ms median over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(last.stderr):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"FAIL: startup {median:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,25 +8,163 @@ load_dotenv()
 # Base directory
 BASE_DIR = Path(__file__).parent.parent
 
-# API Keys - with validation
-HIPB_KEY = os.environ["HIPB_KEY"]  # Required
-APOLLO_API_KEY = os.environ["APOLLO_API_KEY"]  # Required
+# API Keys - validated by require_setting() when a command actually uses them,
+# so runs that never touch a service don't need its credentials
+HIPB_KEY = os.getenv("HIPB_KEY")  # Required for HIBP
+APOLLO_API_KEY = os.getenv("APOLLO_API_KEY")  # Required for Apollo
 IPINFO_API_KEY = os.getenv("IPINFO_API_KEY")  # Optional
 
-# Google Sheets configuration
-GOOGLE_CREDS_JSON = BASE_DIR / os.environ["GOOGLE_CREDS_JSON"]
-if not GOOGLE_CREDS_JSON.exists():
-    raise FileNotFoundError(f"Credentials file not found at: {GOOGLE_CREDS_JSON}")
-
-SHEET_ID = os.environ["GOOGLE_SHEET_ID"]
+# Google Sheets configuration (only needed for exports)
+GOOGLE_CREDS_JSON = BASE_DIR / os.environ["GOOGLE_CREDS_JSON"] if os.getenv("GOOGLE_CREDS_JSON") else None
+SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 SHEET_NAME = os.environ.get("GOOGLE_SHEET_NAME", "Celestra-Output")
+SHEETS_MAX_ROWS_PER_TAB = 50000  # data rows per monthly tab; more continue in "April 2025 (2)", ...
+SHEETS_MAX_REQUEST_BYTES = 2 * 1024 * 1024  # JSON payload per values request (Google's recommended max)
+SHEETS_SINK_BATCH_SIZE = 5000  # records per Sheets write; small batches would exhaust the per-minute write quota
+SHEETS_SINK_FLUSH_INTERVAL = 60.0  # seconds before a partial Sheets batch is written
+SHEETS_RATE_LIMIT_BACKOFF = 30  # seconds before retrying a request refused with 429; doubles per retry
+SHEETS_RATE_LIMIT_RETRIES = 5  # 429 retries per request before the error reaches the sink
 
 # Incident storage
 INCIDENTS_DIR = BASE_DIR / "data" / "incidents"
-os.makedirs(INCIDENTS_DIR, exist_ok=True)
+
+
+def require_setting(name: str) -> str:
+    """Value of a required environment setting; raises KeyError if it isn't set"""
+    value = os.getenv(name)
+    if not value:
+        raise KeyError(f"Required setting {name} is not set")
+    return value
+
+
+def require_google_credentials() -> Path:
+    """Path to the Google service account file; raises if it's not configured"""
+    creds_path = BASE_DIR / require_setting("GOOGLE_CREDS_JSON")
+    if not creds_path.exists():
+        raise FileNotFoundError(f"Credentials file not found at: {creds_path}")
+    return creds_path
 
 # Rate limits
 RATE_LIMITS = {
     'apollo': 50,
     'hibp': 30  # HIBP typically has a rate limit of 30 requests/minute
-}
\ No newline at end of file
+}
+APOLLO_MAX_CONNECTIONS = 100  # open connections of the async Apollo client
+APOLLO_TIMEOUT = 10  # seconds per Apollo request
+APOLLO_MAX_IN_FLIGHT = 50  # lookups submitted to the async client at once; the rest wait their turn
+
+# Source ingestion (config/sources.yaml)
+SOURCES_FILE = BASE_DIR / "config" / "sources.yaml"
+SOURCE_CACHE_DIR = BASE_DIR / "data" / "cache" / "sources"
+SOURCE_CACHE_TTL = 300  # seconds before a cached source is re-checked
+SOURCE_FETCH_TIMEOUT = 15  # seconds
+MAX_SOURCE_WORKERS = 8
+
+# Organization extraction (spaCy NER) for article-based sources
+NER_MODEL = "en_core_web_lg"
+NER_BATCH_SIZE = 64  # docs per nlp.pipe batch
+NER_PROCESSES = max(1, (os.cpu_count() or 2) - 1)
+NER_CACHE_FILE = BASE_DIR / "data" / "cache" / "ner_cache.json"
+
+# Cross-source incident deduplication
+DEDUPE_DATE_WINDOW_DAYS = 30  # same domain within this many days = same breach
+DEDUPE_TEXT_THRESHOLD = 0.6  # MinHash Jaccard estimate for article near-duplicates
+
+# Domain normalization (utils/domains.py): bundled copy of https://publicsuffix.org/list/
+PUBLIC_SUFFIX_FILE = BASE_DIR / "data" / "public_suffix_list.dat"
+DOMAIN_CACHE_SIZE = 100000  # hosts whose registrable domain is memoized
+
+# B1ND dataset: the current full copy, plus a row-hash index and an append-only file of
+# new/changed rows per update (modules/b1nd_delta.py)
+B1ND_DATA_FILE = BASE_DIR / "data" / "breach_datasets" / "b1nd_breaches.csv"
+B1ND_INDEX_DB = BASE_DIR / "data" / "breach_datasets" / "b1nd_index.db"
+B1ND_DELTA_FILE = BASE_DIR / "data" / "breach_datasets" / "b1nd_delta.csv"
+
+# Local history of enriched incidents (SQLite)
+HISTORY_DB = BASE_DIR / "data" / "history.db"
+
+# CDN/WAF revalidation: reuse a domain's last result until its DNS moves or it ages out
+EDGE_STATE_DB = BASE_DIR / "data" / "cache" / "edge_state.db"
+EDGE_MAX_AGE_DAYS = 14
+
+# Local CDN inference (modules/cdn_detect.py): CNAME chain + one HEAD request per domain
+CDN_PROBE_TIMEOUT = 6  # seconds for the HEAD request
+CDN_CACHE_TTL = 24 * 3600  # in-process reuse of a domain's probe
+CDN_CACHE_SIZE = 50000
+WAF_WORKERS = int(os.getenv("WAF_WORKERS") or 4)  # concurrent wafw00f scans (separate from API workers)
+
+# Enrichment scheduling: spend the API budget on the most valuable domains first
+PRIORITY_WEIGHTS = {
+    'recency': 0.4,       # how recent the breach is
+    'records': 0.3,       # record_count / PwnCount
+    'data_classes': 0.2,  # share of sensitive data classes exposed
+    'region': 0.1         # known target region (US/CA) vs unknown
+}
+SENSITIVE_DATA_CLASSES = {
+    "passwords", "credit cards", "credit card cvv", "bank account numbers", "social security numbers",
+    "government issued ids", "passport numbers", "auth tokens", "security questions and answers",
+    "partial credit card data", "health records", "financial transactions"
+}
+APOLLO_DOMAIN_BUDGET = None  # max domains to enrich per run (None = no limit)
+ENRICHMENT_QUEUE_FILE = BASE_DIR / "data" / "cache" / "enrichment_queue.json"
+MAX_QUEUE_SIZE = 5000
+
+
+def _quota(name: str):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# Vendor credit caps tracked across runs (None = no cap). Override per plan via env.
+QUOTA_LIMITS = {
+    'apollo': {'day': _quota("APOLLO_DAILY_QUOTA"), 'month': _quota("APOLLO_MONTHLY_QUOTA")},
+    'ipinfo': {'day': _quota("IPINFO_DAILY_QUOTA"), 'month': _quota("IPINFO_MONTHLY_QUOTA") or 50000},
+    'hibp': {'day': _quota("HIBP_DAILY_QUOTA"), 'month': _quota("HIBP_MONTHLY_QUOTA")}
+}
+QUOTA_LEDGER_FILE = BASE_DIR / "data" / "quota_ledger.json"
+QUOTA_FLUSH_INTERVAL = 30  # seconds between writes of this process's counts to the ledger file
+QUOTA_FLUSH_EVERY = 100  # ... or after this many credits, whichever comes first
+# Estimated API calls per enriched domain, before cache hits
+API_CALLS_PER_DOMAIN = {
+    'apollo': 6,  # size lookup + contact title searches + similar companies
+    'ipinfo': 1
+}
+PREVIEW_SAMPLE_SIZE = 200  # domains enriched by `scraper.py preview` to estimate a full run
+
+# Output sinks, fed in the background while enrichment runs (scraper.py run --sink ...)
+OUTPUT_SINKS = ["sqlite", "sheets"]  # also: csv, jsonl
+OUTPUT_DIR = BASE_DIR / "data" / "exports"  # csv/jsonl sinks
+SINK_BATCH_SIZE = 50  # records per write
+SINK_FLUSH_INTERVAL = 5.0  # seconds before a partial batch is written
+SINK_MAX_RETRIES = 2  # per batch, before the sink is disabled for the run
+SINK_QUEUE_SIZE = 10000  # records buffered per sink before the pipeline waits
+
+# Daemon mode (scraper.py daemon): polling intervals in seconds. A sources.yaml entry
+# can override its interval with `poll_interval`.
+HIBP_POLL_INTERVAL = 3600
+SOURCE_POLL_INTERVAL = 6 * 3600
+DAEMON_SEEN_RETENTION_DAYS = 90  # how long processed incidents are remembered
+DAEMON_ENRICHMENT_CACHE_TTL = 24 * 3600  # Apollo company cache is dropped after this
+DNS_CACHE_TTL = 300  # in-process cache for hostname lookups
+DNS_CACHE_SIZE = 10000
+
+# Skip list of domains that failed the size/region rules, checked before any lookup.
+# A domain is forgotten after SKIP_LIST_ROTATE_DAYS to twice that.
+SKIP_LIST_FILE = BASE_DIR / "data" / "cache" / "skip_list.bloom"
+SKIP_LIST_CAPACITY = 2000000  # domains per generation (two generations, ~2.8 MB each)
+SKIP_LIST_ERROR_RATE = 0.005  # false-positive rate per generation at capacity
+SKIP_LIST_ROTATE_DAYS = 30
+
+# Profiling (scraper.py run/replay --profile)
+PROFILE_DIR = BASE_DIR / "logs" / "profile"
+PROFILE_TOP_N = 10  # allocators / functions listed per stage
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples in "sample" mode
+# Default for --max-peak-mb (peak MB per 1k domains under --profile); override with PROFILE_MAX_MB_PER_1K_DOMAINS
+PROFILE_MAX_MB_PER_1K_DOMAINS = float(os.getenv("PROFILE_MAX_MB_PER_1K_DOMAINS") or 250)
+
+# Local enrichment service (scraper.py serve)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = int(os.getenv("CELESTRA_SERVICE_PORT") or 8765)
+SERVICE_CACHE_TTL = 6 * 3600  # seconds a domain's enrichment/contact answer is reused
+SERVICE_CACHE_SIZE = 50000
+SERVICE_MAX_BATCH = 500  # domains per request
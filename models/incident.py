@@ -11,4 +11,10 @@ class Incident(BaseModel):
     raw_content: str
     categories: List[str]
     organizations: List[str] = []  # New field
-    scrape_content: bool = False  # New field
\ No newline at end of file
+    organization_names: List[str] = []  # NER ORG entities of article incidents (names, not websites)
+    scrape_content: bool = False  # New field
+    priority: int = 99  # Lower is more important (from sources.yaml)
+    country: str = ""
+    compromised_data: List[str] = []
+    record_count: Optional[int] = None
+    date_precision: str = "day"  # "year" when the source only knows the year (date is YYYY-01-01)
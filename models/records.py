@@ -0,0 +1,172 @@
+import sys
+from typing import Dict, List, Optional
+
+# Sentinel values shared by every record instead of one string copy per field
+NOT_FOUND = sys.intern("Not Found")
+NOT_AVAILABLE = sys.intern("Not Available")
+UNKNOWN = sys.intern("Unknown")
+NONE = sys.intern("None")
+NA = sys.intern("N/A")
+
+# Column order used for exports
+SHEET_COLUMNS = [
+    'Date of Breach',
+    'Company Name',
+    'Company Website',
+    'Company Size',
+    'Type of Breach',
+    'CDN',
+    'Security',
+    'Country',
+    'Contact Name',
+    'Contact Title',
+    'Contact Phone',
+    'Contact Email',
+    'LinkedIn URL',
+    'Source'
+]
+
+
+def _intern(value):
+    """Intern short categorical strings (country, CDN, size bucket) so repeats share memory"""
+    return sys.intern(value) if type(value) is str and len(value) < 64 else value
+
+
+class _SlotRecord:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class OrgEnrichment(_SlotRecord):
+    """Company-level enrichment for one domain (CDN, WAF, country, Apollo size/name)"""
+    __slots__ = ("cdn", "security", "country", "company_size", "company_name")
+
+    def __init__(self, cdn: str = NONE, security: str = NONE, country: str = UNKNOWN,
+                 company_size: str = NA, company_name: str = UNKNOWN):
+        self.cdn = _intern(cdn)
+        self.security = _intern(security)
+        self.country = _intern(country)
+        self.company_size = _intern(company_size)
+        self.company_name = company_name
+
+    def to_row(self) -> Dict[str, str]:
+        return {
+            "CDN": self.cdn,
+            "Security": self.security,
+            "Country": self.country,
+            "Company Size": self.company_size,
+            "Company Name": self.company_name
+        }
+
+
+class ContactEnrichment(_SlotRecord):
+    """Point of contact for one domain"""
+    __slots__ = ("name", "title", "phone", "email", "linkedin_url")
+
+    def __init__(self, name: str = NOT_FOUND, title: str = NOT_FOUND, phone: str = NOT_FOUND,
+                 email: str = NOT_FOUND, linkedin_url: str = NOT_AVAILABLE):
+        self.name = name
+        self.title = _intern(title)
+        self.phone = phone
+        self.email = email
+        self.linkedin_url = linkedin_url
+
+    @classmethod
+    def from_poc(cls, poc: Dict[str, str]) -> "ContactEnrichment":
+        """Build from the dict returned by fetch_poc_for_domain"""
+        return cls(
+            name=poc.get("Name", NOT_FOUND),
+            title=poc.get("Title", NOT_FOUND),
+            phone=poc.get("Phone", NOT_FOUND),
+            email=poc.get("Email", NOT_FOUND),
+            linkedin_url=poc.get("LinkedIn URL", NOT_AVAILABLE)
+        )
+
+    def to_row(self) -> Dict[str, str]:
+        return {
+            "Contact Name": self.name,
+            "Contact Title": self.title,
+            "Contact Phone": self.phone,
+            "Contact Email": self.email,
+            "LinkedIn URL": self.linkedin_url
+        }
+
+
+# Shared defaults - records point at these until enrichment replaces them
+DEFAULT_ORG = OrgEnrichment()
+DEFAULT_CONTACT = ContactEnrichment()
+UNAVAILABLE_CONTACT = ContactEnrichment(phone=NOT_AVAILABLE, email=NOT_AVAILABLE)
+
+
+class IncidentRecord(_SlotRecord):
+    """One exported row: breach fields plus references to org and contact enrichment"""
+    __slots__ = ("date", "source", "breach_type", "website", "org", "contact", "industry")
+
+    def __init__(self, date: str = "", source: str = "", breach_type: str = "", website: str = "",
+                 org: OrgEnrichment = DEFAULT_ORG, contact: ContactEnrichment = DEFAULT_CONTACT,
+                 industry: Optional[str] = None):
+        self.date = date
+        self.source = _intern(source)
+        self.breach_type = breach_type
+        self.website = website
+        self.org = org
+        self.contact = contact
+        self.industry = industry
+
+    @classmethod
+    def from_incident(cls, incident) -> Optional["IncidentRecord"]:
+        """Build from a raw incident dict (or models.incident.Incident); None if it has no website"""
+        if hasattr(incident, "model_dump"):
+            incident = incident.model_dump()
+
+        orgs = incident.get("organizations")
+        if isinstance(orgs, list):
+            website = orgs[0] if orgs else ""
+        elif orgs is not None:
+            website = str(orgs)
+        else:
+            website = ""
+
+        if not website:
+            return None
+
+        return cls(
+            date=incident.get("date", ""),
+            source=incident.get("source", ""),
+            breach_type=incident.get("raw_content", ""),
+            website=website
+        )
+
+    def to_row(self) -> Dict[str, str]:
+        """Dict keyed by export column name, suitable for pandas.DataFrame"""
+        row = {
+            "Date of Breach": self.date,
+            "Source": self.source,
+            "Type of Breach": self.breach_type,
+            "Company Website": self.website
+        }
+        row.update(self.org.to_row())
+        row.update(self.contact.to_row())
+        if self.industry is not None:
+            row["Industry"] = self.industry
+        return row
+
+    def to_sheet_row(self, columns: List[str] = SHEET_COLUMNS) -> List:
+        """Values in sheet column order without building an intermediate DataFrame"""
+        if columns is SHEET_COLUMNS:
+            org, contact = self.org, self.contact
+            return [
+                self.date, org.company_name, self.website, org.company_size, self.breach_type,
+                org.cdn, org.security, org.country, contact.name, contact.title,
+                contact.phone, contact.email, contact.linkedin_url, self.source
+            ]
+        row = self.to_row()
+        return [row.get(c, "") for c in columns]
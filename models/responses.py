@@ -0,0 +1,67 @@
+# Vendor response schemas: only the fields the pipeline reads. utils.fast_json decodes
+# into these and skips every other field without building it. Types are loose (Optional
+# everywhere) because vendors send nulls freely; a response that still doesn't fit is
+# decoded in full instead.
+from typing import List, Optional, TypedDict
+
+
+class ApolloOrganization(TypedDict, total=False):
+    name: Optional[str]
+    estimated_num_employees: Optional[int]
+
+
+class ApolloOrganizationResponse(TypedDict, total=False):
+    """organizations/enrich"""
+    organization: Optional[ApolloOrganization]
+
+
+class ApolloPhoneNumber(TypedDict, total=False):
+    number: Optional[str]
+
+
+class ApolloPerson(TypedDict, total=False):
+    name: Optional[str]
+    email: Optional[str]
+    phone_numbers: Optional[List[ApolloPhoneNumber]]
+    linkedin_url: Optional[str]
+
+
+class ApolloSearchOrganization(TypedDict, total=False):
+    domain: Optional[str]
+    name: Optional[str]
+    estimated_num_employees: Optional[int]
+    industry: Optional[str]
+
+
+class ApolloPeopleSearch(TypedDict, total=False):
+    """mixed_people/search (contacts, and organizations for similar companies)"""
+    people: Optional[List[ApolloPerson]]
+    organizations: Optional[List[ApolloSearchOrganization]]
+
+
+class HibpBreach(TypedDict, total=False):
+    """One entry of the HIBP /breaches catalogue (Description, LogoPath etc. are skipped)"""
+    Name: str
+    Title: str
+    Domain: Optional[str]
+    BreachDate: str
+    AddedDate: str
+    PwnCount: Optional[int]
+    DataClasses: List[str]
+
+
+HibpCatalogue = List[HibpBreach]
+
+
+class KevVulnerability(TypedDict, total=False):
+    cveID: str
+    vendorProject: Optional[str]
+    product: Optional[str]
+    vulnerabilityName: Optional[str]
+    dateAdded: Optional[str]
+    shortDescription: Optional[str]
+
+
+class KevCatalogue(TypedDict, total=False):
+    """CISA Known Exploited Vulnerabilities feed"""
+    vulnerabilities: List[KevVulnerability]
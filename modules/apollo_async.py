@@ -0,0 +1,217 @@
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Callable, Coroutine, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from config.settings import APOLLO_MAX_CONNECTIONS, APOLLO_MAX_IN_FLIGHT, APOLLO_TIMEOUT
+from utils.fast_json import loads
+from utils.http_cassette import get_active
+from utils.quota_ledger import get_ledger
+from utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+RETRY_BACKOFF = 2
+MIN_TOKEN_WAIT = 0.05  # seconds between checks once the minute's window should have reset
+
+_aiohttp = None
+
+
+def _load_aiohttp():
+    """aiohttp, imported on first use (it is slow to import); None if not installed"""
+    global _aiohttp
+    if _aiohttp is None:
+        try:
+            import aiohttp
+            _aiohttp = aiohttp
+        except ImportError:  # requests in worker threads is used instead
+            _aiohttp = False
+    return _aiohttp or None
+
+
+def _query_pairs(params: Optional[Dict]) -> Optional[List[Tuple[str, str]]]:
+    """Query parameters the way requests encodes them (lists become repeated keys)"""
+    if not params:
+        return None
+    pairs = []
+    for key, value in params.items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            if item is not None:
+                pairs.append((key, str(item)))
+    return pairs
+
+
+class AsyncApolloClient:
+    """Apollo requests on one event loop, running in a background thread.
+
+    Coroutines can be awaited on that loop, or handed over from any thread with
+    run() (blocking) or submit() (a concurrent.futures.Future), so thousands of lookups
+    can be in flight without a thread each. The transport is aiohttp; without it, or
+    while a record/replay cassette is installed, requests are sent through the
+    (cassette-aware) requests session in worker threads. Rate limiting, quota checks
+    and retries behave the same either way.
+    """
+
+    def __init__(self, session: requests.Session, rate_limiter: RateLimiter,
+                 max_connections: int = APOLLO_MAX_CONNECTIONS, timeout: float = APOLLO_TIMEOUT):
+        self.fallback_session = session
+        self.rate_limiter = rate_limiter
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http = None
+        self._lock = threading.Lock()
+
+    # --- event loop ---
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="apollo-loop", daemon=True).start()
+                    self._loop = loop
+                    atexit.register(self.close)
+        return self._loop
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run a coroutine on the client's loop and wait for its result (never call from the loop)"""
+        return self.submit(coro).result()
+
+    def map_unordered(self, func: Callable[[Any], Coroutine], items: Iterable,
+                      max_in_flight: int = APOLLO_MAX_IN_FLIGHT) -> Iterator[Tuple[Any, concurrent.futures.Future]]:
+        """(item, finished future) pairs as `func(item)` completes, with at most `max_in_flight`
+        coroutines submitted at a time; the caller reads each result or exception from the future"""
+        items = iter(items)
+        pending: Dict[concurrent.futures.Future, Any] = {}
+        while True:
+            for item in items:
+                pending[self.submit(func(item))] = item
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                return
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._http is not None:
+            self.run(self._http.close())
+            self._http = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    # --- transport ---
+
+    @property
+    def uses_aiohttp(self) -> bool:
+        return get_active() is None and _load_aiohttp() is not None
+
+    @staticmethod
+    def _decode(raw: bytes, schema: Optional[Any]) -> Any:
+        if logger.isEnabledFor(logging.DEBUG):  # decoding the text for the log costs as much as the JSON
+            logger.debug(f"⬅️  Raw Content: {raw.decode('utf-8', 'replace')}")
+        try:
+            return loads(raw, schema)
+        except ValueError:
+            return None
+
+    async def _send(self, method: str, url: str, json: Optional[Dict], params: Optional[Dict],
+                    headers: Optional[Dict], schema: Optional[Any] = None) -> Tuple[int, Dict, Any]:
+        """(status, headers, JSON body decoded into `schema`, or None)"""
+        if not self.uses_aiohttp:
+            response = await asyncio.to_thread(
+                self.fallback_session.request, method, url, json=json, params=params, headers=headers,
+                timeout=self.timeout
+            )
+            return response.status_code, response.headers, self._decode(response.content, schema)
+
+        aiohttp = _load_aiohttp()
+        if self._http is None:
+            self._http = aiohttp.ClientSession(
+                headers=dict(self.fallback_session.headers),
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        async with self._http.request(method, url, json=json, params=_query_pairs(params),
+                                      headers=headers) as response:
+            return response.status, response.headers, self._decode(await response.read(), schema)
+
+    @property
+    def _transport_errors(self) -> tuple:
+        errors = (requests.RequestException, asyncio.TimeoutError)
+        aiohttp = _load_aiohttp()
+        return errors + (aiohttp.ClientError,) if aiohttp is not None else errors
+
+    async def _acquire(self, service: str):
+        """Wait for a rate-limit token; requests past the minute's limit queue for the next window"""
+        while not self.rate_limiter.try_acquire(service):
+            await asyncio.sleep(max(self.rate_limiter.seconds_until_reset(), MIN_TOKEN_WAIT))
+
+    async def request(self, method: str, url: str, json: Optional[Dict] = None,
+                      params: Optional[Dict] = None, headers: Optional[Dict] = None,
+                      schema: Optional[Any] = None) -> Optional[Dict]:
+        """Apollo request with rate limiting, quota checks and retries; None on failure.
+
+        `schema` (models.responses) limits decoding to the fields the caller reads."""
+        logger.info(f"✅ Making Apollo request to {url}")
+
+        for attempt in range(MAX_RETRIES):
+            await self._acquire('apollo')
+            if not await asyncio.to_thread(get_ledger().reserve, 'apollo'):
+                return None
+            try:
+                logger.info(f"➡️  Sending request to Apollo: {method} {url}")
+                if params:
+                    logger.info(f"➡️  Params: {params}")
+                if json:
+                    logger.info(f"➡️  Payload: {json}")
+
+                try:
+                    status, response_headers, body = await self._send(method, url, json, params, headers, schema)
+                except self._transport_errors:
+                    await asyncio.to_thread(get_ledger().release, 'apollo')
+                    raise
+                if status == 429:
+                    await asyncio.to_thread(get_ledger().release, 'apollo')
+
+                logger.info(f"⬅️  Status Code: {status}")
+                logger.info(f"⬅️  Headers: {response_headers}")
+
+                if status == 429:
+                    wait_time = RETRY_BACKOFF ** attempt
+                    logger.warning(f"Rate limit hit. Retrying in {wait_time} seconds...")
+                    await asyncio.sleep(wait_time)
+                    continue
+                elif status == 401:
+                    logger.error("❌ Authentication error. Check API Key.")
+                    return None
+                elif status == 422:
+                    logger.error("❌ Unprocessable Entity (422). Check if the domain is valid.")
+                    return None
+
+                delay = self.rate_limiter.rate_limit_delay(response_headers)
+                if delay:
+                    await asyncio.sleep(delay)
+                if status >= 400:
+                    raise requests.HTTPError(f"{status} Error for url: {url}")
+                if body is None:
+                    raise requests.RequestException(f"Invalid JSON from {url}")
+                return body
+            except self._transport_errors as e:
+                logger.error(f"❌ Apollo API error: {e}")
+                await asyncio.sleep(RETRY_BACKOFF ** attempt)
+        logger.error(f"❌ Failed after {MAX_RETRIES} attempts: {url}")
+        return None
@@ -1,16 +1,15 @@
 import sys
 import os
 import logging
-import time
 import requests
 from config.settings import APOLLO_API_KEY
+from modules.apollo_async import AsyncApolloClient
+from models.responses import ApolloOrganizationResponse, ApolloPeopleSearch
 from utils.rate_limiter import RateLimiter
+from utils.http_cassette import register_session
 from typing import List, Dict, Tuple, Optional
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Initialize rate limiter
@@ -18,69 +17,36 @@ rate_limiter = RateLimiter()
 
 # Constants
 APOLLO_API_URL = 'https://api.apollo.io/api/v1/'
-MAX_RETRIES = 5
-RETRY_BACKOFF = 2
 
 # Caches
 company_cache = {}
 
 # Session setup
-session = requests.Session()
+session = register_session(requests.Session())
 session.headers.update({
     "x-api-key": APOLLO_API_KEY,
     "accept": "application/json",
     "Content-Type": "application/json",
     "Cache-Control": "no-cache"
 })
-# Helper to send requests with retry + rate limit handling
+# Async client: every lookup below is a coroutine on its event loop; the plain functions
+# are blocking wrappers for thread-based callers
+client = AsyncApolloClient(session, rate_limiter)
+
+
+# Helper to send requests with retry + rate limit handling (see AsyncApolloClient.request)
 def _apollo_request(method, url, json=None, params=None, headers=None):
-    print(f"✅ Making Apollo request to {url}")
+    return client.run(client.request(method, url, json=json, params=params, headers=headers))
 
-    for attempt in range(MAX_RETRIES):
-        if not rate_limiter.check_limit('apollo'):
-            logger.info("Rate limit exceeded for Apollo. Skipping request.")
-            return None
-        try:
-            logger.info(f"➡️  Sending request to Apollo: {method} {url}")
-            if params:
-                logger.info(f"➡️  Params: {params}")
-            if json:
-                logger.info(f"➡️  Payload: {json}")
-
-            response = session.request(method, url, json=json, params=params, headers=headers, timeout=10)
-
-            logger.info(f"⬅️  Status Code: {response.status_code}")
-            logger.info(f"⬅️  Headers: {response.headers}")
-            logger.info(f"⬅️  Raw Content: {response.text}")
-
-            if response.status_code == 429:
-                wait_time = RETRY_BACKOFF ** attempt
-                logger.warning(f"Rate limit hit. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-                continue
-            elif response.status_code == 401:
-                logger.error("❌ Authentication error. Check API Key.")
-                return None
-            elif response.status_code == 422:
-                logger.error("❌ Unprocessable Entity (422). Check if the domain is valid.")
-                return None
-
-            rate_limiter.check_rate_limits(response.headers)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logger.error(f"❌ Apollo API error: {e}")
-            time.sleep(RETRY_BACKOFF ** attempt)
-    logger.error(f"❌ Failed after {MAX_RETRIES} attempts: {url}")
-    return None
 
-def find_similar_companies(domain: str, regions: list = ["AMER"], min_employees: int = 50) -> List[Dict]:
+async def find_similar_companies_async(domain: str, regions: list = ["AMER"],
+                                       min_employees: int = 50) -> List[Dict]:
     """Find similar companies based on original company's attributes"""
     if not domain:
         return []
     
     # First get the original company's data
-    original = enrich_company_size(domain)
+    original = await enrich_company_size_async(domain)
     if not original or original.get("Company Size") == "N/A":
         return []
     
@@ -100,7 +66,7 @@ def find_similar_companies(domain: str, regions: list = ["AMER"], min_employees:
         "api_key": APOLLO_API_KEY
     }
     
-    response = _apollo_request("GET", url, headers=headers, params=params)
+    response = await client.request("GET", url, headers=headers, params=params, schema=ApolloPeopleSearch)
     
     if response and response.get("organizations"):
         for org in response["organizations"]:
@@ -114,8 +80,13 @@ def find_similar_companies(domain: str, regions: list = ["AMER"], min_employees:
     
     return similar_companies
 
+
+def find_similar_companies(domain: str, regions: list = ["AMER"], min_employees: int = 50) -> List[Dict]:
+    return client.run(find_similar_companies_async(domain, regions, min_employees))
+
+
 # Main enrichment function for Company Size only
-def enrich_company_size(domain: str) -> Dict[str, str]:
+async def enrich_company_size_async(domain: str) -> Dict[str, str]:
     if domain in company_cache:
         return company_cache[domain]
 
@@ -127,13 +98,14 @@ def enrich_company_size(domain: str) -> Dict[str, str]:
         "x-api-key": APOLLO_API_KEY
     }
 
-    data = _apollo_request("GET", url, headers=headers)
+    data = await client.request("GET", url, headers=headers, schema=ApolloOrganizationResponse)
 
     if not data or not data.get("organization"):
         logger.warning(f"No company data found for domain: {domain}")
         company_cache[domain] = {
             "Company Size": "N/A",
-            "Company Name": "Unknown"
+            "Company Name": "Unknown",
+            "Lookup Failed": data is None  # request failed, as opposed to Apollo not knowing the company
         }
         return company_cache[domain]
 
@@ -162,8 +134,11 @@ def enrich_company_size(domain: str) -> Dict[str, str]:
     return enriched
 
 
+def enrich_company_size(domain: str) -> Dict[str, str]:
+    return client.run(enrich_company_size_async(domain))
 
-def fetch_poc_for_domain(domain: str) -> Dict[str, str]:
+
+async def fetch_poc_for_domain_async(domain: str) -> Dict[str, str]:
     """
     Enhanced contact lookup with better error handling and LinkedIn support
     Returns: {
@@ -214,10 +189,11 @@ def fetch_poc_for_domain(domain: str) -> Dict[str, str]:
                 "api_key": APOLLO_API_KEY
             }
 
-            response = _apollo_request("GET", 
+            response = await client.request("GET",
                 "https://api.apollo.io/v1/mixed_people/search",
                 headers=headers,
-                params=params
+                params=params,
+                schema=ApolloPeopleSearch
             )
 
             if not response or not response.get("people"):
@@ -250,11 +226,16 @@ def fetch_poc_for_domain(domain: str) -> Dict[str, str]:
         "LinkedIn URL": "Not Available"
     }
 
+
+def fetch_poc_for_domain(domain: str) -> Dict[str, str]:
+    return client.run(fetch_poc_for_domain_async(domain))
+
     
 
 # Example CLI usage
 if __name__ == "__main__":
     import json
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     test_domain = sys.argv[1] if len(sys.argv) > 1 else "cloudflare.com"
     logger.info(f"Testing Apollo enrichment for: {test_domain}")
@@ -0,0 +1,172 @@
+import io
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from config.settings import B1ND_INDEX_DB, B1ND_DELTA_FILE
+
+logger = logging.getLogger(__name__)
+
+B1ND_COLUMNS = ["Date", "Website", "Website Country", "Compromised Data", "Record Count"]
+
+SCHEMA = """
+-- One row per distinct dataset row ever seen, keyed by its content hash
+CREATE TABLE IF NOT EXISTS known_rows (
+    row_hash INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL,
+    year TEXT NOT NULL,
+    batch_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_known_domain_year ON known_rows(domain, year);
+
+-- One row per update; offset/size locate its rows in the delta file
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ingested_ts TEXT NOT NULL,
+    source_file TEXT,
+    added INTEGER NOT NULL DEFAULT 0,
+    changed INTEGER NOT NULL DEFAULT 0,
+    unchanged INTEGER NOT NULL DEFAULT 0,
+    delta_offset INTEGER NOT NULL DEFAULT 0,
+    delta_size INTEGER NOT NULL DEFAULT 0,
+    exported INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def read_rows(path) -> pd.DataFrame:
+    """A B1ND CSV as strings, exactly as written (no NaN or number inference, so hashes are stable)"""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    missing = set(B1ND_COLUMNS) - set(df.columns)
+    if missing:
+        raise ValueError(f"B1ND file missing required columns: {sorted(missing)}")
+    return df[B1ND_COLUMNS]
+
+
+def row_keys(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """(content hash, domain, year) per row; hashes are signed so SQLite can store them"""
+    hashes = pd.util.hash_pandas_object(df, index=False).astype("int64")
+    domains = df["Website"].str.strip().str.lower()
+    years = df["Date"].str.extract(r"((?:19|20)\d{2})", expand=False).fillna("")
+    return hashes, domains, years
+
+
+class B1NDDeltaStore:
+    """Row-level change tracking for the B1ND dataset.
+
+    Every row ever ingested is indexed by content hash and (domain, year). An update only
+    appends rows with an unseen hash to the append-only delta CSV, marked "new" or
+    "changed" (a known domain/year with different content), and records the batch's byte
+    range in that file. Consumers read just the batches they haven't processed
+    (pending_rows / mark_exported), so a weekly refresh costs what actually changed.
+    Rows that disappear from the dataset are kept; the store never deletes.
+    """
+
+    def __init__(self, db_path: Path = B1ND_INDEX_DB, delta_path: Path = B1ND_DELTA_FILE):
+        self.db_path = Path(db_path)
+        self.delta_path = Path(delta_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.delta_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM batches LIMIT 1").fetchone() is None
+
+    def _classify(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """(rows with an unseen hash, marked new/changed; count of already known rows)"""
+        hashes, domains, years = row_keys(df)
+        keyed = df.assign(_hash=hashes.values, _domain=domains.values, _year=years.values)
+        keyed = keyed.drop_duplicates("_hash")
+
+        known_hashes = set()
+        known_keys = set()
+        hash_list = [int(h) for h in keyed["_hash"]]
+        for start in range(0, len(hash_list), 900):  # SQLite's bound-parameter limit
+            chunk = hash_list[start:start + 900]
+            rows = self.conn.execute(
+                f"SELECT row_hash FROM known_rows WHERE row_hash IN ({','.join('?' * len(chunk))})", chunk
+            )
+            known_hashes.update(r[0] for r in rows)
+
+        fresh = keyed[~keyed["_hash"].isin(known_hashes)]
+        for domain, year in zip(fresh["_domain"], fresh["_year"]):
+            if self.conn.execute("SELECT 1 FROM known_rows WHERE domain = ? AND year = ? LIMIT 1",
+                                 (domain, year)).fetchone():
+                known_keys.add((domain, year))
+        change = ["changed" if key in known_keys else "new" for key in zip(fresh["_domain"], fresh["_year"])]
+        return fresh.assign(_change=change), len(keyed) - len(fresh)
+
+    def ingest(self, df: pd.DataFrame, source_file: str = "", exported: bool = False) -> dict:
+        """Index the rows of a full dataset copy and append the unseen ones to the delta file.
+
+        Returns the batch counts. `exported` marks the batch as already processed (used when
+        adopting a dataset that was exported before the store existed)."""
+        with self._lock:
+            fresh, unchanged = self._classify(df)
+            added = int((fresh["_change"] == "new").sum())
+            changed = len(fresh) - added
+
+            offset = self.delta_path.stat().st_size if self.delta_path.exists() else 0
+            size = 0
+            with self.conn:
+                cursor = self.conn.execute(
+                    "INSERT INTO batches (ingested_ts, source_file, added, changed, unchanged, delta_offset, "
+                    "exported) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (datetime.now().isoformat(timespec="seconds"), source_file, added, changed, unchanged,
+                     offset, int(exported))
+                )
+                batch_id = cursor.lastrowid
+                if len(fresh):
+                    out = fresh[B1ND_COLUMNS].assign(Batch=batch_id, Change=fresh["_change"].values)
+                    with open(self.delta_path, "a", encoding="utf-8", newline="") as f:
+                        out.to_csv(f, index=False, header=False)
+                        f.flush()
+                    size = self.delta_path.stat().st_size - offset
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO known_rows (row_hash, domain, year, batch_id) VALUES (?, ?, ?, ?)",
+                        ((int(h), d, y, batch_id) for h, d, y in zip(fresh["_hash"], fresh["_domain"], fresh["_year"]))
+                    )
+                self.conn.execute("UPDATE batches SET delta_size = ? WHERE batch_id = ?", (size, batch_id))
+
+        stats = {"batch_id": batch_id, "added": added, "changed": changed, "unchanged": unchanged}
+        logger.info(f"B1ND batch {batch_id}: {added} new, {changed} changed, {unchanged} unchanged rows")
+        return stats
+
+    def pending_batches(self) -> List[int]:
+        rows = self.conn.execute("SELECT batch_id FROM batches WHERE exported = 0 ORDER BY batch_id")
+        return [r[0] for r in rows]
+
+    def pending_rows(self, batch_ids: Optional[List[int]] = None) -> pd.DataFrame:
+        """Delta rows of the given (default: all unexported) batches, read from their byte ranges only"""
+        if batch_ids is None:
+            batch_ids = self.pending_batches()
+        columns = B1ND_COLUMNS + ["Batch", "Change"]
+        frames = []
+        for batch_id in batch_ids:
+            row = self.conn.execute("SELECT delta_offset, delta_size FROM batches WHERE batch_id = ?",
+                                    (batch_id,)).fetchone()
+            if not row or not row[1]:
+                continue
+            with open(self.delta_path, "rb") as f:
+                f.seek(row[0])
+                chunk = f.read(row[1])
+            frames.append(pd.read_csv(io.BytesIO(chunk), names=columns, header=None,
+                                      dtype=str, keep_default_na=False))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def mark_exported(self, batch_ids: List[int]):
+        with self._lock, self.conn:
+            self.conn.executemany("UPDATE batches SET exported = 1 WHERE batch_id = ?", ((b,) for b in batch_ids))
@@ -2,18 +2,33 @@ import pandas as pd
 from datetime import datetime
 import os
 import logging
-from typing import List, Dict
-from modules.googlesheets import GoogleSheetsExporter
+from typing import List, Dict, Optional
+
+from config.settings import B1ND_DATA_FILE
+from modules.b1nd_delta import B1NDDeltaStore, read_rows
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class B1NDDataset:
     def __init__(self):
-        self.data_path = "data/breach_datasets/b1nd_breaches.csv"
+        self.data_path = str(B1ND_DATA_FILE)
         self._ensure_data_directory_exists()
-        self.sheets_exporter = GoogleSheetsExporter()
+        self._sheets_exporter = None
+        self._delta_store = None
+
+    @property
+    def sheets_exporter(self):
+        # Created on first export so reading the dataset doesn't need Google credentials
+        if self._sheets_exporter is None:
+            from modules.googlesheets import GoogleSheetsExporter
+            self._sheets_exporter = GoogleSheetsExporter()
+        return self._sheets_exporter
+
+    @property
+    def delta_store(self) -> B1NDDeltaStore:
+        if self._delta_store is None:
+            self._delta_store = B1NDDeltaStore()
+        return self._delta_store
 
     def _ensure_data_directory_exists(self):
         os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
@@ -22,8 +37,7 @@ class B1NDDataset:
     def get_all_breaches(self) -> List[Dict]:
         try:
             logger.info("Fetching all breaches from the B1ND dataset...")
-            df = pd.read_csv(self.data_path)
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')  # Coerce invalid dates to NaT
+            df = self._parse_dates(pd.read_csv(self.data_path))
             
             # Log number of records
             logger.info(f"Fetched {len(df)} breaches from B1ND dataset.")
@@ -41,6 +55,13 @@ class B1NDDataset:
     def get_all_incidents(self) -> List[Dict]:
         return self.get_all_breaches()
 
+    @staticmethod
+    def _parse_dates(df: pd.DataFrame) -> pd.DataFrame:
+        # The Date column holds years; parsed as plain integers they'd become 1970 timestamps
+        years = df['Date'].astype(str).str.extract(r"((?:19|20)\d{2})")[0]
+        df['Date'] = pd.to_datetime(years, format='%Y', errors='coerce')  # Coerce invalid dates to NaT
+        return df
+
     def _parse_to_standard_format(self, df: pd.DataFrame) -> List[Dict]:
         logger.info(f"Parsing {len(df)} rows from the dataset into standard format...")
         breaches = []
@@ -61,6 +82,7 @@ class B1NDDataset:
 
             breach = {
                 'date': formatted_date,  # Using the formatted date
+                'date_precision': 'year',  # only the year is known; dedupe matches it against the whole year
                 'title': f"{company} Data Breach",  # Using company name
                 'source': 'B1ND',
                 'source_url': '',  # URL can be added if available
@@ -81,15 +103,29 @@ class B1NDDataset:
         logger.info(f"Parsed {len(breaches)} breaches.")
         return breaches
 
+    def _adopt_current_copy(self):
+        # First use of the delta store: index the dataset already on disk as its baseline.
+        # Before the store existed every export sent the whole file, so the baseline counts
+        # as exported; a copy that never was needs export_breaches_to_sheets(full=True).
+        if self.delta_store.is_empty() and os.path.exists(self.data_path):
+            self.delta_store.ingest(read_rows(self.data_path), source_file=self.data_path, exported=True)
+            logger.info("Indexed the current B1ND copy as the already-exported baseline; "
+                        "use a full export if it was never exported")
+
     def update_dataset(self, new_file_path: str):
+        """Ingest a full refresh of the dataset: only rows that are new or changed since the
+        last update are appended to the delta store (and exported later); the file then
+        becomes the current copy."""
         try:
             logger.info(f"Attempting to update dataset with new file: {new_file_path}")
-            test_df = pd.read_csv(new_file_path)
-            required_cols = {'Record Count', 'Date', 'Website', 'Website Country', 'Compromised Data'}
-            if not required_cols.issubset(test_df.columns):
-                logger.error(f"New file missing required columns: {required_cols}")
-                raise ValueError("New file missing required columns")
+            new_rows = read_rows(new_file_path)  # raises ValueError when required columns are missing
+
+            self._adopt_current_copy()
+            stats = self.delta_store.ingest(new_rows, source_file=os.path.basename(new_file_path))
+            logger.info(f"Dataset delta: {stats['added']} new, {stats['changed']} changed, "
+                        f"{stats['unchanged']} unchanged rows")
 
+            # A rename, not a rewrite: readers of the full table (breach_table, sources) keep working
             os.replace(new_file_path, self.data_path)
             with open("data/breach_datasets/last_update.txt", 'w') as f:
                 f.write(datetime.now().isoformat())
@@ -99,16 +135,38 @@ class B1NDDataset:
             logger.error(f"Failed to update dataset: {str(e)}")
             return False
 
-    def export_breaches_to_sheets(self):
-        breaches = self.get_all_breaches()
-        if breaches:
-            logger.info(f"Exporting {len(breaches)} breaches to Google Sheets...")
-            for b in breaches:
-                b['source'] = 'B1ND'
-            success = self.sheets_exporter.export_incidents(breaches)
-            if success:
-                logger.info(f"Successfully exported {len(breaches)} breaches to Google Sheets.")
-            else:
-                logger.error("Failed to export breaches to Google Sheets.")
-        else:
+    def get_pending_breaches(self, batch_ids: Optional[List[int]] = None) -> List[Dict]:
+        """Breaches from dataset updates that haven't been exported yet"""
+        rows = self.delta_store.pending_rows(batch_ids)
+        logger.info(f"Fetched {len(rows)} new or changed breaches from the B1ND delta store.")
+        return self._parse_to_standard_format(self._parse_dates(rows)) if len(rows) else []
+
+    def export_breaches_to_sheets(self, full: bool = False):
+        """Append the rows added or changed by dataset updates since the last export to this
+        month's tab (full=True replaces the tab with the whole dataset instead)"""
+        from models.records import IncidentRecord
+        from modules.sinks import SheetsSink
+
+        self._adopt_current_copy()
+        batch_ids = self.delta_store.pending_batches()
+        breaches = self.get_all_breaches() if full else self.get_pending_breaches(batch_ids)
+        records = [r for r in (IncidentRecord.from_incident(b) for b in breaches) if r is not None]
+        if not records:
             logger.warning("No breaches found to export.")
+            if not full:
+                self.delta_store.mark_exported(batch_ids)
+            return
+
+        logger.info(f"Exporting {len(records)} breaches to Google Sheets...")
+        sink = SheetsSink(self.sheets_exporter, append=not full)
+        try:
+            sink.open()
+            sink.write_batch(records)
+            success = sink.close()
+        except Exception as e:
+            logger.error(f"Failed to export breaches to Google Sheets: {e}")
+            return
+        if success:
+            logger.info(f"Successfully exported {len(records)} breaches to Google Sheets.")
+            # A full export covers every pending batch too
+            self.delta_store.mark_exported(batch_ids)
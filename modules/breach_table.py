@@ -0,0 +1,178 @@
+import concurrent.futures
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from config.settings import B1ND_DATA_FILE
+from models.records import OrgEnrichment
+from utils.domains import registrable_domain
+
+logger = logging.getLogger(__name__)
+
+# One row per (domain, source, date); every source is mapped onto these columns
+BREACH_COLUMNS = ["domain", "date", "year", "source", "title", "country", "record_count",
+                  "data_classes", "source_url"]
+ENRICHMENT_COLUMNS = ["company_name", "company_size", "cdn", "security", "country_code", "region"]
+
+# Same cut as scraper.filter_domains
+EXCLUDED_SIZES = ("N/A", "1–49")
+
+_YEAR_PATTERN = r"((?:19|20)\d{2})"
+
+
+def normalize_domains(values: pd.Series) -> pd.Series:
+    """Registrable domain of each value (see utils.domains), computed once per distinct value"""
+    values = values.fillna("").astype(str)
+    uniques = values.unique()
+    return values.map(dict(zip(uniques, map(registrable_domain, uniques))))
+
+
+def _record_counts(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(values.astype(str).str.replace(",", "", regex=False), errors="coerce").astype("Int64")
+
+
+def _finish(df: pd.DataFrame) -> pd.DataFrame:
+    df["domain"] = normalize_domains(df["domain"])
+    df["date"] = df["date"].fillna("").astype(str).str[:10]
+    df["year"] = pd.to_numeric(df["date"].str.extract(_YEAR_PATTERN)[0], errors="coerce").astype("Int64")
+    for column in ("source", "country"):
+        df[column] = df[column].fillna("").astype(str).astype("category")
+    return df[BREACH_COLUMNS]
+
+
+def hibp_frame(breaches: Iterable[Dict]) -> pd.DataFrame:
+    """Raw HIBP catalogue entries (as returned by the /breaches API)"""
+    df = pd.DataFrame.from_records(
+        ((b.get("Domain") or "", b.get("BreachDate", ""), b.get("Title", ""), b.get("PwnCount"),
+          ", ".join(b.get("DataClasses", [])), f"https://haveibeenpwned.com/PwnedWebsites#{b.get('Name', '')}")
+         for b in breaches),
+        columns=["domain", "date", "title", "record_count", "data_classes", "source_url"]
+    )
+    df["source"] = "HIBP"
+    df["country"] = ""
+    df["record_count"] = _record_counts(df["record_count"])
+    return _finish(df)
+
+
+def b1nd_frame(path: Path = B1ND_DATA_FILE) -> pd.DataFrame:
+    """The B1ND CSV, read straight into columns (its Date column holds years)"""
+    raw = pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+    year = raw["Date"].str.extract(_YEAR_PATTERN)[0]
+    df = pd.DataFrame({
+        "domain": raw["Website"],
+        "date": (year + "-01-01").fillna(""),
+        "title": raw["Website"].str.strip().str.split(".", n=1).str[0] + " Data Breach",
+        "record_count": _record_counts(raw["Record Count"]),
+        "data_classes": raw["Compromised Data"].fillna(""),
+        "source_url": "",
+        "source": "B1ND",
+        "country": raw["Website Country"].fillna(""),
+    })
+    return _finish(df)
+
+
+def incidents_frame(incidents: List[Dict]) -> pd.DataFrame:
+    """Incident dicts from the pipeline (sources.yaml ingestion), one row per organization"""
+    df = pd.DataFrame.from_records(incidents, columns=[
+        "organizations", "date", "title", "record_count", "compromised_data", "source_url",
+        "source", "country"
+    ]).explode("organizations")
+    df = df.rename(columns={"organizations": "domain", "compromised_data": "data_classes"})
+    df["data_classes"] = df["data_classes"].map(lambda v: ", ".join(v) if isinstance(v, list) else (v or ""))
+    df["record_count"] = _record_counts(df["record_count"])
+    return _finish(df)
+
+
+def build_breach_table(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate per-source frames; drops rows without a domain and exact duplicates"""
+    frames = [f.astype({"source": str, "country": str}) for f in frames]
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=BREACH_COLUMNS)
+    table = table[table["domain"].str.contains(".", regex=False)]
+    table = table.drop_duplicates(subset=["domain", "source", "date"]).reset_index(drop=True)
+    for column in ("source", "country"):
+        table[column] = table[column].astype("category")
+    logger.info(f"Breach table: {len(table)} rows, {table['domain'].nunique()} domains "
+                f"from {table['source'].nunique()} sources")
+    return table
+
+
+def enrichment_table(store=None) -> pd.DataFrame:
+    """Latest cached enrichment per domain (from the history store), indexed by domain"""
+    if store is None:
+        from modules.history_store import HistoryStore
+        store = HistoryStore()
+    rows = store.query_domains(latest_only=True)
+    df = pd.DataFrame([dict(r) for r in rows],
+                      columns=["domain", "company_name", "company_size", "cdn", "security", "country",
+                               "region", "run_ts"])
+    df = df.rename(columns={"country": "country_code"})
+    # History is keyed by website (www.acme.com, shop.acme.com); keep the newest per company
+    df["domain"] = normalize_domains(df["domain"])
+    df = df.sort_values("run_ts", ascending=False).drop_duplicates("domain")
+    return df.set_index("domain")[ENRICHMENT_COLUMNS]
+
+
+def join_enrichment(table: pd.DataFrame, enrichment: pd.DataFrame) -> pd.DataFrame:
+    """Left join; rows for domains with no cached enrichment have NaN enrichment columns"""
+    return table.join(enrichment, on="domain")
+
+
+def missing_domains(table: pd.DataFrame, enrichment: pd.DataFrame) -> pd.Index:
+    """Anti-join: distinct domains in the table with no cached enrichment"""
+    domains = pd.Index(table["domain"].unique())
+    return domains.difference(enrichment.index)
+
+
+def enrich_missing(table: pd.DataFrame, enrichment: pd.DataFrame,
+                   enrich_fn: Callable[[str], OrgEnrichment], limit: Optional[int] = None,
+                   max_workers: int = 10, store=None) -> pd.DataFrame:
+    """Look up only the anti-join domains (most recent breaches first, up to `limit`),
+    store them in the history store and return the extended enrichment table"""
+    missing = missing_domains(table, enrichment)
+    if missing.empty:
+        return enrichment
+    latest = table[table["domain"].isin(missing)].groupby("domain", observed=True)["date"].max()
+    todo = latest.sort_values(ascending=False).index[:limit].tolist()
+    logger.info(f"{len(missing)} domains lack cached enrichment; looking up {len(todo)}")
+
+    results: Dict[str, OrgEnrichment] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(enrich_fn, d): d for d in todo}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                logger.error(f"Enrichment failed for {futures[future]}: {e}")
+    if not results:
+        return enrichment
+
+    if store is None:
+        from modules.history_store import HistoryStore
+        store = HistoryStore()
+    store.record_snapshots(results)
+
+    from modules.history_store import split_country
+    new = pd.DataFrame.from_records(
+        ((d, o.company_name, str(o.company_size), o.cdn, o.security, *split_country(o.country))
+         for d, o in results.items()),
+        columns=["domain"] + ENRICHMENT_COLUMNS
+    ).set_index("domain")
+    return pd.concat([enrichment, new])
+
+
+def filter_table(df: pd.DataFrame, regions: Optional[Iterable[str]] = None, since: Optional[str] = None,
+                 exclude_sizes: Optional[Iterable[str]] = EXCLUDED_SIZES,
+                 enriched_only: bool = False) -> pd.DataFrame:
+    """Region / size / date filters as column masks over a joined table"""
+    mask = pd.Series(True, index=df.index)
+    if since:
+        mask &= df["date"] > since  # ISO dates compare as strings
+    if regions:
+        mask &= df["region"].isin(list(regions))
+    if exclude_sizes:
+        mask &= ~df["company_size"].isin(list(exclude_sizes))
+    if enriched_only:
+        mask &= df["company_name"].notna()
+    return df[mask]
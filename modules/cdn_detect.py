@@ -0,0 +1,153 @@
+import logging
+import socket
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from config.settings import CDN_PROBE_TIMEOUT, CDN_CACHE_TTL, CDN_CACHE_SIZE
+from utils.http_cassette import register_session
+from utils.ttl_cache import TTLCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# CDN fingerprints: CNAME suffixes in the domain's alias chain, and response headers
+# ({header: lowercase substring of its value, "" = header present}). "waf" names the
+# WAF that sits in front of the site whenever the CDN matches (same names as detect_waf).
+CDN_SIGNATURES: List[Dict] = [
+    {"name": "Cloudflare", "cname": ("cdn.cloudflare.net", "cloudflare.net"),
+     "headers": {"cf-ray": "", "cf-cache-status": "", "server": "cloudflare"}, "waf": "Cloudflare"},
+    {"name": "Akamai", "cname": ("akamaiedge.net", "akamai.net", "edgekey.net", "edgesuite.net",
+                                 "akamaihd.net", "akamaitechnologies.com", "akamaized.net"),
+     "headers": {"server": "akamaighost", "akamai-grn": "", "x-akamai-transformed": "",
+                 "x-akamai-request-id": ""}, "waf": "Akamai"},
+    {"name": "Amazon CloudFront", "cname": ("cloudfront.net",),
+     "headers": {"x-amz-cf-id": "", "x-amz-cf-pop": "", "via": "cloudfront"}},
+    {"name": "Fastly", "cname": ("fastly.net", "fastlylb.net"),
+     "headers": {"x-fastly-request-id": "", "fastly-debug-digest": "", "x-served-by": "cache-"}},
+    {"name": "Imperva", "cname": ("incapdns.net", "impervadns.net"),
+     "headers": {"x-iinfo": "", "x-cdn": "imperva"}, "waf": "Imperva"},
+    {"name": "Sucuri", "cname": ("sucuri.net", "sucuridns.com"),
+     "headers": {"x-sucuri-id": "", "x-sucuri-cache": "", "server": "sucuri"}, "waf": "Sucuri"},
+    {"name": "Azure Front Door", "cname": ("azurefd.net", "azureedge.net", "t-msedge.net"),
+     "headers": {"x-azure-ref": "", "x-msedge-ref": ""}},
+    {"name": "Google Cloud CDN", "cname": ("googlehosted.com",),
+     "headers": {"via": "1.1 google"}},
+    {"name": "Edgio", "cname": ("edgecastcdn.net", "systemcdn.net", "edgio.net", "llnwd.net"),
+     "headers": {"server": "ecacc", "x-ec-custom-error": ""}},
+    {"name": "StackPath", "cname": ("stackpathdns.com", "stackpathcdn.com", "hwcdn.net"),
+     "headers": {"x-hw": "", "server": "stackpath"}, "waf": "StackPath"},
+    {"name": "DDoS-Guard", "cname": ("ddos-guard.net",),
+     "headers": {"server": "ddos-guard"}, "waf": "DDoS-GUARD"},
+    {"name": "Bunny CDN", "cname": ("b-cdn.net",), "headers": {"server": "bunnycdn", "cdn-requestid": ""}},
+    {"name": "KeyCDN", "cname": ("kxcdn.com",), "headers": {"server": "keycdn"}},
+    {"name": "CDN77", "cname": ("cdn77.org", "cdn77.net"), "headers": {"server": "cdn77"}},
+    {"name": "Gcore", "cname": ("gcdn.co", "gcorelabs.net"), "headers": {"server": "gcore"}},
+    {"name": "Vercel", "cname": ("vercel-dns.com",), "headers": {"x-vercel-id": "", "server": "vercel"}},
+    {"name": "Netlify", "cname": ("netlify.app", "netlifyglobalcdn.com"),
+     "headers": {"x-nf-request-id": "", "server": "netlify"}},
+]
+
+
+class EdgeProbe:
+    """What one DNS lookup and one HEAD request reveal about a domain's edge"""
+    __slots__ = ("domain", "cnames", "ips", "status", "headers", "error")
+
+    def __init__(self, domain: str, cnames: List[str], ips: List[str], status: Optional[int],
+                 headers: Dict[str, str], error: Optional[str] = None):
+        self.domain = domain
+        self.cnames = cnames
+        self.ips = ips
+        self.status = status
+        self.headers = headers
+        self.error = error
+
+
+def resolve_chain(domain: str) -> Tuple[List[str], List[str]]:
+    """(CNAME chain, IPv4 addresses) of the domain; both empty if it doesn't resolve"""
+    try:
+        canonical, aliases, ips = socket.gethostbyname_ex(domain)
+    except (socket.error, UnicodeError):
+        return [], []
+    chain = [name.lower().rstrip(".") for name in list(aliases) + [canonical]]
+    return [name for name in chain if name != domain], list(ips)
+
+
+def _suffix_match(name: str, suffix: str) -> bool:
+    return name == suffix or name.endswith("." + suffix)
+
+
+def classify(probe: EdgeProbe) -> Tuple[Optional[Dict], str]:
+    """(matching signature or None, "cname"/"headers"/"none"); CNAMEs win over headers"""
+    for signature in CDN_SIGNATURES:
+        if any(_suffix_match(name, suffix) for name in probe.cnames for suffix in signature["cname"]):
+            return signature, "cname"
+    for signature in CDN_SIGNATURES:
+        for header, needle in signature["headers"].items():
+            value = probe.headers.get(header)
+            if value is not None and needle in value.lower():
+                return signature, "headers"
+    return None, "none"
+
+
+class CdnDetector:
+    """Local CDN classifier: the domain's CNAME chain plus the headers of a single HEAD
+    request, matched against CDN_SIGNATURES. No third-party API.
+
+    Probes are cached per domain (CDN_CACHE_TTL) and concurrent callers share one probe, so
+    the WAF stage can read the same response (waf_from_headers) without connecting again.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, timeout: float = CDN_PROBE_TIMEOUT,
+                 cache_ttl: float = CDN_CACHE_TTL, cache_size: int = CDN_CACHE_SIZE):
+        if session is None:
+            session = register_session(requests.Session())
+            session.headers.update({"user-agent": "CelestraBreachMonitor/1.0"})
+        self.session = session
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.flight = SingleFlight()
+        self.stats = Counter()
+
+    def _head(self, domain: str) -> Tuple[Optional[int], Dict[str, str], Optional[str]]:
+        error = None
+        for scheme in ("https", "http"):
+            try:
+                response = self.session.head(f"{scheme}://{domain}/", timeout=self.timeout,
+                                             allow_redirects=False)
+                response.close()
+                return response.status_code, {k.lower(): v for k, v in response.headers.items()}, None
+            except requests.RequestException as e:
+                error = str(e)
+        return None, {}, error
+
+    def _probe(self, domain: str) -> EdgeProbe:
+        cnames, ips = resolve_chain(domain)
+        status, headers, error = self._head(domain) if ips else (None, {}, "does not resolve")
+        if error:
+            logger.debug(f"[CDN] HEAD {domain} failed: {error}")
+        probe = EdgeProbe(domain, cnames, ips, status, headers, error)
+        self.cache.set(domain, probe)
+        return probe
+
+    def probe(self, domain: str) -> EdgeProbe:
+        probe = self.cache.get(domain)
+        if probe is None:
+            probe = self.flight.do(domain, lambda: self._probe(domain))
+        return probe
+
+    def detect(self, domain: str) -> str:
+        """CDN name for the domain, "None" if no signature matches"""
+        probe = self.probe(domain)
+        signature, matched_by = classify(probe)
+        self.stats[matched_by if probe.ips else "unresolved"] += 1
+        return signature["name"] if signature else "None"
+
+    def waf_from_headers(self, domain: str) -> Optional[str]:
+        """WAF implied by the (cached) probe, e.g. Cloudflare from cf-ray; None if nothing is implied"""
+        signature, _ = classify(self.probe(domain))
+        return signature.get("waf") if signature else None
+
+    def summary(self) -> str:
+        return (f"{self.stats['cname']} by CNAME, {self.stats['headers']} by headers, "
+                f"{self.stats['none']} without a CDN, {self.stats['unresolved']} unresolved")
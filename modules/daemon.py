@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import signal
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config.settings import DAEMON_SEEN_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+def incident_key(incident: Dict) -> str:
+    """Stable identity of a fetched incident, used to spot what is new since the last cycle"""
+    parts = [str(incident.get(f) or "") for f in ("source", "date", "source_url", "title")]
+    parts.append(",".join(str(o) for o in (incident.get("organizations") or [])))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class ChangeTracker:
+    """Remembers which incidents earlier cycles already processed.
+
+    Keys are only committed after a cycle's output was written, so incidents from a
+    failed cycle are picked up again by the next one.
+    """
+
+    def __init__(self, retention_days: float = DAEMON_SEEN_RETENTION_DAYS):
+        self.retention = retention_days * 86400
+        self._seen: Dict[str, float] = {}
+
+    def __len__(self):
+        return len(self._seen)
+
+    def new(self, incidents: Iterable[Dict]) -> List[Dict]:
+        fresh, keys = [], set()
+        for incident in incidents:
+            key = incident_key(incident)
+            if key not in self._seen and key not in keys:
+                keys.add(key)
+                fresh.append(incident)
+        return fresh
+
+    def commit(self, incidents: Iterable[Dict]):
+        now = time.time()
+        for incident in incidents:
+            self._seen[incident_key(incident)] = now
+        cutoff = now - self.retention
+        self._seen = {k: t for k, t in self._seen.items() if t >= cutoff}
+
+
+class PollingDaemon:
+    """Runs `cycle(due_names)` whenever one or more named sources are due.
+
+    `intervals` maps a source name to its polling interval in seconds. Every source is
+    due on the first cycle. SIGTERM/SIGINT stop the loop after the cycle in progress
+    has finished; a second signal exits immediately.
+    """
+
+    def __init__(self, intervals: Dict[str, float], cycle: Callable[[List[str]], None]):
+        self.intervals = intervals
+        self.cycle = cycle
+        self.next_due = {name: 0.0 for name in intervals}
+        self.cycles = 0
+        self._stop = threading.Event()
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        return [name for name, at in self.next_due.items() if at <= now]
+
+    def stop(self, signum=None, frame=None):
+        if self._stop.is_set():
+            logger.warning("Second stop signal; exiting immediately")
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            raise KeyboardInterrupt
+        logger.info(f"Stop requested (signal {signum}); finishing the current cycle")
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run_forever(self, max_cycles: Optional[int] = None):
+        logger.info(f"Daemon started; polling {len(self.intervals)} sources")
+        while not self._stop.is_set():
+            due = self.due()
+            if not due:
+                wait = max(0.0, min(self.next_due.values()) - time.time())
+                self._stop.wait(wait)
+                continue
+
+            started = time.time()
+            for name in due:
+                self.next_due[name] = started + self.intervals[name]
+            try:
+                self.cycle(due)
+            except Exception as e:
+                logger.exception(f"Cycle for {', '.join(due)} failed: {e}")
+            self.cycles += 1
+            logger.info(f"Cycle {self.cycles} ({len(due)} sources) took {time.time() - started:.1f}s")
+            if max_cycles is not None and self.cycles >= max_cycles:
+                break
+        logger.info("Daemon stopped")
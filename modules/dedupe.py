@@ -0,0 +1,169 @@
+import logging
+import re
+import zlib
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional
+
+from config.settings import DEDUPE_DATE_WINDOW_DAYS, DEDUPE_TEXT_THRESHOLD
+from utils.domains import primary_domain
+
+logger = logging.getLogger(__name__)
+
+# MinHash / LSH parameters: 16 bands x 4 rows puts the LSH threshold near 0.5
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = (1 << 31) - 1
+_permutations = None
+_WORD_RE = re.compile(r"\w+")
+
+
+def _day_number(value: str) -> Optional[int]:
+    """Day ordinal from a YYYY-MM-DD prefix, None if missing/invalid"""
+    try:
+        return date(int(value[:4]), int(value[5:7]), int(value[8:10])).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_permutations():
+    """(a, b) coefficients of the MinHash permutations; numpy is only imported when text dedupe runs"""
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+        rng = np.random.RandomState(1)
+        _permutations = (
+            rng.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64),
+            rng.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+        )
+    return _permutations
+
+
+def minhash_signature(text: str):
+    """MinHash signature (numpy array) over word shingles; None for texts too short to shingle"""
+    import numpy as np
+
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) & _MERSENNE_PRIME for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    perm_a, perm_b = _get_permutations()
+    return ((np.outer(perm_a, hashes) + perm_b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the earliest index as root so the highest-priority incident survives
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _is_year_only(incident: Dict) -> bool:
+    value = str(incident.get("date") or "")
+    return incident.get("date_precision") == "year" or (len(value) == 4 and value.isdigit())
+
+
+def _cluster_by_domain(incidents: List[Dict], uf: _UnionFind, window_days: int):
+    """Union incidents on the same registrable domain whose dates fall within the window.
+
+    Each cluster is anchored at its earliest date and ends `window_days` later, so monthly
+    reports of one domain don't chain into a single cluster. A year-only date (B1ND) joins
+    the domain's first cluster anchored in that year, or its year's own cluster.
+    """
+    by_domain = defaultdict(list)
+    for idx, incident in enumerate(incidents):
+        orgs = incident.get("organizations") or []
+        if orgs and "." in orgs[0]:
+            by_domain[primary_domain(orgs[0])].append(idx)
+
+    for members in by_domain.values():
+        if len(members) < 2:
+            continue
+        dated, year_only = [], []
+        for idx in members:
+            incident = incidents[idx]
+            day = _day_number(incident.get("date", ""))
+            if _is_year_only(incident):
+                year_only.append((str(incident.get("date"))[:4], idx))
+            elif day is None:
+                # Undated reports can't be placed in a window; attach to the domain's first incident
+                uf.union(members[0], idx)
+            else:
+                dated.append((day, idx))
+
+        dated.sort()
+        anchors = {}  # year -> first cluster anchor (index) in that year
+        anchor_day, anchor_idx = None, None
+        for day, idx in dated:
+            if anchor_day is not None and day - anchor_day <= window_days:
+                uf.union(anchor_idx, idx)
+                continue
+            anchor_day, anchor_idx = day, idx
+            anchors.setdefault(str(date.fromordinal(day).year), idx)
+
+        for year, idx in year_only:
+            if year in anchors:
+                uf.union(anchors[year], idx)
+            else:
+                anchors[year] = idx
+
+
+def _cluster_by_text(incidents: List[Dict], uf: _UnionFind, threshold: float):
+    """Union article incidents whose raw_content is near-identical (MinHash + LSH banding)"""
+    signatures = {}
+    for idx, incident in enumerate(incidents):
+        if incident.get("scrape_content"):
+            sig = minhash_signature(f"{incident.get('title', '')} {incident.get('raw_content', '')}")
+            if sig is not None:
+                signatures[idx] = sig
+
+    buckets = defaultdict(list)
+    for idx, sig in signatures.items():
+        for band in range(LSH_BANDS):
+            buckets[(band, sig[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes())].append(idx)
+
+    checked = set()
+    for members in buckets.values():
+        for i in range(1, len(members)):
+            pair = (members[0], members[i])
+            if pair in checked:
+                continue
+            checked.add(pair)
+            if (signatures[pair[0]] == signatures[pair[1]]).mean() >= threshold:
+                uf.union(*pair)
+
+
+def deduplicate_incidents(incidents: List[Dict], window_days: int = DEDUPE_DATE_WINDOW_DAYS,
+                          text_threshold: float = DEDUPE_TEXT_THRESHOLD) -> List[Dict]:
+    """Collapse the same breach reported by several sources.
+
+    Incidents are grouped by registrable domain and breach-date window, and article
+    incidents are additionally matched by MinHash/LSH over their text. Input order is
+    the priority order, so the first incident of each group is kept.
+    """
+    if not incidents:
+        return []
+
+    uf = _UnionFind(len(incidents))
+    _cluster_by_domain(incidents, uf, window_days)
+    _cluster_by_text(incidents, uf, text_threshold)
+
+    deduped = [incident for idx, incident in enumerate(incidents) if uf.find(idx) == idx]
+    logger.info(f"Deduplicated {len(incidents)} incidents to {len(deduped)}.")
+    return deduped
@@ -0,0 +1,152 @@
+import ipaddress
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import EDGE_STATE_DB, EDGE_MAX_AGE_DAYS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS edge_state (
+    domain TEXT PRIMARY KEY,
+    ips TEXT NOT NULL,
+    prefixes TEXT NOT NULL,
+    asn TEXT,
+    cdn TEXT,
+    country TEXT,
+    waf TEXT,
+    checked_at REAL NOT NULL
+)
+"""
+
+
+def resolve_ips(domain: str) -> List[str]:
+    """Sorted, de-duplicated A/AAAA answers for the domain ([] if it doesn't resolve)"""
+    try:
+        infos = socket.getaddrinfo(domain, None, proto=socket.IPPROTO_TCP)
+    except socket.error:
+        return []
+    return sorted({info[4][0] for info in infos})
+
+
+def ip_prefixes(ips: List[str]) -> List[str]:
+    """/24 (IPv4) or /48 (IPv6) networks covering the addresses"""
+    prefixes = set()
+    for ip in ips:
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            continue
+        length = 24 if addr.version == 4 else 48
+        prefixes.add(str(ipaddress.ip_network(f"{ip}/{length}", strict=False)))
+    return sorted(prefixes)
+
+
+class EdgeStateStore:
+    """Per-domain record of resolved IPs, ASN and the last CDN/WAF result"""
+
+    def __init__(self, db_path: Path = EDGE_STATE_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(SCHEMA)
+
+    def get(self, domain: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute("SELECT * FROM edge_state WHERE domain = ?", (domain,)).fetchone()
+
+    def put(self, domain: str, ips: List[str], asn: str, cdn: str, country: str, waf: str,
+            checked_at: Optional[float] = None):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO edge_state (domain, ips, prefixes, asn, cdn, country, waf, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (domain, ",".join(ips), ",".join(ip_prefixes(ips)), asn, cdn, country, waf,
+                 checked_at if checked_at is not None else time.time())
+            )
+
+    def count_fresh(self, domains: List[str], max_age: float) -> int:
+        """How many of the domains have a stored result younger than max_age seconds"""
+        cutoff = time.time() - max_age
+        fresh = 0
+        with self._lock:
+            for i in range(0, len(domains), 500):
+                chunk = domains[i:i + 500]
+                fresh += self.conn.execute(
+                    f"SELECT COUNT(*) FROM edge_state WHERE checked_at >= ? AND domain IN ({','.join('?' * len(chunk))})",
+                    [cutoff] + chunk
+                ).fetchone()[0]
+        return fresh
+
+    def touch(self, domain: str, ips: List[str]):
+        """Record the current DNS answers without changing the stored results"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE edge_state SET ips = ?, prefixes = ? WHERE domain = ?",
+                (",".join(ips), ",".join(ip_prefixes(ips)), domain)
+            )
+
+
+class EdgeRevalidator:
+    """Decides when a domain's CDN/WAF result has to be recomputed.
+
+    - Same IP set or same /24 (/48) prefixes, and younger than max_age: reuse everything
+      (one DNS lookup, no IPinfo call, no WAF scan).
+    - DNS moved but IPinfo reports the same ASN: reuse the WAF result, refresh CDN/country.
+    - Otherwise (new ASN, no history, or too old): full IPinfo lookup and WAF scan.
+    """
+
+    def __init__(self, store: EdgeStateStore = None, max_age_days: float = EDGE_MAX_AGE_DAYS,
+                 enabled: bool = True):
+        self.store = store or EdgeStateStore()
+        self.max_age = max_age_days * 86400
+        self.enabled = enabled
+        self.stats = Counter()
+
+    def lookup(self, domain: str, get_details: Callable[[str], Dict[str, str]],
+               scan_waf: Callable[[str], str]) -> Tuple[str, str, str]:
+        """(cdn, country, waf) for the domain, using the stored result when still valid.
+
+        `get_details(domain)` returns IPinfo fields {"asn", "cdn", "country"}; `scan_waf(domain)`
+        runs the expensive WAF probe.
+        """
+        ips = resolve_ips(domain)
+        state = self.store.get(domain) if self.enabled else None
+        fresh = state is not None and time.time() - state["checked_at"] < self.max_age
+
+        if fresh and ips:
+            if ",".join(ips) == state["ips"] or ",".join(ip_prefixes(ips)) == state["prefixes"]:
+                self.stats["dns_unchanged"] += 1
+                if ",".join(ips) != state["ips"]:
+                    self.store.touch(domain, ips)
+                return state["cdn"], state["country"], state["waf"]
+
+        details = get_details(domain)
+        asn = details.get("asn") or ""
+
+        if fresh and asn and asn == state["asn"]:
+            self.stats["asn_unchanged"] += 1
+            waf = state["waf"]
+            checked_at = state["checked_at"]  # WAF result keeps its original age
+        else:
+            self.stats["scanned"] += 1
+            waf = scan_waf(domain)
+            checked_at = None
+
+        # Only cache lookups that actually succeeded
+        if asn and waf != "Timeout":
+            self.store.put(domain, ips, asn, details["cdn"], details["country"], waf, checked_at)
+        return details["cdn"], details["country"], waf
+
+    def summary(self) -> str:
+        return (f"{self.stats['dns_unchanged']} reused (DNS unchanged), "
+                f"{self.stats['asn_unchanged']} reused (same ASN), "
+                f"{self.stats['scanned']} scanned")
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import socketserver
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from config.settings import SERVICE_CACHE_TTL, SERVICE_CACHE_SIZE, SERVICE_MAX_BATCH
+from models.records import OrgEnrichment, ContactEnrichment
+from utils.domains import clean_host, group_by_registrable
+from utils.ttl_cache import TTLCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class EnrichmentService:
+    """Cached, coalesced domain enrichment and contact lookup.
+
+    Answers are cached for SERVICE_CACHE_TTL. Concurrent requests for the same domain
+    share one upstream lookup, and every lookup goes through the process-wide Apollo rate
+    limiter and quota ledger, so callers can't push the vendors past their limits.
+    """
+
+    def __init__(self, enrich_org: Callable[[str], OrgEnrichment],
+                 fetch_contact: Callable[[str], ContactEnrichment], max_workers: int = 10,
+                 cache_ttl: float = SERVICE_CACHE_TTL, cache_size: int = SERVICE_CACHE_SIZE):
+        self.lookups = {"enrich": enrich_org, "contacts": fetch_contact}
+        self.caches = {kind: TTLCache(maxsize=cache_size, ttl=cache_ttl) for kind in self.lookups}
+        self.flights = {kind: SingleFlight() for kind in self.lookups}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="enrich")
+        self.started = time.time()
+
+    def _lookup(self, kind: str, domain: str) -> Dict:
+        """Upstream lookup for a cache miss, shared with any concurrent request for the domain"""
+        cache = self.caches[kind]
+
+        def compute():
+            row = self.lookups[kind](domain).to_row()
+            cache.set(domain, row)
+            return row
+        return self.flights[kind].do(domain, compute)
+
+    def lookup_many(self, kind: str, domains: List[str]) -> Dict[str, Dict]:
+        """{host: row} for a batch. Hosts are looked up once per registrable domain
+        (www.acme.com and shop.acme.com share acme.com's answer); cached domains are
+        answered without touching the pool."""
+        groups = group_by_registrable(dict.fromkeys(clean_host(d) for d in domains if d))
+        results, pending = {}, []
+        for domain in groups:
+            cached = self.caches[kind].get(domain)
+            if cached is not None:
+                results[domain] = cached
+            else:
+                pending.append(domain)
+
+        futures = {domain: self.pool.submit(self._lookup, kind, domain) for domain in pending}
+        for domain, future in futures.items():
+            try:
+                results[domain] = future.result()
+            except Exception as e:
+                logger.error(f"[Service] {kind} lookup failed for {domain}: {e}")
+                results[domain] = {"error": str(e)}
+        return {host: results[domain] for domain, hosts in groups.items() for host in hosts}
+
+    def stats(self) -> Dict:
+        return {
+            "uptime_seconds": round(time.time() - self.started),
+            **{kind: {"cached": len(self.caches[kind]), "hits": self.caches[kind].hits,
+                      "misses": self.caches[kind].misses, "coalesced": self.flights[kind].coalesced}
+               for kind in self.lookups}
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """GET /enrich?domain=a.com&domain=b.com, POST /enrich {"domains": [...]}, same for
+    /contacts; GET /health and /stats"""
+    server_version = "CelestraEnrichment/1.0"
+
+    @property
+    def service(self) -> EnrichmentService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.debug(f"[Service] {format % args}")
+
+    def _send(self, status: int, payload: Dict):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, domains: Optional[List[str]]):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/health":
+            return self._send(200, {"status": "ok"})
+        if path == "/stats":
+            return self._send(200, self.service.stats())
+
+        kind = path.lstrip("/")
+        if kind not in self.service.lookups:
+            return self._send(404, {"error": f"unknown endpoint {path}"})
+        if not domains:
+            return self._send(400, {"error": "no domains given"})
+        if len(domains) > SERVICE_MAX_BATCH:
+            return self._send(413, {"error": f"at most {SERVICE_MAX_BATCH} domains per request"})
+        self._send(200, {"results": self.service.lookup_many(kind, domains)})
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        self._route(query.get("domain", []))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self._send(413, {"error": "request body too large"})
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            domains = payload.get("domains") or ([payload["domain"]] if payload.get("domain") else [])
+        except (ValueError, AttributeError):
+            return self._send(400, {"error": "body must be JSON like {\"domains\": [...]}"})
+        if not isinstance(domains, list):
+            return self._send(400, {"error": "domains must be a list"})
+        self._route(domains)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)  # handlers expect a (host, port) client address
+
+
+def make_server(service: EnrichmentService, host: str = "127.0.0.1", port: int = 0,
+                unix_socket: Optional[str] = None) -> socketserver.BaseServer:
+    """HTTP server on host:port, or on a Unix socket when `unix_socket` is given"""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = _UnixHTTPServer(unix_socket, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.service = service
+    return server
@@ -1,14 +1,54 @@
 import gspread
+import json
+import math
+import time
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from datetime import datetime
 from google.oauth2.service_account import Credentials
-from config.settings import GOOGLE_CREDS_JSON, SHEET_NAME
+from config.settings import (
+    SHEET_NAME, SHEETS_MAX_ROWS_PER_TAB, SHEETS_MAX_REQUEST_BYTES, SHEETS_RATE_LIMIT_BACKOFF,
+    SHEETS_RATE_LIMIT_RETRIES, require_google_credentials
+)
+from models.records import IncidentRecord, SHEET_COLUMNS
 import os
-from gspread_formatting import *
+
+# Header style and column widths (pixels, in SHEET_COLUMNS order)
+HEADER_FORMAT = {
+    "textFormat": {"bold": True, "fontSize": 12, "foregroundColor": {"red": 1, "green": 1, "blue": 1}},
+    "backgroundColor": {"red": 0.2, "green": 0.4, "blue": 0.6},
+    "horizontalAlignment": "CENTER"
+}
+COLUMN_WIDTHS = [
+    100,  # Date of Breach
+    200,  # Company Name
+    150,  # Company Website
+    100,  # Company Size
+    150,  # Type of Breach
+    100,  # CDN
+    100,  # Security
+    100,  # Country
+    150,  # Contact Name
+    150,  # Contact Title
+    120,  # Contact Phone
+    150,  # Contact Email
+    150,  # LinkedIn URL
+    100   # Source
+]
+
 
 class GoogleSheetsExporter:
-    def __init__(self, creds_path=GOOGLE_CREDS_JSON, sheet_name=SHEET_NAME):
+    """Monthly tabs of exported incidents.
+
+    Exports are sent as a few spreadsheet-level requests: one batchUpdate creates, clears
+    and sizes the tabs and applies all formatting, then the values go out in
+    values.batchUpdate calls of at most SHEETS_MAX_REQUEST_BYTES. A month with more than
+    SHEETS_MAX_ROWS_PER_TAB rows continues in "April 2025 (2)", "April 2025 (3)", ...
+    """
+
+    def __init__(self, creds_path=None, sheet_name=SHEET_NAME, max_rows_per_tab=SHEETS_MAX_ROWS_PER_TAB,
+                 max_request_bytes=SHEETS_MAX_REQUEST_BYTES):
+        creds_path = creds_path or require_google_credentials()
         self.scope = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive"
@@ -17,128 +57,194 @@ class GoogleSheetsExporter:
         self.client = gspread.authorize(self.creds)
         self.sheet_name = sheet_name
         self.sheet = None
-        # Initialize formatting objects if gspread_formatting is available
-        try:
-            from gspread_formatting import (
-                CellFormat,
-                TextFormat,
-                Color,
-                format_cell_range,
-                set_column_widths,
-                cellFormat,  # Note the lowercase 'c' (this is correct)
-                numberFormat
-            )
-            self.formatting = True
-            self.fmt = CellFormat(
-                textFormat=TextFormat(bold=True, fontSize=12, foregroundColor=Color(1, 1, 1)),
-                backgroundColor=Color(0.2, 0.4, 0.6),
-                horizontalAlignment='CENTER'
-            )
-        except ImportError:
-            self.formatting = False
-            print("gspread_formatting not available - formatting will be limited")
+        self.max_rows_per_tab = max_rows_per_tab
+        self.max_request_bytes = max_request_bytes
 
     def _get_monthly_tab_name(self):
         """Generates the current month-year as the tab name (e.g., 'April 2025')."""
         now = datetime.now()
         return now.strftime("%B %Y")
 
-    def _format_header(self, worksheet):
-        """Apply beautiful formatting to the header row with updated column widths."""
-        if not self.formatting:
-            return
-            
-        try:
-            from gspread_formatting import (
-                format_cell_range,
-                set_column_widths,
-                cellFormat,
-                numberFormat
-            )
-            
-            # Format header row (A1:N1)
-            format_cell_range(worksheet, '1:1', self.fmt)
-            
-            # Freeze header row
-            worksheet.freeze(rows=1)
-            
-            # Set column widths for the new column order
-            set_column_widths(worksheet, [
-                ('A:A', 100),    # Date of Breach
-                ('B:B', 200),    # Company Name
-                ('C:C', 150),    # Company Website
-                ('D:D', 100),    # Company Size
-                ('E:E', 150),    # Type of Breach
-                ('F:F', 100),    # CDN
-                ('G:G', 100),    # Security
-                ('H:H', 100),    # Country
-                ('I:I', 150),    # Contact Name
-                ('J:J', 150),    # Contact Title
-                ('K:K', 120),    # Contact Phone
-                ('L:L', 150),    # Contact Email
-                ('M:M', 150),    # LinkedIn URL
-                ('N:N', 100)     # Source
-            ])
-            
-            # Format date column
-            date_fmt = cellFormat(
-                numberFormat=numberFormat('DATE', 'yyyy-mm-dd')
+    def shard_title(self, index: int, base: str = None) -> str:
+        """Title of the index-th tab of the month: 'April 2025', 'April 2025 (2)', ..."""
+        base = base or self._get_monthly_tab_name()
+        return base if index == 0 else f"{base} ({index + 1})"
+
+    def _open_spreadsheet(self):
+        if self.sheet is None:
+            self.sheet = self.client.open(self.sheet_name)
+        return self.sheet
+
+    def _api(self, method: str, *args, **kwargs):
+        """Call a spreadsheet API method, waiting out the per-minute quota when it answers 429.
+        A refused request wrote nothing, so retrying it can't duplicate rows."""
+        for attempt in range(SHEETS_RATE_LIMIT_RETRIES + 1):
+            try:
+                return getattr(self._open_spreadsheet(), method)(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status != 429 or attempt == SHEETS_RATE_LIMIT_RETRIES:
+                    raise
+                wait = SHEETS_RATE_LIMIT_BACKOFF * 2 ** attempt
+                print(f"[GoogleSheetsExporter] Write quota exhausted; retrying {method} in {wait}s")
+                time.sleep(wait)
+
+    def _sheet_ids(self) -> Dict[str, int]:
+        """{tab title: sheetId} (one metadata request)"""
+        metadata = self._api("fetch_sheet_metadata")
+        return {s["properties"]["title"]: s["properties"]["sheetId"] for s in metadata["sheets"]}
+
+    def month_shards(self, sheet_ids: Dict[str, int] = None) -> List[str]:
+        """This month's existing tabs, in shard order"""
+        sheet_ids = self._sheet_ids() if sheet_ids is None else sheet_ids
+        titles = []
+        while self.shard_title(len(titles)) in sheet_ids:
+            titles.append(self.shard_title(len(titles)))
+        return titles
+
+    @staticmethod
+    def _format_requests(sheet_id: int, cols: int) -> List[Dict]:
+        """Header style, frozen header, column widths and the date column, as batchUpdate requests"""
+        requests = [
+            {"repeatCell": {
+                "range": {"sheetId": sheet_id, "startRowIndex": 0, "endRowIndex": 1},
+                "cell": {"userEnteredFormat": HEADER_FORMAT},
+                "fields": "userEnteredFormat(textFormat,backgroundColor,horizontalAlignment)"
+            }},
+            {"updateSheetProperties": {
+                "properties": {"sheetId": sheet_id, "gridProperties": {"frozenRowCount": 1}},
+                "fields": "gridProperties.frozenRowCount"
+            }},
+            {"repeatCell": {
+                "range": {"sheetId": sheet_id, "startRowIndex": 1, "startColumnIndex": 0, "endColumnIndex": 1},
+                "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "yyyy-mm-dd"}}},
+                "fields": "userEnteredFormat.numberFormat"
+            }}
+        ]
+        for index, width in enumerate(COLUMN_WIDTHS[:cols]):
+            requests.append({"updateDimensionProperties": {
+                "range": {"sheetId": sheet_id, "dimension": "COLUMNS", "startIndex": index, "endIndex": index + 1},
+                "properties": {"pixelSize": width},
+                "fields": "pixelSize"
+            }})
+        return requests
+
+    def prepare_tabs(self, data_rows: int, cols: int, first_shard: int = 0) -> List[str]:
+        """Create or clear the tabs for `data_rows` rows starting at shard `first_shard`, sized
+        to fit them (plus a header row each) and formatted, in a single batchUpdate. Later
+        shards left over from an earlier, larger export this month are deleted. Returns the
+        tab titles."""
+        sheet_ids = self._sheet_ids()
+        shards = max(1, math.ceil(data_rows / self.max_rows_per_tab))
+        titles = [self.shard_title(first_shard + i) for i in range(shards)]
+        next_id = max(sheet_ids.values(), default=0) + 1
+
+        requests = []
+        for i, title in enumerate(titles):
+            rows = min(self.max_rows_per_tab, data_rows - i * self.max_rows_per_tab) + 1
+            grid = {"rowCount": max(rows, 2), "columnCount": cols}
+            sheet_id = sheet_ids.get(title)
+            if sheet_id is None:
+                sheet_id = next_id
+                next_id += 1
+                requests.append({"addSheet": {"properties": {"sheetId": sheet_id, "title": title,
+                                                             "gridProperties": grid}}})
+            else:
+                requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}})
+                requests.append({"updateSheetProperties": {
+                    "properties": {"sheetId": sheet_id, "gridProperties": grid},
+                    "fields": "gridProperties(rowCount,columnCount)"
+                }})
+            requests.extend(self._format_requests(sheet_id, cols))
+
+        stale = first_shard + shards
+        while self.shard_title(stale) in sheet_ids:
+            requests.append({"deleteSheet": {"sheetId": sheet_ids[self.shard_title(stale)]}})
+            stale += 1
+
+        self._api("batch_update", {"requests": requests})
+        return titles
+
+    def format_tabs(self, titles: List[str], cols: int = len(SHEET_COLUMNS)):
+        """Re-apply formatting to tabs that grew by appends (one batchUpdate)"""
+        sheet_ids = self._sheet_ids()
+        requests = [r for title in titles if title in sheet_ids
+                    for r in self._format_requests(sheet_ids[title], cols)]
+        if requests:
+            self._api("batch_update", {"requests": requests})
+
+    def _chunks(self, rows: List[List]) -> List[Tuple[int, int, int]]:
+        """(start, end, JSON bytes) slices of `rows`, each under max_request_bytes"""
+        chunks = []
+        start, size = 0, 0
+        for i, row in enumerate(rows):
+            row_bytes = len(json.dumps(row, default=str)) + 2  # ", " between rows
+            if size and size + row_bytes > self.max_request_bytes:
+                chunks.append((start, i, size))
+                start, size = i, 0
+            size += row_bytes
+        if start < len(rows):
+            chunks.append((start, len(rows), size))
+        return chunks
+
+    def write_values(self, ranges: List[Tuple[str, int, List[List]]]):
+        """Write (tab title, first row number, rows) ranges with as few values.batchUpdate
+        calls as the payload limit allows; ranges too large for one call are split"""
+        batch, size = [], 0
+        for title, first_row, rows in ranges:
+            for start, end, chunk_bytes in self._chunks(rows):
+                if batch and size + chunk_bytes > self.max_request_bytes:
+                    self._api("values_batch_update", {"valueInputOption": "RAW", "data": batch})
+                    batch, size = [], 0
+                batch.append({"range": f"'{title}'!A{first_row + start}", "values": rows[start:end]})
+                size += chunk_bytes
+        if batch:
+            self._api("values_batch_update", {"valueInputOption": "RAW", "data": batch})
+
+    def append_values(self, title: str, rows: List[List]):
+        """Append rows below a tab's data, in payload-sized chunks (the grid grows as needed)"""
+        for start, end, _ in self._chunks(rows):
+            self._api(
+                "values_append", f"'{title}'!A1",
+                params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+                body={"values": rows[start:end]}
             )
-            format_cell_range(worksheet, 'A2:A1000', date_fmt)
-            
-        except Exception as e:
-            print(f"Header formatting failed (non-critical): {e}")
 
-    def export_incidents(self, incidents: List[Dict]) -> bool:
+    def count_rows(self, title: str) -> int:
+        """Rows in use on a tab, header included"""
+        result = self._api("values_get", f"'{title}'!A:A")
+        return len(result.get("values", []))
+
+    def _to_values(self, incidents: List) -> List[List]:
+        """Header + rows; IncidentRecords go straight to sheet rows, dicts go through a DataFrame"""
+        if all(isinstance(i, IncidentRecord) for i in incidents):
+            return [list(SHEET_COLUMNS)] + [i.to_sheet_row() for i in incidents]
+
+        df = pd.DataFrame([i.to_row() if isinstance(i, IncidentRecord) else i for i in incidents])
+
+        # Reorder columns and keep only those that exist
+        existing_columns = [col for col in SHEET_COLUMNS if col in df.columns]
+        df = df[existing_columns]
+        df = df.applymap(lambda x: x[0] if isinstance(x, list) and x else x)
+        return [df.columns.tolist()] + df.values.tolist()
+
+    def export_incidents(self, incidents: List) -> bool:
         if not incidents:
             print("No incidents to export.")
             return False
 
         try:
-            # Convert to DataFrame
-            df = pd.DataFrame(incidents)
-            
-            # Define the desired column order
-            column_order = [
-                'Date of Breach',
-                'Company Name',
-                'Company Website',
-                'Company Size',
-                'Type of Breach',
-                'CDN',
-                'Security',
-                'Country',
-                'Contact Name',
-                'Contact Title',
-                'Contact Phone',
-                'Contact Email',
-                'LinkedIn URL',
-                'Source'
-            ]
-            
-            # Reorder columns and keep only those that exist
-            existing_columns = [col for col in column_order if col in df.columns]
-            df = df[existing_columns]
-            
-            # Access the Google Sheet
-            self.sheet = self.client.open(self.sheet_name)
-            tab_name = self._get_monthly_tab_name()
-
-            # Get or create worksheet
-            try:
-                worksheet = self.sheet.worksheet(tab_name)
-            except gspread.WorksheetNotFound:
-                worksheet = self.sheet.add_worksheet(title=tab_name, rows="1000", cols="20")
-
-            # Clear and update data
-            df = df.applymap(lambda x: x[0] if isinstance(x, list) and x else x)
-            worksheet.clear()
-            worksheet.update([df.columns.tolist()] + df.values.tolist())
+            values = self._to_values(incidents)
+            header, rows = values[0], values[1:]
 
-            # Apply beautiful formatting
-            self._format_header(worksheet)
+            # Replace this month's tabs: create/clear, size and format them, then write the values
+            titles = self.prepare_tabs(len(rows), len(header))
+            per_tab = self.max_rows_per_tab
+            self.write_values([(title, 1, [header] + rows[i * per_tab:(i + 1) * per_tab])
+                               for i, title in enumerate(titles)])
 
-            print(f"Exported {len(df)} incidents to Google Sheet tab '{tab_name}'")
+            print(f"Exported {len(rows)} incidents to Google Sheet tab{'s' if len(titles) > 1 else ''} "
+                  f"{', '.join(repr(t) for t in titles)}")
             return True
         except Exception as e:
             print(f"[GoogleSheetsExporter] Export failed: {e}")
@@ -5,6 +5,7 @@ from datetime import datetime
 from pathlib import Path
 from googlesheets import GoogleSheetsExporter
 from config.settings import HIPB_KEY
+from utils.json_stream import iter_json_array
 
 class HIBPBreachFetcher:
     def __init__(self):
@@ -30,9 +31,13 @@ class HIBPBreachFetcher:
             json.dump({"last_breach_date": date_str}, f)
 
     def fetch_all_breaches(self):
-        response = requests.get(self.endpoint, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        return list(self.iter_breaches())
+
+    def iter_breaches(self):
+        """Stream the catalogue one breach at a time instead of loading the whole response"""
+        with requests.get(self.endpoint, headers=self.headers, stream=True) as response:
+            response.raise_for_status()
+            yield from iter_json_array(response.iter_content(chunk_size=64 * 1024))
 
     def convert_to_incident_format(self, breach):
         return {
@@ -49,12 +54,9 @@ class HIBPBreachFetcher:
         }
 
     def run(self):
-        last_date = self.load_last_checked_date()
-        breaches = self.fetch_all_breaches()
-        new_breaches = [
-            b for b in breaches
-            if datetime.strptime(b["BreachDate"], "%Y-%m-%d") > last_date
-        ]
+        # BreachDate is ISO (YYYY-MM-DD), so string comparison matches date order
+        last_date = self.load_last_checked_date().strftime("%Y-%m-%d")
+        new_breaches = [b for b in self.iter_breaches() if b["BreachDate"] > last_date]
 
         if not new_breaches:
             print("No new breaches found.")
@@ -63,8 +65,8 @@ class HIBPBreachFetcher:
         incidents = [self.convert_to_incident_format(b) for b in new_breaches]
         self.sheets_exporter.export_incidents(incidents)
 
-        most_recent = max(datetime.strptime(b["BreachDate"], "%Y-%m-%d") for b in new_breaches)
-        self.save_last_checked_date(most_recent.strftime("%Y-%m-%d"))
+        most_recent = max(b["BreachDate"] for b in new_breaches)
+        self.save_last_checked_date(most_recent)
         print(f"Exported {len(incidents)} new breaches to Google Sheets.")
 
 if __name__ == "__main__":
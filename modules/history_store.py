@@ -0,0 +1,211 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import HISTORY_DB
+from models.records import IncidentRecord, OrgEnrichment
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_ts TEXT NOT NULL,
+    incident_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    run_ts TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    breach_date TEXT,
+    source TEXT,
+    breach_type TEXT,
+    company_name TEXT,
+    company_size TEXT,
+    cdn TEXT,
+    security TEXT,
+    country TEXT,
+    region TEXT,
+    contact_name TEXT,
+    contact_title TEXT,
+    contact_phone TEXT,
+    contact_email TEXT,
+    linkedin_url TEXT,
+    industry TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_domain ON incidents(domain);
+CREATE INDEX IF NOT EXISTS idx_incidents_breach_date ON incidents(breach_date);
+CREATE INDEX IF NOT EXISTS idx_incidents_region ON incidents(region, run_ts);
+
+-- One row per domain per run: the domain's enrichment as seen by that run
+CREATE TABLE IF NOT EXISTS domain_snapshots (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    run_ts TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    company_name TEXT,
+    company_size TEXT,
+    cdn TEXT,
+    security TEXT,
+    country TEXT,
+    region TEXT,
+    PRIMARY KEY (domain, run_id)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_run_ts ON domain_snapshots(run_ts);
+CREATE INDEX IF NOT EXISTS idx_snapshots_region ON domain_snapshots(region, domain, run_ts);
+"""
+
+
+def split_country(country: str) -> Tuple[str, str]:
+    """'US-AMER' -> ('US', 'AMER'); values without a region suffix get 'Unknown'"""
+    code, _, region = str(country or "").partition("-")
+    return code, region or "Unknown"
+
+
+class HistoryStore:
+    """Local SQLite history of every enriched incident and domain snapshot, per run.
+
+    Indexed by domain, breach date and region (with run timestamp) so filters like
+    "AMER domains behind Cloudflare with no WAF in the last 90 days" are answered
+    locally instead of from exported sheets.
+    """
+
+    def __init__(self, db_path: Path = HISTORY_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, run_ts: Optional[str] = None) -> Tuple[int, str]:
+        run_ts = run_ts or datetime.now().isoformat(timespec="seconds")
+        with self._lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO runs (run_ts) VALUES (?)", (run_ts,))
+        return cursor.lastrowid, run_ts
+
+    def add_records(self, run_id: int, run_ts: str, records: Iterable[IncidentRecord]) -> int:
+        incident_rows = []
+        snapshot_rows = {}
+        for r in records:
+            org, contact = r.org, r.contact
+            country, region = split_country(org.country)
+            incident_rows.append((
+                run_id, run_ts, r.website, r.date, r.source, r.breach_type,
+                org.company_name, str(org.company_size), org.cdn, org.security, country, region,
+                contact.name, contact.title, contact.phone, contact.email, contact.linkedin_url,
+                r.industry
+            ))
+            snapshot_rows[r.website] = (
+                run_id, run_ts, r.website, org.company_name, str(org.company_size),
+                org.cdn, org.security, country, region
+            )
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO incidents (run_id, run_ts, domain, breach_date, source, breach_type, "
+                "company_name, company_size, cdn, security, country, region, contact_name, "
+                "contact_title, contact_phone, contact_email, linkedin_url, industry) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                incident_rows
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO domain_snapshots (run_id, run_ts, domain, company_name, "
+                "company_size, cdn, security, country, region) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                snapshot_rows.values()
+            )
+            self.conn.execute(
+                "UPDATE runs SET incident_count = incident_count + ? WHERE run_id = ?",
+                (len(incident_rows), run_id)
+            )
+        return len(incident_rows)
+
+    def record_snapshots(self, orgs: Dict[str, OrgEnrichment], run_ts: Optional[str] = None) -> int:
+        """Store domain enrichment looked up outside a pipeline run (e.g. breach-table triage)"""
+        run_id, run_ts = self.start_run(run_ts)
+        rows = []
+        for domain, org in orgs.items():
+            country, region = split_country(org.country)
+            rows.append((run_id, run_ts, domain, org.company_name, str(org.company_size),
+                         org.cdn, org.security, country, region))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO domain_snapshots (run_id, run_ts, domain, company_name, "
+                "company_size, cdn, security, country, region) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return run_id
+
+    def record_run(self, records: List[IncidentRecord], run_ts: Optional[str] = None) -> int:
+        """Store one run's enriched records; returns the run id"""
+        run_id, run_ts = self.start_run(run_ts)
+        count = self.add_records(run_id, run_ts, records)
+        logger.info(f"Recorded {count} incidents in history (run {run_id}).")
+        return run_id
+
+    def query_domains(self, region: Optional[str] = None, cdn: Optional[str] = None,
+                      security: Optional[str] = None, since_days: Optional[int] = None,
+                      latest_only: bool = True) -> List[sqlite3.Row]:
+        """Domain snapshots matching the filters.
+
+        `cdn` is a case-insensitive substring match (IPinfo org strings vary); `security`
+        is exact, so security="None" means no WAF detected. With latest_only, each domain
+        contributes only its most recent snapshot in the window.
+        """
+        clauses, params = [], []
+        if since_days is not None:
+            clauses.append("run_ts >= ?")
+            params.append((datetime.now() - timedelta(days=since_days)).isoformat(timespec="seconds"))
+        where = " AND ".join(clauses) or "1=1"
+
+        if latest_only:
+            # SQLite returns the other columns from the row holding MAX(run_ts)
+            sql = (
+                f"SELECT * FROM (SELECT *, MAX(run_ts) FROM domain_snapshots WHERE {where} "
+                f"GROUP BY domain) s"
+            )
+        else:
+            sql = f"SELECT * FROM domain_snapshots s WHERE {where}"
+
+        # Filtered after the latest snapshot is picked, so a domain that has since moved
+        # region, CDN or WAF doesn't match on its old values
+        filters = []
+        if region:
+            filters.append("s.region = ?")
+            params.append(region)
+        if cdn:
+            filters.append("s.cdn LIKE ?")
+            params.append(f"%{cdn}%")
+        if security:
+            filters.append("s.security = ?")
+            params.append(security)
+        if filters:
+            sql += (" WHERE " if latest_only else " AND ") + " AND ".join(filters)
+
+        return self.conn.execute(sql + " ORDER BY s.domain", params).fetchall()
+
+    def query_incidents(self, domain: Optional[str] = None, since_breach_date: Optional[str] = None,
+                        region: Optional[str] = None) -> List[sqlite3.Row]:
+        """Stored incidents by domain, breach date (YYYY-MM-DD lower bound) and region"""
+        clauses, params = [], []
+        if domain:
+            clauses.append("domain = ?")
+            params.append(domain)
+        if since_breach_date:
+            clauses.append("breach_date >= ?")
+            params.append(since_breach_date)
+        if region:
+            clauses.append("region = ?")
+            params.append(region)
+        where = " AND ".join(clauses) or "1=1"
+        return self.conn.execute(
+            f"SELECT * FROM incidents WHERE {where} ORDER BY breach_date DESC", params
+        ).fetchall()
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import re
+import socket
+import threading
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from config.settings import NER_MODEL, NER_BATCH_SIZE, NER_PROCESSES, NER_CACHE_FILE
+from utils.domains import registrable_domain
+
+logger = logging.getLogger(__name__)
+
+# Only the NER component is needed; en_core_web_* NER has its own tok2vec, so the shared
+# tok2vec and the tagging/parsing components are never loaded
+NER_EXCLUDE = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+# Below this many uncached texts the process pool costs more than it saves
+MIN_PARALLEL_TEXTS = NER_BATCH_SIZE * 2
+
+DOMAIN_RE = re.compile(r"\b((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24})\b", re.IGNORECASE)
+# Tokens that look like domains in article text but aren't organizations
+IGNORED_DOMAIN_SUFFIXES = (".exe", ".dll", ".js", ".php", ".html", ".py", ".zip", ".txt")
+# Sites articles link to for sharing, sources or context rather than as the breached company
+GENERIC_DOMAINS = frozenset({
+    "twitter.com", "x.com", "t.co", "facebook.com", "linkedin.com", "instagram.com", "youtube.com",
+    "reddit.com", "medium.com", "github.com", "google.com", "wikipedia.org", "archive.org",
+    "bit.ly", "haveibeenpwned.com", "telegram.org", "t.me",
+})
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def _get_nlp():
+    """Load the spaCy model on first use (once per process)"""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                import spacy
+                logger.info(f"Loading spaCy model {NER_MODEL} (NER only)...")
+                _nlp = spacy.load(NER_MODEL, exclude=NER_EXCLUDE)
+    return _nlp
+
+
+def _init_worker():
+    _get_nlp()
+
+
+def _check_model():
+    """Raise ImportError/OSError, as spacy.load would, if spaCy or the model is missing.
+    Workers load the model in their initializer, where a failure only surfaces as a
+    BrokenProcessPool, so the parent checks first without loading it."""
+    import spacy
+    if not spacy.util.is_package(NER_MODEL) and not Path(NER_MODEL).exists():
+        raise OSError(f"spaCy model '{NER_MODEL}' is not installed")
+
+
+def _ner_batch(texts: List[str]) -> List[List[str]]:
+    """ORG entities for each text, run through nlp.pipe in one batch"""
+    nlp = _get_nlp()
+    results = []
+    for doc in nlp.pipe(texts, batch_size=NER_BATCH_SIZE):
+        seen = []
+        for ent in doc.ents:
+            if ent.label_ == "ORG" and ent.text not in seen:
+                seen.append(ent.text)
+        results.append(seen)
+    return results
+
+
+def _resolves(host: str) -> bool:
+    try:
+        socket.gethostbyname(host)
+        return True
+    except socket.error:
+        return False
+
+
+def find_domains(text: str) -> List[str]:
+    """Domain names mentioned in the text, in order of appearance"""
+    found = []
+    for match in DOMAIN_RE.findall(text or ""):
+        domain = match.lower()
+        if domain.endswith(IGNORED_DOMAIN_SUFFIXES) or domain in found:
+            continue
+        found.append(domain)
+    return found
+
+
+class OrgExtractor:
+    """Extracts organizations from article text with spaCy NER.
+
+    Results are cached by content hash in NER_CACHE_FILE, so articles already seen in a
+    previous run are never sent through the model again. Large batches are split across a
+    process pool whose workers each load the model once.
+    """
+
+    def __init__(self, cache_path: Path = NER_CACHE_FILE, processes: int = NER_PROCESSES,
+                 batch_size: int = NER_BATCH_SIZE):
+        self.cache_path = Path(cache_path)
+        self.processes = processes
+        self.batch_size = batch_size
+        self.cache = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, List[str]]:
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Corrupt NER cache at {self.cache_path}, starting fresh")
+            return {}
+
+    def _save_cache(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.cache, f)
+        tmp_path.replace(self.cache_path)
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha1(f"{NER_MODEL}\0{text}".encode("utf-8")).hexdigest()
+
+    def _run_ner(self, texts: List[str]) -> List[List[str]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(texts) < MIN_PARALLEL_TEXTS or self.processes <= 1:
+            return [orgs for batch in batches for orgs in _ner_batch(batch)]
+
+        _check_model()
+        workers = min(self.processes, len(batches))
+        logger.info(f"Running NER on {len(texts)} texts across {workers} processes...")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            return [orgs for result in executor.map(_ner_batch, batches) for orgs in result]
+
+    def extract(self, texts: List[str]) -> List[List[str]]:
+        """ORG entities for each text; only texts not already in the cache are processed"""
+        hashes = [self.content_hash(t) for t in texts]
+        pending = {}
+        for h, text in zip(hashes, texts):
+            if h not in self.cache and h not in pending:
+                pending[h] = text
+
+        if pending:
+            try:
+                results = self._run_ner(list(pending.values()))
+            except (ImportError, OSError, BrokenProcessPool) as e:
+                # spaCy or the model isn't installed - fall back to domain mentions only
+                logger.error(f"NER unavailable: {e}")
+                return [self.cache.get(h, []) for h in hashes]
+            self.cache.update(zip(pending.keys(), results))
+            self._save_cache()
+
+        logger.info(f"NER: {len(texts) - len(pending)} cached, {len(pending)} processed")
+        return [self.cache[h] for h in hashes]
+
+
+def extract_organizations(incidents: List[Dict], extractor: OrgExtractor = None,
+                          resolves: Callable[[str], bool] = _resolves) -> List[Dict]:
+    """Fill `organizations` for article incidents (scrape_content) that don't have any.
+
+    Only domains mentioned in the text that resolve become `organizations` (the websites
+    the pipeline enriches); the article's own site and GENERIC_DOMAINS are left out. NER
+    organization names go to `organization_names`, since a name is not a website.
+    """
+    targets = [i for i in incidents if i.get("scrape_content") and not i.get("organizations")]
+    if not targets:
+        return incidents
+
+    extractor = extractor or OrgExtractor()
+    texts = [f"{i.get('title', '')}\n{i.get('raw_content', '')}" for i in targets]
+    for incident, text, orgs in zip(targets, texts, extractor.extract(texts)):
+        skip = GENERIC_DOMAINS | {registrable_domain(incident.get("link") or incident.get("source_url") or "")}
+        incident["organizations"] = [d for d in find_domains(text)
+                                     if registrable_domain(d) not in skip and resolves(d)]
+        incident["organization_names"] = orgs
+
+    logger.info(f"Extracted organizations for {len(targets)} article incidents.")
+    return incidents
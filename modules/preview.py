@@ -0,0 +1,148 @@
+import math
+import random
+import statistics
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+Z_95 = 1.96  # two-sided 95% normal quantile
+ANY = "*"
+
+Stratum = Tuple[str, str, str]
+
+
+class Estimate(NamedTuple):
+    value: float
+    low: float
+    high: float
+
+    def __str__(self) -> str:
+        return f"{self.value:,.0f} (95% CI {self.low:,.0f}–{self.high:,.0f})"
+
+    def percent(self) -> str:
+        return f"{self.value:.0%} (95% CI {self.low:.0%}–{self.high:.0%})"
+
+
+def stratum_key(incident: Dict) -> Stratum:
+    """(source, breach year, country) of an incident; missing parts are "Unknown" """
+    year = str(incident.get("date") or "")[:4]
+    return (
+        str(incident.get("source") or "Unknown"),
+        year if year.isdigit() else "Unknown",
+        str(incident.get("country") or "Unknown"),
+    )
+
+
+def _coarsen(key: Stratum, level: int) -> Stratum:
+    # level 0: (source, year, country), 1: (source, year, *), 2: (source, *, *), 3: (*, *, *)
+    return key[:3 - level] + (ANY,) * level
+
+
+class StratifiedSample:
+    """Stratified random sample of units (domains), with totals and ratios extrapolated
+    to the whole population.
+
+    Units are stratified by `key` (source, year, country). Strata too small to get one unit
+    under proportional allocation are merged into coarser ones (country, then year, then
+    source dropped), and every remaining stratum gets at least one unit, so the sample may
+    come out slightly larger than `size`. Estimates use the standard stratified estimator
+    with a finite population correction; strata with a single sampled unit borrow the
+    pooled sample variance.
+    """
+
+    def __init__(self, units: Dict[Hashable, Dict], size: int, seed: Optional[int] = None,
+                 key: Callable[[Dict], Stratum] = stratum_key):
+        self.population_size = len(units)
+        rng = random.Random(seed)
+        strata = self._build_strata(units, size, key)
+
+        self.population: Dict[Stratum, int] = {h: len(ids) for h, ids in strata.items()}
+        self.sampled: Dict[Stratum, List[Hashable]] = {}
+        for h, n in self._allocate(size).items():
+            self.sampled[h] = rng.sample(strata[h], n)
+
+    def _build_strata(self, units: Dict[Hashable, Dict], size: int,
+                      key: Callable[[Dict], Stratum]) -> Dict[Stratum, List[Hashable]]:
+        min_stratum = self.population_size / max(size, 1)  # units per sampled unit
+        keys = {unit: key(data) for unit, data in units.items()}
+        for level in (1, 2, 3):
+            counts = defaultdict(int)
+            for k in keys.values():
+                counts[k] += 1
+            keys = {unit: _coarsen(k, level) if counts[k] < min_stratum else k
+                    for unit, k in keys.items()}
+        strata = defaultdict(list)
+        for unit, k in keys.items():
+            strata[k].append(unit)
+        return strata
+
+    def _allocate(self, size: int) -> Dict[Stratum, int]:
+        """Proportional allocation (largest remainder), at least one unit per stratum"""
+        if not self.population_size:
+            return {}
+        size = min(size, self.population_size)
+        shares = {h: size * n / self.population_size for h, n in self.population.items()}
+        allocation = {h: max(1, int(share)) for h, share in shares.items()}
+        left = size - sum(allocation.values())
+        for h in sorted(shares, key=lambda h: shares[h] - int(shares[h]), reverse=True)[:max(left, 0)]:
+            allocation[h] += 1
+        return {h: min(n, self.population[h]) for h, n in allocation.items()}
+
+    @property
+    def units(self) -> List[Hashable]:
+        return [unit for ids in self.sampled.values() for unit in ids]
+
+    @property
+    def sample_size(self) -> int:
+        return sum(len(ids) for ids in self.sampled.values())
+
+    def _total_and_variance(self, outcome: Callable[[Hashable], float]) -> Tuple[float, float]:
+        values = {h: [float(outcome(unit)) for unit in ids] for h, ids in self.sampled.items()}
+        pooled = [v for vs in values.values() for v in vs]
+        pooled_var = statistics.variance(pooled) if len(pooled) > 1 else 0.0
+
+        total, variance = 0.0, 0.0
+        for h, vs in values.items():
+            N, n = self.population[h], len(vs)
+            total += N * statistics.fmean(vs)
+            s2 = statistics.variance(vs) if n > 1 else pooled_var
+            variance += N * N * (1 - n / N) * s2 / n
+        return total, variance
+
+    def total(self, outcome: Callable[[Hashable], float], z: float = Z_95,
+              upper: Optional[float] = None) -> Estimate:
+        """Population total of `outcome` with a normal confidence interval. For a 1/0 outcome
+        this is a count and the interval is capped at the population size."""
+        if not self.sampled:
+            return Estimate(0.0, 0.0, 0.0)
+        total, variance = self._total_and_variance(outcome)
+        margin = z * math.sqrt(variance)
+        return Estimate(total, max(0.0, total - margin), min(total + margin, upper or math.inf))
+
+    def count(self, predicate: Callable[[Hashable], bool], z: float = Z_95) -> Estimate:
+        return self.total(lambda unit: 1.0 if predicate(unit) else 0.0, z, upper=self.population_size)
+
+    def ratio(self, numerator: Callable[[Hashable], float], denominator: Callable[[Hashable], float],
+              z: float = Z_95) -> Estimate:
+        """Ratio of two population totals (e.g. WAF-protected share of survivors), with the
+        linearized variance of the combined ratio estimator"""
+        if not self.sampled:
+            return Estimate(0.0, 0.0, 0.0)
+        y, _ = self._total_and_variance(numerator)
+        x, _ = self._total_and_variance(denominator)
+        if not x:
+            return Estimate(0.0, 0.0, 0.0)
+        r = y / x
+        _, residual_var = self._total_and_variance(lambda unit: numerator(unit) - r * denominator(unit))
+        margin = z * math.sqrt(residual_var) / x
+        return Estimate(r, max(0.0, r - margin), r + margin)
+
+    def share(self, predicate: Callable[[Hashable], bool], within: Callable[[Hashable], bool],
+              z: float = Z_95) -> Estimate:
+        """Share of the `within` units that also satisfy `predicate`"""
+        r = self.ratio(lambda u: 1.0 if within(u) and predicate(u) else 0.0,
+                       lambda u: 1.0 if within(u) else 0.0, z)
+        return Estimate(r.value, r.low, min(r.high, 1.0))
+
+    def scale(self, sample_amount: float) -> float:
+        """Extrapolate an amount measured over the whole sample (credits, seconds) to the population"""
+        return sample_amount * self.population_size / self.sample_size if self.sample_size else 0.0
@@ -0,0 +1,125 @@
+import json
+import logging
+import math
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import (
+    PRIORITY_WEIGHTS, SENSITIVE_DATA_CLASSES, ENRICHMENT_QUEUE_FILE, MAX_QUEUE_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+RECENCY_HALF_LIFE_DAYS = 180
+TARGET_COUNTRIES = {"US", "CA", "UNITED STATES", "CANADA"}
+
+
+def _record_count(incident: Dict) -> int:
+    value = incident.get("record_count")
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+        value = int(value) if value.isdigit() else 0
+    return int(value or 0)
+
+
+def _data_classes(incident: Dict) -> List[str]:
+    classes = incident.get("compromised_data")
+    if not classes:
+        # HIBP incidents from older code paths only carry the joined string
+        classes = str(incident.get("raw_content", "")).split(",")
+    return [c.strip().lower() for c in classes if c and c.strip()]
+
+
+def score_incident(incident: Dict, weights: Dict[str, float] = PRIORITY_WEIGHTS,
+                   today: Optional[date] = None) -> float:
+    """Value of enriching this incident's domain, 0..sum(weights)"""
+    today = today or date.today()
+
+    try:
+        breach_date = datetime.strptime(str(incident.get("date", ""))[:10], "%Y-%m-%d").date()
+        age_days = max(0, (today - breach_date).days)
+        recency = 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+    except ValueError:
+        recency = 0.0
+
+    # log scale: 1k records ~ 0.33, 1M ~ 0.67, 1B+ = 1
+    records = min(1.0, math.log10(_record_count(incident) + 1) / 9)
+
+    classes = _data_classes(incident)
+    sensitive = sum(1 for c in classes if c in SENSITIVE_DATA_CLASSES)
+    data_classes = min(1.0, sensitive / 3)
+
+    country = str(incident.get("country", "")).strip().upper()
+    if not country:
+        region = 0.5  # unknown - may still turn out to be US/CA
+    else:
+        region = 1.0 if country in TARGET_COUNTRIES else 0.0
+
+    return (weights.get("recency", 0) * recency + weights.get("records", 0) * records +
+            weights.get("data_classes", 0) * data_classes + weights.get("region", 0) * region)
+
+
+class PriorityScheduler:
+    """Orders domains by value and carries whatever doesn't fit the budget to the next run.
+
+    Deferred domains are kept in ENRICHMENT_QUEUE_FILE with their incident, re-scored
+    next run (recency decays) and merged with that run's new domains. plan() only computes
+    the new queue; commit() saves it once the run's records are exported, so a failed run
+    leaves the queue as it was.
+    """
+
+    def __init__(self, queue_path: Path = ENRICHMENT_QUEUE_FILE,
+                 weights: Dict[str, float] = PRIORITY_WEIGHTS, max_queue_size: int = MAX_QUEUE_SIZE):
+        self.queue_path = Path(queue_path)
+        self.weights = weights
+        self.max_queue_size = max_queue_size
+        self._planned_queue: Optional[Dict[str, Dict]] = None
+
+    def load_queue(self) -> Dict[str, Dict]:
+        try:
+            with open(self.queue_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Corrupt enrichment queue at {self.queue_path}, starting fresh")
+            return {}
+
+    def save_queue(self, queue: Dict[str, Dict]):
+        self.queue_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.queue_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(queue, f, default=str)
+        tmp_path.replace(self.queue_path)
+
+    def plan(self, incidents: Dict[str, Dict], budget: Optional[int] = None) -> Tuple[List[str], Dict[str, Dict]]:
+        """Domains to enrich this run (highest value first) and the incidents of carried-over domains.
+
+        `incidents` maps domain -> raw incident for this run. The returned dict holds the
+        raw incidents of queued domains from earlier runs that were selected now, so the
+        caller can build their records.
+        """
+        queue = self.load_queue()
+        candidates = dict(queue)
+        candidates.update(incidents)  # this run's incident wins over a stale queued one
+
+        ranked = sorted(candidates, key=lambda d: score_incident(candidates[d], self.weights), reverse=True)
+        if budget is None or budget >= len(ranked):
+            selected, deferred = ranked, []
+        else:
+            selected, deferred = ranked[:max(0, budget)], ranked[max(0, budget):]
+
+        remaining = {d: candidates[d] for d in deferred[:self.max_queue_size]}
+        self._planned_queue = remaining
+
+        carried = {d: queue[d] for d in selected if d in queue and d not in incidents}
+        logger.info(f"Scheduled {len(selected)} domains ({len(carried)} carried over), "
+                    f"deferred {len(remaining)} to the next run.")
+        return selected, carried
+
+    def commit(self):
+        """Save the queue left by the last plan(); call after the run's sinks succeeded"""
+        if self._planned_queue is not None:
+            self.save_queue(self._planned_queue)
+            self._planned_queue = None
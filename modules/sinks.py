@@ -0,0 +1,300 @@
+import csv
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config.settings import (
+    OUTPUT_DIR, SHEETS_SINK_BATCH_SIZE, SHEETS_SINK_FLUSH_INTERVAL, SINK_BATCH_SIZE, SINK_FLUSH_INTERVAL,
+    SINK_MAX_RETRIES, SINK_QUEUE_SIZE
+)
+from models.records import IncidentRecord, SHEET_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+class Sink:
+    """Destination for enriched records.
+
+    write_batch() is called from the sink's own writer thread with records in completion
+    order; close() finalises the output and returns whether the export succeeded.
+    """
+    name = "sink"
+    batch_size: Optional[int] = None  # records per write_batch; None uses the writer's default
+    flush_interval: Optional[float] = None  # seconds before a partial batch is written; ditto
+
+    def open(self):
+        pass
+
+    def write_batch(self, records: List[IncidentRecord]):
+        raise NotImplementedError
+
+    def close(self) -> bool:
+        return True
+
+
+class CsvSink(Sink):
+    name = "csv"
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or OUTPUT_DIR / f"incidents-{datetime.now():%Y-%m-%d}.csv")
+        self._file = None
+        self._writer = None
+
+    def open(self):
+        # Appends, so several runs (or daemon cycles) on one day share the day's file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(SHEET_COLUMNS)
+
+    def write_batch(self, records: List[IncidentRecord]):
+        self._writer.writerows(r.to_sheet_row() for r in records)
+        self._file.flush()
+
+    def close(self) -> bool:
+        if self._file:
+            self._file.close()
+        return True
+
+
+class JsonlSink(Sink):
+    name = "jsonl"
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or OUTPUT_DIR / f"incidents-{datetime.now():%Y-%m-%d}.jsonl")
+        self._file = None
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write_batch(self, records: List[IncidentRecord]):
+        self._file.writelines(
+            json.dumps(dict(zip(SHEET_COLUMNS, r.to_sheet_row())), default=str) + "\n" for r in records
+        )
+        self._file.flush()
+
+    def close(self) -> bool:
+        if self._file:
+            self._file.close()
+        return True
+
+
+class SqliteSink(Sink):
+    """Appends the run to the local history store (see modules.history_store)"""
+    name = "sqlite"
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = db_path
+        self.store = None
+        self.run_id = None
+        self.run_ts = None
+        self.count = 0
+
+    def open(self):
+        from modules.history_store import HistoryStore
+        self.store = HistoryStore(self.db_path) if self.db_path else HistoryStore()
+        self.run_id, self.run_ts = self.store.start_run()
+
+    def write_batch(self, records: List[IncidentRecord]):
+        self.count += self.store.add_records(self.run_id, self.run_ts, records)
+
+    def close(self) -> bool:
+        if self.store:
+            logger.info(f"Recorded {self.count} incidents in history (run {self.run_id}).")
+            self.store.close()
+        return True
+
+
+class SheetsSink(Sink):
+    """Writes the monthly tab incrementally: the first batch replaces the tab's contents
+    (or, with `append`, is added below them), later batches are appended, and formatting
+    is re-applied once at close. A tab that reaches the exporter's row limit continues in
+    the next shard ("April 2025 (2)"). Batches are large (SHEETS_SINK_BATCH_SIZE) so a big
+    export stays within the per-minute write quota."""
+    name = "sheets"
+    batch_size = SHEETS_SINK_BATCH_SIZE
+    flush_interval = SHEETS_SINK_FLUSH_INTERVAL
+
+    def __init__(self, exporter=None, append: bool = False):
+        self.exporter = exporter
+        self.append = append
+        self.tabs: List[str] = []
+        self.tab_rows = 0  # data rows in the last tab
+        self.count = 0
+
+    def open(self):
+        if self.exporter is None:
+            from modules.googlesheets import GoogleSheetsExporter
+            self.exporter = GoogleSheetsExporter()
+
+    def _start_tab(self, header: List, rows: List[List]) -> List[List]:
+        """Create (or clear) the next shard with the header and as many rows as fit; returns the rest"""
+        fit = self.exporter.max_rows_per_tab
+        title = self.exporter.prepare_tabs(min(len(rows), fit), len(header), first_shard=len(self.tabs))[0]
+        self.exporter.write_values([(title, 1, [header] + rows[:fit])])
+        self.tabs.append(title)
+        self.tab_rows = min(len(rows), fit)
+        return rows[fit:]
+
+    def write_batch(self, records: List[IncidentRecord]):
+        values = self.exporter._to_values(records)
+        header, rows = values[0], values[1:]
+        if not self.tabs and self.append:
+            # Continue in the month's last tab; an empty one is started over, header and all
+            shards = self.exporter.month_shards()
+            used = self.exporter.count_rows(shards[-1]) if shards else 0
+            self.tabs = shards if used else shards[:-1]
+            self.tab_rows = max(used - 1, 0)
+        if not self.tabs:
+            # The tab is only cleared once there is something to replace it with
+            rows = self._start_tab(header, rows)
+        while rows:
+            room = self.exporter.max_rows_per_tab - self.tab_rows
+            if room <= 0:
+                rows = self._start_tab(header, rows)
+                continue
+            self.exporter.append_values(self.tabs[-1], rows[:room])
+            self.tab_rows += len(rows[:room])
+            rows = rows[room:]
+        self.count += len(records)
+
+    def close(self) -> bool:
+        if not self.tabs:
+            print("No incidents to export.")
+            return True  # nothing to write isn't a failure
+        self.exporter.format_tabs(self.tabs)
+        print(f"Exported {self.count} incidents to Google Sheet tab{'s' if len(self.tabs) > 1 else ''} "
+              f"{', '.join(repr(t) for t in self.tabs)}")
+        return True
+
+
+SINK_TYPES = {cls.name: cls for cls in (CsvSink, JsonlSink, SqliteSink, SheetsSink)}
+
+
+def build_sinks(names: Iterable[str], append: bool = False) -> List[Sink]:
+    """Sinks by name; `append` keeps what the Sheets tab already holds (daemon cycles)"""
+    sinks = []
+    for name in names:
+        if name not in SINK_TYPES:
+            raise ValueError(f"Unknown sink '{name}' (choose from {', '.join(SINK_TYPES)})")
+        sinks.append(SheetsSink(append=append) if name == "sheets" else SINK_TYPES[name]())
+    return sinks
+
+
+_STOP = object()
+
+
+class _SinkWorker(threading.Thread):
+    """Feeds one sink from its own queue, so a slow or failing sink never holds up the others"""
+
+    def __init__(self, sink: Sink, batch_size: int, flush_interval: float, max_retries: int,
+                 queue_size: int):
+        super().__init__(name=f"sink-{sink.name}", daemon=True)
+        self.sink = sink
+        self.batch_size = sink.batch_size or batch_size
+        self.flush_interval = sink.flush_interval or flush_interval
+        self.max_retries = max_retries
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.failed = False
+        self.written = 0
+        self.dropped = 0
+
+    def run(self):
+        try:
+            self.sink.open()
+        except Exception as e:
+            logger.error(f"[Sink {self.sink.name}] Failed to open: {e}")
+            self.failed = True
+
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is not None and item is not _STOP:
+                batch.append(item)
+            if batch and (item is _STOP or item is None or len(batch) >= self.batch_size):
+                self._flush(batch)
+                batch = []
+            if item is None or not batch:
+                deadline = time.monotonic() + self.flush_interval
+            if item is _STOP:
+                return
+
+    def _flush(self, batch: List[IncidentRecord]):
+        if self.failed:
+            self.dropped += len(batch)
+            return
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.write_batch(batch)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                logger.warning(f"[Sink {self.sink.name}] Write of {len(batch)} records failed "
+                               f"(attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(2 ** attempt)
+        logger.error(f"[Sink {self.sink.name}] Giving up; no further records are written to this sink")
+        self.failed = True
+        self.dropped += len(batch)
+
+
+class BackgroundWriter:
+    """Writes records to every sink in the background while enrichment is still running.
+
+    Pass `writer.put` as the pipeline's on_record callback. Each sink batches records
+    (SINK_BATCH_SIZE, or whatever arrived within SINK_FLUSH_INTERVAL seconds, unless the
+    sink sets its own batch_size / flush_interval) and writes them on its own thread. A
+    sink that keeps failing is disabled and reported by close(); the others carry on.
+    """
+
+    def __init__(self, sinks: List[Sink], batch_size: int = SINK_BATCH_SIZE,
+                 flush_interval: float = SINK_FLUSH_INTERVAL, max_retries: int = SINK_MAX_RETRIES,
+                 queue_size: int = SINK_QUEUE_SIZE):
+        self.workers = [_SinkWorker(s, batch_size, flush_interval, max_retries, queue_size) for s in sinks]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def put(self, record: IncidentRecord):
+        for worker in self.workers:
+            if not worker.failed:
+                worker.queue.put(record)
+
+    def close(self) -> Dict[str, bool]:
+        """Flush everything, close the sinks and return {sink name: succeeded}"""
+        results = {}
+        for worker in self.workers:
+            worker.queue.put(_STOP)
+        for worker in self.workers:
+            worker.join()
+            ok = not worker.failed
+            try:
+                ok = worker.sink.close() and ok
+            except Exception as e:
+                logger.error(f"[Sink {worker.sink.name}] Failed to close: {e}")
+                ok = False
+            if worker.dropped:
+                logger.error(f"[Sink {worker.sink.name}] {worker.dropped} records were not written")
+            logger.info(f"[Sink {worker.sink.name}] wrote {worker.written} records")
+            results[worker.sink.name] = ok
+        return results
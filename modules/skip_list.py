@@ -0,0 +1,73 @@
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from config.settings import (
+    SKIP_LIST_FILE, SKIP_LIST_CAPACITY, SKIP_LIST_ERROR_RATE, SKIP_LIST_ROTATE_DAYS
+)
+from utils.bloom import RotatingBloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+class SkipList:
+    """Domains that recently failed the qualification rules (company size, region).
+
+    Backed by a persistent rotating Bloom filter, so it stays a few MB for millions of
+    domains and forgets a domain after SKIP_LIST_ROTATE_DAYS to twice that, giving companies
+    that grew or moved a new chance. A false positive only means a domain is skipped until
+    it rotates out; the expected rate is in summary().
+    """
+
+    def __init__(self, path: Path = SKIP_LIST_FILE, enabled: bool = True,
+                 capacity: int = SKIP_LIST_CAPACITY, error_rate: float = SKIP_LIST_ERROR_RATE,
+                 rotate_days: float = SKIP_LIST_ROTATE_DAYS):
+        self.enabled = enabled
+        self.filter = RotatingBloomFilter(path, capacity, error_rate, rotate_days * 86400)
+        self.skipped = 0
+        self.added = Counter()
+
+    def __contains__(self, domain: str) -> bool:
+        return self.enabled and domain in self.filter
+
+    def filter_domains(self, domains: List[str]) -> List[str]:
+        """The domains not on the skip list (order kept); counts the rest as skipped"""
+        if not self.enabled:
+            return list(domains)
+        kept = [d for d in domains if d not in self.filter]
+        self.skipped += len(domains) - len(kept)
+        return kept
+
+    def skip(self, domain: str) -> bool:
+        """Count one domain as skipped if it is on the list"""
+        if domain in self:
+            self.skipped += 1
+            return True
+        return False
+
+    def add(self, domain: str, reason: str):
+        if self.filter.add(domain):
+            self.added[reason] += 1
+
+    def save(self):
+        try:
+            self.filter.save()
+        except OSError as e:
+            logger.error(f"Failed to save skip list: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "skipped": self.skipped,
+            "added": dict(self.added),
+            "size": len(self.filter),
+            "false_positive_rate": self.filter.false_positive_rate(),
+            "memory_bytes": self.filter.size_bytes
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        added = ", ".join(f"{n} {reason}" for reason, n in sorted(self.added.items())) or "none"
+        return (f"{stats['skipped']} domains skipped, {added} added; {stats['size']} on the list "
+                f"({stats['memory_bytes'] / 1e6:.1f} MB, est. false-positive rate "
+                f"{stats['false_positive_rate']:.4%})")
@@ -0,0 +1,296 @@
+import json
+import logging
+import re
+import time
+import concurrent.futures
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+
+from config.settings import (
+    SOURCE_CACHE_DIR, SOURCE_CACHE_TTL, SOURCE_FETCH_TIMEOUT, MAX_SOURCE_WORKERS
+)
+from utils.http_cassette import register_session
+from utils.fast_json import loads
+
+# Parser libraries (feedparser, bs4, dateutil, pydantic, pandas) are imported by the
+# parsers that need them so importing this module stays cheap
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = 99
+
+# sources.yaml section -> parser kind
+SECTION_KINDS = {
+    "rss_feeds": "rss",
+    "web_scrapers": "html",
+    "apis": "json",
+    "api_sources": "auth_api",
+    "dataset_sources": "dataset",
+}
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def _to_iso_date(value) -> str:
+    """Best-effort conversion of feed/page dates to YYYY-MM-DD ('' if unparseable)"""
+    if not value:
+        return ""
+    if isinstance(value, time.struct_time):
+        return time.strftime("%Y-%m-%d", value)
+    from dateutil import parser as date_parser
+    try:
+        return date_parser.parse(str(value), fuzzy=True).strftime("%Y-%m-%d")
+    except (ValueError, OverflowError):
+        return ""
+
+
+class SourceIngestor:
+    """Fetches every source in sources.yaml concurrently and parses them into Incidents.
+
+    Each source is fetched with a conditional GET (ETag / Last-Modified). Bodies are cached
+    under SOURCE_CACHE_DIR so a 304, or a fetch inside the source's cache TTL, costs no
+    download and the cached body is re-parsed instead.
+    """
+
+    def __init__(self, sources_config: Dict, cache_dir: Path = SOURCE_CACHE_DIR,
+                 max_workers: int = MAX_SOURCE_WORKERS, cache_ttl: int = SOURCE_CACHE_TTL):
+        self.sources_config = sources_config or {}
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"user-agent": "CelestraBreachMonitor/1.0"})
+        register_session(self.session)
+
+    def sources(self) -> List[Tuple[str, Dict]]:
+        """(kind, source) pairs for every configured source"""
+        pairs = []
+        for section, kind in SECTION_KINDS.items():
+            for source in self.sources_config.get(section) or []:
+                pairs.append((kind, source))
+        return pairs
+
+    # --- caching / conditional GET ---
+
+    def _cache_paths(self, name: str) -> Tuple[Path, Path]:
+        slug = _slug(name)
+        return self.cache_dir / f"{slug}.json", self.cache_dir / f"{slug}.body"
+
+    def _conditional_get(self, source: Dict) -> Optional[bytes]:
+        name = source["name"]
+        url = source.get("url") or source.get("endpoint")
+        meta_path, body_path = self._cache_paths(name)
+
+        meta = {}
+        if meta_path.exists() and body_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text())
+            except ValueError:
+                meta = {}
+
+        ttl = source.get("cache_ttl", self.cache_ttl)
+        if meta and time.time() - meta.get("fetched_at", 0) < ttl:
+            logger.info(f"[{name}] Using cached copy (within {ttl}s TTL)")
+            return body_path.read_bytes()
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=SOURCE_FETCH_TIMEOUT)
+        if response.status_code == 304:
+            logger.info(f"[{name}] Not modified since last fetch")
+            meta["fetched_at"] = time.time()
+            meta_path.write_text(json.dumps(meta))
+            return body_path.read_bytes()
+
+        response.raise_for_status()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        body_path.write_bytes(response.content)
+        meta_path.write_text(json.dumps({
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time()
+        }))
+        return response.content
+
+    # --- parsers ---
+
+    def _base_fields(self, source: Dict) -> Dict:
+        return {
+            "source": source["name"],
+            "display_name": source.get("display_name", source["name"]),
+            "source_url": source.get("url", ""),
+            "categories": source.get("categories", []),
+            "priority": source.get("priority", DEFAULT_PRIORITY),
+        }
+
+    def _parse_rss(self, source: Dict, body: bytes) -> List:
+        import feedparser
+        from bs4 import BeautifulSoup
+        from models.incident import Incident
+
+        feed = feedparser.parse(body)
+        base = self._base_fields(source)
+        incidents = []
+        for entry in feed.entries:
+            incidents.append(Incident(
+                title=entry.get("title", ""),
+                link=entry.get("link", ""),
+                date=_to_iso_date(entry.get("published_parsed") or entry.get("updated_parsed")),
+                raw_content=BeautifulSoup(entry.get("summary", ""), "html.parser").get_text(" ", strip=True),
+                scrape_content=True,
+                **base
+            ))
+        return incidents
+
+    def _parse_html(self, source: Dict, body: bytes) -> List:
+        from bs4 import BeautifulSoup
+        from models.incident import Incident
+
+        selectors = source.get("selectors", {})
+        soup = BeautifulSoup(body, "html.parser")
+        base = self._base_fields(source)
+        incidents = []
+        for container in soup.select(selectors.get("container", "article")):
+            title = container.select_one(selectors["title"]) if selectors.get("title") else None
+            link = container.select_one(selectors["link"]) if selectors.get("link") else None
+            date = container.select_one(selectors["date"]) if selectors.get("date") else None
+            if not title:
+                continue
+            incidents.append(Incident(
+                title=title.get_text(strip=True),
+                link=urljoin(source["url"], link.get("href", "")) if link else "",
+                date=_to_iso_date(date.get_text(strip=True) if date else ""),
+                raw_content=container.get_text(" ", strip=True),
+                scrape_content=True,
+                **base
+            ))
+        return incidents
+
+    def _parse_json(self, source: Dict, body: bytes) -> List:
+        from models.incident import Incident
+        from models.responses import KevCatalogue
+
+        # CISA KEV layout: {"vulnerabilities": [{cveID, vendorProject, product, ...}]}
+        data = loads(body, KevCatalogue)
+        base = self._base_fields(source)
+        incidents = []
+        for vuln in data.get("vulnerabilities", []):
+            incidents.append(Incident(
+                title=f"{vuln.get('cveID', '')}: {vuln.get('vulnerabilityName', '')}",
+                link=f"https://nvd.nist.gov/vuln/detail/{vuln.get('cveID', '')}",
+                date=vuln.get("dateAdded", ""),
+                raw_content=(
+                    f"Vendor: {vuln.get('vendorProject', '')}\n"
+                    f"Product: {vuln.get('product', '')}\n"
+                    f"{vuln.get('shortDescription', '')}"
+                ),
+                **base
+            ))
+        return incidents
+
+    def _parse_dataset(self, source: Dict) -> List:
+        # Dataset sources are refreshed out of band (B1NDDataset.update_dataset); read the local copy
+        if source["name"] != "B1ND":
+            logger.warning(f"[{source['name']}] No local reader for dataset source, skipping")
+            return []
+        from models.incident import Incident
+        from modules.b1nd_scraper import B1NDDataset
+
+        base = self._base_fields(source)
+        incidents = []
+        for breach in B1NDDataset().get_all_breaches():
+            record_count = str(breach.get("record_count", "")).replace(",", "")
+            incidents.append(Incident(
+                title=breach["title"],
+                link="",
+                date=breach["date"],
+                raw_content=breach["raw_content"],
+                organizations=breach["organizations"],
+                country=str(breach.get("country", "")),
+                compromised_data=breach.get("compromised_data", []),
+                record_count=int(record_count) if record_count.isdigit() else None,
+                date_precision=breach.get("date_precision", "day"),
+                **base
+            ))
+        return incidents
+
+    def fetch_source(self, kind: str, source: Dict) -> List:
+        name = source.get("name", "?")
+        try:
+            if kind == "dataset":
+                return self._parse_dataset(source)
+            if kind == "auth_api":
+                logger.info(f"[{name}] Search API requiring credentials, not polled")
+                return []
+
+            body = self._conditional_get(source)
+            if kind == "rss":
+                incidents = self._parse_rss(source, body)
+            elif kind == "html":
+                incidents = self._parse_html(source, body)
+            else:
+                incidents = self._parse_json(source, body)
+            logger.info(f"[{name}] Parsed {len(incidents)} incidents")
+            return incidents
+        except Exception as e:
+            logger.error(f"[{name}] Failed to ingest source: {e}")
+            return []
+
+    def fetch_all(self, extra: Optional[Dict[str, Tuple[int, Callable[[], List[Dict]]]]] = None,
+                  since: Optional[str] = None, names: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Fetch all sources concurrently and return incident dicts ordered by priority.
+
+        `extra` maps a name to (priority, fetch function) for sources that live outside
+        sources.yaml (e.g. HIBP); they run in the same pool and do their own date filtering.
+        `since` (YYYY-MM-DD) drops configured-source incidents older than that date.
+        `names` limits the configured sources fetched (extra sources always run).
+        """
+        jobs = self.sources()
+        if names is not None:
+            names = set(names)
+            jobs = [(kind, source) for kind, source in jobs if source["name"] in names]
+        extra = extra or {}
+        results: Dict[Tuple[int, int], List[Dict]] = {}
+
+        workers = max(1, min(self.max_workers, len(jobs) + len(extra)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for index, (kind, source) in enumerate(jobs):
+                futures[executor.submit(self.fetch_source, kind, source)] = (
+                    source.get("priority", DEFAULT_PRIORITY), index
+                )
+            for index, (name, (priority, fetch)) in enumerate(extra.items(), start=len(jobs)):
+                futures[executor.submit(fetch)] = (priority, index)
+
+            for future in concurrent.futures.as_completed(futures):
+                key = futures[future]
+                try:
+                    incidents = future.result()
+                except Exception as e:
+                    logger.error(f"Source fetch failed: {e}")
+                    incidents = []
+                results[key] = [i.model_dump() if hasattr(i, "model_dump") else i for i in incidents]
+
+        merged = []
+        for key in sorted(results):
+            from_config = key[1] < len(jobs)
+            for incident in results[key]:
+                if since and from_config and incident.get("date") and incident["date"] < since:
+                    continue
+                merged.append(incident)
+
+        logger.info(f"Ingested {len(merged)} incidents from {len(results)} sources.")
+        return merged
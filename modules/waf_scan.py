@@ -0,0 +1,102 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+
+from config.settings import WAF_WORKERS
+from modules.cdn_detect import CdnDetector, EdgeProbe, classify
+
+logger = logging.getLogger(__name__)
+
+# Response headers that identify the edge software; members must match the representative
+_EDGE_HEADERS = ("server", "via", "x-cache", "x-powered-by")
+
+
+class _Group:
+    __slots__ = ("domain", "probe", "future")
+
+    def __init__(self, domain: str, probe: EdgeProbe, future: Future):
+        self.domain = domain
+        self.probe = probe
+        self.future = future
+
+
+class WafScanner:
+    """WAF detection that scans one representative per edge.
+
+    Domains are grouped by CDN and resolved IP set (from the shared CdnDetector probe).
+    The first domain of a group is scanned with `scan` (wafw00f, ~20s worst case); the
+    others wait for that result and adopt it if their own HEAD response comes from the
+    same edge software, otherwise they are scanned too. A WAF that the CDN headers
+    already prove (cf-ray, ...) is reported without any scan. Scans run on their own
+    pool of WAF_WORKERS, separate from the API-bound enrichment threads.
+    """
+
+    def __init__(self, scan: Callable[[str], str], detector: CdnDetector, workers: int = WAF_WORKERS):
+        self.scan = scan
+        self.detector = detector
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="waf")
+        self.groups: Dict[Tuple, _Group] = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def reset(self):
+        """Forget groups and counts (start of a run; results are stored per domain elsewhere)"""
+        with self._lock:
+            self.groups.clear()
+            self.stats.clear()
+
+    def _scan(self, domain: str) -> str:
+        self.stats["scans"] += 1
+        try:
+            return self.scan(domain)
+        except Exception as e:
+            logger.warning(f"[WAF Error] {domain}: {e}")
+            return "None"
+
+    @staticmethod
+    def _same_edge(representative: EdgeProbe, member: EdgeProbe) -> bool:
+        """Cheap confirmation: both answered HEAD and present the same edge headers"""
+        if representative.status is None or member.status is None:
+            return False
+        return all(representative.headers.get(h) == member.headers.get(h) for h in _EDGE_HEADERS)
+
+    def detect(self, domain: str) -> str:
+        probe = self.detector.probe(domain)
+        waf = self.detector.waf_from_headers(domain)
+        if waf:
+            self.stats["from_headers"] += 1
+            return waf
+        if not probe.ips:
+            self.stats["ungrouped"] += 1
+            return self.pool.submit(self._scan, domain).result()
+
+        # classify(), not detector.detect(): the CDN stage already counted this domain
+        signature, _ = classify(probe)
+        key = (signature["name"] if signature else "None", tuple(sorted(probe.ips)))
+        with self._lock:
+            group = self.groups.get(key)
+            leader = group is None
+            if leader:
+                group = self.groups[key] = _Group(domain, probe, self.pool.submit(self._scan, domain))
+        result = group.future.result()
+        if leader:
+            self.stats["representatives"] += 1
+            return result
+
+        if result != "Timeout" and self._same_edge(group.probe, probe):
+            self.stats["shared"] += 1
+            return result
+        self.stats["rescanned"] += 1
+        return self.pool.submit(self._scan, domain).result()
+
+    def summary(self) -> str:
+        covered = sum(self.stats[k] for k in ("from_headers", "ungrouped", "representatives",
+                                               "shared", "rescanned"))
+        return (f"{self.stats['scans']} scans for {covered} domains "
+                f"({self.stats['shared']} shared within {len(self.groups)} edge groups, "
+                f"{self.stats['from_headers']} from CDN headers, {self.stats['rescanned']} not confirmed)")
+
+    def close(self):
+        self.pool.shutdown(wait=True)
@@ -1,80 +1,107 @@
 import requests
-import yaml
 import concurrent.futures
-from datetime import datetime
-from typing import List, Dict, Tuple, Optional
-from config.settings import HIPB_KEY
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, List, Dict, Tuple, Optional
+from config.settings import (
+    BASE_DIR, HIPB_KEY, SOURCES_FILE, SOURCE_CACHE_DIR, APOLLO_DOMAIN_BUDGET, OUTPUT_SINKS, OUTPUT_DIR,
+    PROFILE_MAX_MB_PER_1K_DOMAINS, HIBP_POLL_INTERVAL, SOURCE_POLL_INTERVAL,
+    DAEMON_ENRICHMENT_CACHE_TTL, DNS_CACHE_TTL, DNS_CACHE_SIZE, SERVICE_HOST, SERVICE_PORT,
+    API_CALLS_PER_DOMAIN, PREVIEW_SAMPLE_SIZE
+)
 from pathlib import Path
+import argparse
 import sys
 import os
 import logging
 import subprocess
+import threading
 import time
 import socket
 import re
 import csv
-from modules.googlesheets import GoogleSheetsExporter
+import shutil
+import tempfile
 from modules.apollo_integration import enrich_company_size, fetch_poc_for_domain,find_similar_companies
+from modules.apollo_integration import client as apollo_client, enrich_company_size_async, fetch_poc_for_domain_async
+from modules.source_ingestion import SourceIngestor
+from modules.org_extractor import extract_organizations
+from modules.dedupe import deduplicate_incidents
+from modules.scheduler import PriorityScheduler
+from modules.date_utils import get_date_ranges
+from utils.json_stream import iter_json_array
+from utils.quota_ledger import get_ledger
+from utils.http_cassette import register_session
+from utils.profiling import StageProfiler
+from utils.ttl_cache import TTLCache
+from utils.domains import clean_host, primary_domain, split_hosts
 from config.constants import INCLUDED_REGIONS
-from pathlib import Path
-
-
-# Ensure logs/ directory exists
-Path("logs").mkdir(exist_ok=True)
-
-# Set up file and console handlers explicitly
-logger = logging.getLogger()  # root logger
-logger.setLevel(logging.INFO)
-
-# Clear existing handlers (important if running in notebooks or scripts)
-logger.handlers.clear()
+from models.records import (
+    IncidentRecord, OrgEnrichment, ContactEnrichment, DEFAULT_ORG, UNAVAILABLE_CONTACT
+)
 
-file_handler = logging.FileHandler("logs/scraper.log")
-console_handler = logging.StreamHandler()
-
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
-
-logger.addHandler(file_handler)
-#logger.addHandler(console_handler)
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Importing this module has no side effects: logging, the country map and the
+# Sheets exporter (pandas/gspread) are set up only by the commands that need them.
 logger = logging.getLogger(__name__)
 
 # Add modules path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 IPINFO_API_KEY = os.getenv("IPINFO_API_KEY")
 
-# Configure requests session
-session = requests.Session()
+# Configure requests sessions (registered so a record/replay cassette can take them over)
+session = register_session(requests.Session())
 session.mount('https://', requests.adapters.HTTPAdapter(max_retries=3))
 session.headers.update({
     "hibp-api-key": HIPB_KEY,
     "user-agent": "CelestraBreachMonitor/1.0"
 })
+ipinfo_session = register_session(requests.Session())
 
 
 # Global constants
 DATA_DIR = Path("data")
 LAST_RUN_FILE = DATA_DIR / "last_run.txt"
+LOG_DIR = Path("logs")
+COUNTRY_REGION_FILE = BASE_DIR / "data" / "country_region.csv"
 WAF_TIMEOUT = 20  # seconds
 MAX_WORKERS = 10  # concurrency level
+HIBP_PRIORITY = 0  # HIBP is merged ahead of sources.yaml entries (priority 1+)
+HIBP_STREAM_CHUNK = 64 * 1024  # bytes per read while streaming the breach catalogue
+
 
-# Load country-region mapping once
-country_region_map = {}
+def setup_logging(level: int = logging.INFO):
+    """File logging to logs/scraper.log; called by the CLI, not at import"""
+    LOG_DIR.mkdir(exist_ok=True)
+
+    root = logging.getLogger()  # root logger
+    root.setLevel(level)
+
+    # Clear existing handlers (important if running in notebooks or scripts)
+    root.handlers.clear()
+
+    file_handler = logging.FileHandler(LOG_DIR / "scraper.log")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+    root.addHandler(file_handler)
+
+
+_dns_cache = TTLCache(maxsize=DNS_CACHE_SIZE, ttl=DNS_CACHE_TTL)
+
+
+def resolve_host(host: str) -> Optional[str]:
+    """IPv4 address of the host (None if it doesn't resolve), cached for DNS_CACHE_TTL"""
+    def lookup():
+        try:
+            return socket.gethostbyname(host)
+        except socket.error:
+            return None
+    return _dns_cache.get_or_compute(host, lookup)
 
 
 def is_valid_website(website: str) -> bool:
     if not website:
         return False
-    website = website.replace('http://', '').replace('https://', '').split('/')[0]
-    try:
-        socket.gethostbyname(website)
-        return True
-    except socket.error:
-        return False
+    return resolve_host(clean_host(website)) is not None
 
 
 def load_country_region_mapping(file_path: str) -> Dict[str, str]:
@@ -104,27 +131,126 @@ def load_country_region_mapping(file_path: str) -> Dict[str, str]:
     return region_mapping
 
 
-# Load on start
-country_region_map = load_country_region_mapping('data/country_region.csv')
+@lru_cache(maxsize=1)
+def get_country_region_map() -> Dict[str, str]:
+    """Country -> region map, loaded on first use"""
+    return load_country_region_mapping(COUNTRY_REGION_FILE)
 
 
-def get_ipinfo(website: str) -> Tuple[str, str]:
+def get_ipinfo_details(website: str) -> Dict[str, str]:
+    """IPinfo lookup: {"ip", "asn", "cdn", "country"} ("asn" is empty when the lookup failed)"""
     try:
-        ip = socket.gethostbyname(website)
-        response = requests.get(f"https://ipinfo.io/{ip}/json?token={IPINFO_API_KEY}", timeout=8)
-        response.raise_for_status()
+        ip = resolve_host(website)
+        if ip is None:
+            raise socket.gaierror(f"{website} does not resolve")
+        if not get_ledger().reserve('ipinfo'):
+            raise RuntimeError("IPinfo quota exhausted")
+        try:
+            response = ipinfo_session.get(f"https://ipinfo.io/{ip}/json?token={IPINFO_API_KEY}", timeout=8)
+            response.raise_for_status()
+        except requests.RequestException:
+            get_ledger().release('ipinfo')  # refused or failed lookups aren't billed
+            raise
         data = response.json()
 
-        cdn = re.sub(r"AS\d+\s*", "", data.get('org', '')).strip() if 'org' in data else "None"
+        org = data.get('org', '')
+        asn_match = re.match(r"AS\d+", org)
+        cdn = re.sub(r"AS\d+\s*", "", org).strip() if 'org' in data else "None"
         country = data.get('country', 'Unknown')
-        return cdn, country
+        return {"ip": ip, "asn": asn_match.group(0) if asn_match else "", "cdn": cdn, "country": country}
 
     except Exception as e:
         logger.warning(f"[IPInfo Error] {website}: {e}")
-        return "None", "Unknown"
+        return {"ip": "", "asn": "", "cdn": "None", "country": "Unknown"}
+
+
+def get_ipinfo(website: str) -> Tuple[str, str]:
+    details = get_ipinfo_details(website)
+    return details["cdn"], details["country"]
+
+
+_edge_revalidator = None
+_cdn_detector = None
+# Guards the lazy singletons below; serve first builds them from pool threads. Reentrant
+# because get_waf_scanner builds the CDN detector while holding it.
+_singletons_lock = threading.RLock()
+
+
+def get_cdn_detector():
+    """Shared local CDN classifier (CNAME chain + one HEAD request per domain, cached)"""
+    global _cdn_detector
+    if _cdn_detector is None:
+        with _singletons_lock:
+            if _cdn_detector is None:
+                from modules.cdn_detect import CdnDetector
+                _cdn_detector = CdnDetector()
+    return _cdn_detector
+
+
+_waf_scanner = None
+
+
+def get_waf_scanner():
+    """Shared WAF stage: one wafw00f scan per edge group, on its own WAF_WORKERS pool"""
+    global _waf_scanner
+    if _waf_scanner is None:
+        with _singletons_lock:
+            if _waf_scanner is None:
+                from modules.waf_scan import WafScanner
+                # detect_waf is looked up per call so a cassette can wrap it after this is built
+                _waf_scanner = WafScanner(lambda website: detect_waf(website), get_cdn_detector())
+    return _waf_scanner
+
+
+def get_edge_details(website: str) -> Dict[str, str]:
+    """IPinfo ASN/country with the CDN inferred locally instead of IPinfo's hosting org"""
+    details = get_ipinfo_details(website)
+    details["cdn"] = get_cdn_detector().detect(website)
+    return details
+
+
+def get_edge_revalidator():
+    """Shared CDN/WAF revalidator (opens data/cache/edge_state.db on first use)"""
+    global _edge_revalidator
+    if _edge_revalidator is None:
+        with _singletons_lock:
+            if _edge_revalidator is None:
+                from modules.edge_state import EdgeRevalidator
+                _edge_revalidator = EdgeRevalidator()
+    return _edge_revalidator
+
+
+_skip_list = None
+
+
+def get_skip_list():
+    """Shared skip list of domains that failed the size/region rules (data/cache/skip_list.bloom)"""
+    global _skip_list
+    if _skip_list is None:
+        with _singletons_lock:
+            if _skip_list is None:
+                from modules.skip_list import SkipList
+                _skip_list = SkipList()
+    return _skip_list
+
+
+def estimate_cache_hit_rates(domains: List[str]) -> Dict[str, float]:
+    """Share of domains whose IPinfo lookup will likely be served from the edge-state store"""
+    if not domains:
+        return {}
+    revalidator = get_edge_revalidator()
+    if not revalidator.enabled:
+        return {}
+    return {"ipinfo": revalidator.store.count_fresh(domains, revalidator.max_age) / len(domains)}
+
+
+def get_edge_info(website: str) -> Tuple[str, str, str]:
+    """(cdn, country, security), re-running IPinfo/wafw00f only when the domain's hosting moved"""
+    return get_edge_revalidator().lookup(website, get_edge_details, get_waf_scanner().detect)
 
 
 def detect_waf(website: str) -> str:
+    """wafw00f scan of one domain (see modules.waf_scan for how scans are shared)"""
     try:
         waf_output = subprocess.check_output(["wafw00f", website], stderr=subprocess.DEVNULL, timeout=WAF_TIMEOUT).decode("utf-8")
         waf_keywords = [
@@ -142,29 +268,34 @@ def detect_waf(website: str) -> str:
         return "None"
 
 def filter_domains(domains: List[str]) -> List[str]:
-    """Filter domains based on company size and region"""
-    filtered = []
+    """Filter domains based on company size and region (keeps the input order).
+
+    Domains Apollo reports as too small or unknown go on the skip list; failed lookups don't.
+    """
+    filtered = set()
+    skip_list = get_skip_list()
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_domain = {executor.submit(enrich_company_size, domain): domain for domain in domains}
-        
-        for future in concurrent.futures.as_completed(future_to_domain):
-            domain = future_to_domain[future]
-            try:
-                result = future.result()
-                company_size = result.get("Company Size", "N/A")
+    # Apollo-only lookups run on the async client's event loop (a bounded number at a time),
+    # not a thread each; lookups past the rate limit wait for the next window
+    for domain, future in apollo_client.map_unordered(enrich_company_size_async, domains):
+        try:
+            result = future.result()
+            company_size = result.get("Company Size", "N/A")
+            
+            # Skip if company size is unknown or too small
+            if company_size in ["N/A", "1–49"]:
+                if not result.get("Lookup Failed"):
+                    # Keyed like the lookups: www.-only targets are checked as acme.com
+                    skip_list.add(normalize_domain(domain), "size")
+                continue
                 
-                # Skip if company size is unknown or too small
-                if company_size in ["N/A", "1–49"]:
-                    continue
-                    
-                filtered.append(domain)
-            except Exception as e:
-                logger.error(f"Error filtering domain {domain}: {e}")
+            filtered.add(domain)
+        except Exception as e:
+            logger.error(f"Error filtering domain {domain}: {e}")
     
-    return filtered
+    return [domain for domain in domains if domain in filtered]
 
-def bulk_enrich_organizations(domains: List[str]) -> Dict[str, Dict]:
+def bulk_enrich_organizations(domains: List[str]) -> Dict[str, OrgEnrichment]:
     """Bulk enrich organization data"""
     enriched = {}
     
@@ -174,62 +305,36 @@ def bulk_enrich_organizations(domains: List[str]) -> Dict[str, Dict]:
         for future in concurrent.futures.as_completed(future_to_domain):
             domain = future_to_domain[future]
             try:
-                cdn, security, country, company_size, company_name = future.result()
-                enriched[domain] = {
-                    "CDN": cdn,
-                    "Security": security,
-                    "Country": country,
-                    "Company Size": company_size,
-                    "Company Name": company_name
-                }
+                enriched[domain] = OrgEnrichment(*future.result())
             except Exception as e:
                 logger.error(f"Error enriching organization {domain}: {e}")
-                enriched[domain] = {
-                    "CDN": "None",
-                    "Security": "None",
-                    "Country": "Unknown",
-                    "Company Size": "N/A",
-                    "Company Name": "Unknown"
-                }
+                enriched[domain] = DEFAULT_ORG
     
     return enriched
 
-def bulk_enrich_contacts(domains: List[str]) -> Dict[str, Dict]:
-    """Bulk enrich contact information"""
+def bulk_enrich_contacts(domains: List[str],
+                         on_result: Optional[Callable[[str, ContactEnrichment], None]] = None
+                         ) -> Dict[str, ContactEnrichment]:
+    """Bulk enrich contact information; `on_result(domain, contact)` fires as each one completes"""
     contacts = {}
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_domain = {executor.submit(fetch_poc_for_domain, domain): domain for domain in domains}
-        
-        for future in concurrent.futures.as_completed(future_to_domain):
-            domain = future_to_domain[future]
-            try:
-                contact_data = future.result()
-                contacts[domain] = {
-                    "Contact Name": contact_data.get("Name", "Not Found"),
-                    "Contact Title": contact_data.get("Title", "Not Found"),
-                    "Contact Phone": contact_data.get("Phone", "Not Found"),
-                    "Contact Email": contact_data.get("Email", "Not Found"),
-                    "LinkedIn URL": contact_data.get("LinkedIn URL", "Not Available")
-                }
-            except Exception as e:
-                logger.error(f"Error enriching contacts for {domain}: {e}")
-                contacts[domain] = {
-                    "Contact Name": "Not Found",
-                    "Contact Title": "Not Found",
-                    "Contact Phone": "Not Available",
-                    "Contact Email": "Not Available",
-                    "LinkedIn URL": "Not Available"
-                }
+    # on_result still runs in this thread, as each lookup on the Apollo event loop completes
+    for domain, future in apollo_client.map_unordered(fetch_poc_for_domain_async, domains):
+        try:
+            contacts[domain] = ContactEnrichment.from_poc(future.result())
+        except Exception as e:
+            logger.error(f"Error enriching contacts for {domain}: {e}")
+            contacts[domain] = UNAVAILABLE_CONTACT
+        if on_result:
+            on_result(domain, contacts[domain])
     
     return contacts
 
 
 def enrich_website(website: str) -> Tuple[str, str, str, str, str]:
-    website = website.replace('http://', '').replace('https://', '').split('/')[0]
-    cdn, country = get_ipinfo(website)
-    security = detect_waf(website)
-    region = country_region_map.get(country, 'Unknown')
+    website = clean_host(website)
+    cdn, country, security = get_edge_info(website)
+    region = get_country_region_map().get(country, 'Unknown')
 
     # AMER for US and CA, LATAM for everything else in the Americas
     if region == 'LATAM':
@@ -254,49 +359,57 @@ def enrich_website(website: str) -> Tuple[str, str, str, str, str]:
     return cdn, security, country_with_region, company_size, company_name
 
 
-def fetch_hipb_breaches() -> List[Dict]:
+def iter_hibp_catalogue():
+    """Every breach in the HIBP catalogue, streamed one at a time (raw API objects)"""
+    if not get_ledger().reserve('hibp'):
+        return
+    with session.get("https://haveibeenpwned.com/api/v3/breaches", stream=True) as response:
+        response.raise_for_status()
+        # Streamed even when a typed decoder is available: projecting the catalogue would
+        # need the whole body in memory at once
+        yield from iter_json_array(response.iter_content(chunk_size=HIBP_STREAM_CHUNK))
+
+
+def fetch_hipb_breaches(since: Optional[str] = None) -> List[Dict]:
+    """Recent HIBP breaches, filtered while the catalogue streams in.
+
+    Keeps breaches added this year or last, and with `since` (YYYY-MM-DD) only those
+    with a later BreachDate. Both checks compare ISO string prefixes, so no datetime is
+    built per record and only matching breaches are kept in memory.
+    """
     try:
         logger.info("Fetching breaches from HIBP...")
-        url = "https://haveibeenpwned.com/api/v3/breaches"
-        response = session.get(url)
-        response.raise_for_status()
-        breaches = response.json()
+        min_added_year = str(datetime.now().year - 1)  # Current and previous year
 
         incidents = []
-        for b in breaches:
-            breach_year = datetime.strptime(b["AddedDate"], "%Y-%m-%dT%H:%M:%SZ").year
-            if breach_year >= datetime.now().year - 1:  # Current and previous year
-                incidents.append({
-                    "date": b["BreachDate"],
-                    "source": "HIBP",
-                    "source_url": f"https://haveibeenpwned.com/PwnedWebsites#{b['Name']}",
-                    "raw_content": ", ".join(b.get("DataClasses", [])),
-                    "organizations": [b["Domain"]] if b.get("Domain") else []
-                })
-
-        logger.info(f"Fetched {len(incidents)} breaches from HIBP.")
+        scanned = 0
+        for b in iter_hibp_catalogue():
+            scanned += 1
+            if b["AddedDate"][:4] < min_added_year:
+                continue
+            if since and b["BreachDate"] <= since:
+                continue
+            incidents.append({
+                "date": b["BreachDate"],
+                "source": "HIBP",
+                "source_url": f"https://haveibeenpwned.com/PwnedWebsites#{b['Name']}",
+                "raw_content": ", ".join(b.get("DataClasses", [])),
+                "organizations": [b["Domain"]] if b.get("Domain") else [],
+                "compromised_data": b.get("DataClasses", []),
+                "record_count": b.get("PwnCount")
+            })
+
+        logger.info(f"Fetched {len(incidents)} breaches from HIBP ({scanned} in catalogue).")
         return incidents
     except Exception as e:
         logger.error(f"Error fetching breaches from HIBP: {str(e)}")
         return []
 
 
-def deduplicate_incidents(incidents: List[Dict]) -> List[Dict]:
-    seen = set()
-    deduped = []
-    for incident in incidents:
-        orgs = incident.get('organizations', [])
-        domain = orgs[0] if orgs else None
-        key = (incident.get('title'), domain)
-        if key not in seen:
-            seen.add(key)
-            deduped.append(incident)
-    return deduped
-
-
 def load_sources():
+    import yaml
     try:
-        with open('config/sources.yaml', 'r') as f:
+        with open(SOURCES_FILE, 'r') as f:
             sources = yaml.safe_load(f)
         logger.info("Successfully loaded sources configuration.")
         return sources
@@ -324,180 +437,696 @@ def save_last_run(date_str: str):
 
 
 def normalize_domain(url: str) -> str:
-    return url.replace('http://', '').replace('https://', '').split('/')[0].lower()
-
-def flatten_incident_data(incident: Dict, enrich: bool = True) -> Dict:
-    key_mapping = {
-        "date": "Date of Breach",
-        "source": "Source",
-        "raw_content": "Type of Breach",
-        "organizations": "Company Website"
-    }
-
-    flattened = {}
-    
-    # Handle organizations field
-    orgs = incident.get("organizations")
-    if orgs is not None:
-        if isinstance(orgs, list):
-            flattened["Company Website"] = orgs[0] if orgs else ""
-        else:
-            flattened["Company Website"] = str(orgs)
-    else:
-        flattened["Company Website"] = ""
-
-    # Map other fields (excluding 'title' which was for Breach)
-    for old_key, new_key in key_mapping.items():
-        if old_key in incident and old_key != "organizations":
-            flattened[new_key] = incident[old_key]
-
-    # Set default values
-    defaults = {
-        "CDN": "None",
-        "Security": "None",
-        "Country": "Unknown",
-        "Company Size": "N/A",
-        "Company Name": "Unknown",
-        "Contact Name": "Not Found",
-        "Contact Title": "Not Found",
-        "Contact Phone": "Not Found",
-        "Contact Email": "Not Found",
-        "LinkedIn URL": "Not Available"
-    }
-    
-    for key, value in defaults.items():
-        if key not in flattened:
-            flattened[key] = value
+    """Registrable domain of the first host in a website field (www.shop.acme.com -> acme.com)"""
+    return primary_domain(url) or ""
 
+def flatten_incident_data(incident: Dict, enrich: bool = True) -> Optional[IncidentRecord]:
     # Skip if no website
-    if not flattened.get("Company Website"):
+    record = IncidentRecord.from_incident(incident)
+    if record is None:
         return None
 
-    if enrich and flattened.get("Company Website"):
-        website = flattened["Company Website"]
+    if enrich:
+        website = record.website
         try:
-            cdn, security, country, company_size, company_name = enrich_website(website)
-            flattened.update({
-                "CDN": cdn,
-                "Security": security,
-                "Country": country,
-                "Company Size": company_size,
-                "Company Name": company_name
-            })
+            record.org = OrgEnrichment(*enrich_website(website))
         except Exception as e:
             logger.error(f"Enrichment failed for {website}: {e}")
 
-    return flattened
-
-def scrape_security_incidents(last_run_date: str = None) -> Tuple[List[Dict], str]:
-    """Main function implementing the new flow"""
-    # Step 1: Fetch breaches
-    incidents = fetch_hipb_breaches()
-    incidents = deduplicate_incidents(incidents)
-    
-    # Filter by date if needed
+    return record
+
+def fetch_all_incidents(last_run_date: str = None, include_sources: bool = True,
+                        source_cache_dir: Path = SOURCE_CACHE_DIR,
+                        ingestor: Optional[SourceIngestor] = None,
+                        names: Optional[List[str]] = None) -> List[Dict]:
+    """Fetch HIBP and every sources.yaml source concurrently, merged in priority order.
+
+    `names` restricts the fetch to those sources ("HIBP" included); a long-lived
+    `ingestor` keeps its connection pool between calls.
+    """
+    if not include_sources:
+        return fetch_hipb_breaches(last_run_date)
+
+    start_date, _ = get_date_ranges(last_run_date)
+    ingestor = ingestor or SourceIngestor(load_sources(), cache_dir=source_cache_dir)
+    fetch_hibp = lambda: fetch_hipb_breaches(last_run_date)
+    extra = {"HIBP": (HIBP_PRIORITY, fetch_hibp)} if names is None or "HIBP" in names else {}
+    incidents = ingestor.fetch_all(extra=extra, since=start_date, names=names)
+
+    # Article sources (RSS/HTML) only carry text; pull organizations out of it
+    return extract_organizations(incidents, resolves=is_valid_website)
+
+
+def scrape_security_incidents(last_run_date: str = None, include_sources: bool = True,
+                              budget: Optional[int] = APOLLO_DOMAIN_BUDGET,
+                              scheduler: Optional[PriorityScheduler] = None,
+                              source_cache_dir: Path = SOURCE_CACHE_DIR,
+                              profiler: Optional[StageProfiler] = None,
+                              on_record: Optional[Callable[[IncidentRecord], None]] = None
+                              ) -> Tuple[List[IncidentRecord], str]:
+    """Main function implementing the new flow.
+
+    `on_record` is called with each final record as soon as it is complete (from the
+    calling thread), e.g. BackgroundWriter.put.
+    """
+    profiler = profiler or StageProfiler()
     if last_run_date:
         try:
-            last_date = datetime.strptime(last_run_date, '%Y-%m-%d')
-            incidents = [i for i in incidents if datetime.strptime(i['date'], '%Y-%m-%d') > last_date]
+            datetime.strptime(last_run_date, '%Y-%m-%d')
         except ValueError:
             logger.error(f"Invalid last run date format: {last_run_date}")
-
-    # Step 2: Extract domains
-    domains = []
-    incident_map = {}
-    for incident in incidents:
-        flat = flatten_incident_data(incident, enrich=False)
-        if flat and flat.get("Company Website"):
-            domain = normalize_domain(flat["Company Website"].split(",")[0])
-            if is_valid_website(domain):
-                domains.append(domain)
-                incident_map[domain] = flat
-
-    # Step 3: Filter by size/region
-    filtered_domains = filter_domains(domains)
+            last_run_date = None
+
+    # Step 1: Fetch breaches (HIBP applies the last-run filter while streaming)
+    with profiler.stage("fetch"):
+        incidents = fetch_all_incidents(last_run_date, include_sources, source_cache_dir)
+    return process_incidents(incidents, last_run_date, budget, scheduler, profiler, on_record)
+
+
+def process_incidents(incidents: List[Dict], last_run_date: Optional[str] = None,
+                      budget: Optional[int] = APOLLO_DOMAIN_BUDGET,
+                      scheduler: Optional[PriorityScheduler] = None,
+                      profiler: Optional[StageProfiler] = None,
+                      on_record: Optional[Callable[[IncidentRecord], None]] = None
+                      ) -> Tuple[List[IncidentRecord], str]:
+    """Dedupe, schedule and enrich fetched incidents (everything after Step 1)"""
+    profiler = profiler or StageProfiler()
+    on_record = on_record or (lambda record: None)
+    with profiler.stage("dedupe"):
+        incidents = deduplicate_incidents(incidents)
+    
+    # Filter by date if needed - ISO dates compare correctly as strings
+    if last_run_date:
+        incidents = [i for i in incidents if i.get('date', '') > last_run_date]
+
+    # Step 2: Extract domains. Incidents are keyed by registrable domain, so www., shop. and
+    # bare hosts of one company share a single enrichment that fans back out to each host's
+    # record. Domains on the skip list are dropped before any lookup.
+    raw_map = {}
+    incident_map: Dict[str, Dict[str, IncidentRecord]] = {}
+    skip_list = get_skip_list()
+    with profiler.stage("extract_domains"):
+        for incident in incidents:
+            record = flatten_incident_data(incident, enrich=False)
+            if record:
+                domain = normalize_domain(record.website)
+                if not domain or skip_list.skip(domain):
+                    continue
+                if domain not in raw_map and not is_valid_website(domain):
+                    # Some companies only serve www.; enrich the host itself then
+                    host = split_hosts(record.website)[0]
+                    if host == domain or not is_valid_website(host):
+                        continue
+                    domain = host
+                raw_map[domain] = incident
+                incident_map.setdefault(domain, {})[record.website] = record
+    profiler.domain_count = len(raw_map)
+
+    # Step 3: Order by value within the API budget; the rest is queued for the next run
+    # (saved by the caller's scheduler.commit() once the records are exported).
+    # The quota planner caps the budget so the run can't exhaust a vendor's daily/monthly credits.
+    with profiler.stage("schedule"):
+        scheduler = scheduler or PriorityScheduler()
+        # Queued domains compete for the same credits; over-quota ones stay queued
+        candidates = list(set(scheduler.load_queue()) | set(raw_map))
+        quota_plan = get_ledger().plan_run(len(candidates), estimate_cache_hit_rates(candidates))
+        if quota_plan["max_domains"] is not None:
+            budget = quota_plan["max_domains"] if budget is None else min(budget, quota_plan["max_domains"])
+        domains, carried = scheduler.plan(raw_map, budget)
+        for domain, incident in carried.items():
+            record = IncidentRecord.from_incident(incident)
+            if record:
+                incident_map[domain] = {record.website: record}
+
+    # Step 3b: Filter by size/region
+    with profiler.stage("filter"):
+        filtered_domains = filter_domains(domains)
     
     # Step 4: Bulk enrich organizations
-    org_data = bulk_enrich_organizations(filtered_domains)
+    get_waf_scanner().reset()
+    with profiler.stage("enrich_orgs"):
+        org_data = bulk_enrich_organizations(filtered_domains)
+    logger.info(f"CDN/WAF revalidation: {get_edge_revalidator().summary()}")
+    logger.info(f"CDN detection: {get_cdn_detector().summary()}")
+    logger.info(f"WAF stage: {get_waf_scanner().summary()}")
     
-    # Step 5: Bulk enrich contacts
-    contact_data = bulk_enrich_contacts(filtered_domains)
+    # Step 5: Bulk enrich contacts. A record is complete once its contact is in, and goes
+    # to on_record (the output sinks) right away so exporting overlaps the remaining lookups.
+    finished = {}
+
+    def finish(domain: str, contact: ContactEnrichment):
+        if domain not in incident_map:
+            return
+        org = org_data.get(domain, DEFAULT_ORG)
+        records = [r for r in (finalize_record(record, org, contact)
+                               for record in incident_map[domain].values()) if r]
+        if records:
+            finished[domain] = records
+            for record in records:
+                on_record(record)
+
+    with profiler.stage("enrich_contacts"):
+        bulk_enrich_contacts(filtered_domains, on_result=finish)
     
     # Combine all data
+    with profiler.stage("combine"):
+        flattened = combine_records(filtered_domains, finished, on_record)
+
+    skip_list.save()
+    logger.info(f"Skip list: {skip_list.summary()}")
+    logger.info(f"Processed {len(flattened)} incidents (original + similar).")
+    return flattened, datetime.now().strftime('%Y-%m-%d')
+
+
+def finalize_record(record: IncidentRecord, org: OrgEnrichment,
+                    contact: ContactEnrichment) -> Optional[IncidentRecord]:
+    """Attach enrichment to a record; None if it falls outside the US/CA target region"""
+    record.org = org
+    record.contact = contact
+
+    # Region filtering
+    country = record.org.country
+    if not (country.startswith("US-") or country.startswith("CA-")):
+        if country and country != "Unknown":  # a failed IPinfo lookup isn't a verdict
+            get_skip_list().add(normalize_domain(record.website), "region")
+        return None
+    return record
+
+
+def combine_records(filtered_domains: List[str], finished: Dict[str, List[IncidentRecord]],
+                    on_record: Callable[[IncidentRecord], None]) -> List[IncidentRecord]:
+    """Finished records in domain order, each followed by its (newly enriched) similar companies.
+
+    Similar companies go to `on_record` as they are enriched; the finished records
+    were already handed over when their contacts came in.
+    """
     flattened = []
-    seen_domains = set()  # To avoid duplicates
+    seen_domains = set(finished)  # To avoid duplicates
     
     for domain in filtered_domains:
-        if domain in incident_map and domain not in seen_domains:
-            incident = incident_map[domain]
-            incident.update(org_data.get(domain, {}))
-            incident.update(contact_data.get(domain, {}))
-            
-            # Region filtering
-            country = incident.get("Country", "")
-            if not (country.startswith("US-") or country.startswith("CA-")):
-                continue
-                
-            flattened.append(incident)
-            seen_domains.add(domain)
+        if domain in finished:
+            flattened.extend(finished[domain])
             
             # NEW: Find similar companies
             similar = find_similar_companies(domain)
             for company in similar:
-                if company["domain"] not in seen_domains:
-                    similar_incident = {
-                        "Date of Breach": "Similar Company",
-                        "Source": "Apollo",
-                        "Type of Breach": "Potential Target",
-                        "Company Website": company["domain"],
-                        "Company Name": company["name"],
-                        "Company Size": company.get("estimated_num_employees", "N/A"),
-                        "Industry": company.get("industry", "")
-                    }
+                similar_domain = normalize_domain(company["domain"])
+                if similar_domain not in seen_domains and not get_skip_list().skip(similar_domain):
+                    similar_incident = IncidentRecord(
+                        date="Similar Company",
+                        source="Apollo",
+                        breach_type="Potential Target",
+                        website=company["domain"],
+                        industry=company.get("industry", "")
+                    )
                     
                     # Enrich the similar company
                     try:
                         cdn, security, country, size, name = enrich_website(company["domain"])
-                        similar_incident.update({
-                            "CDN": cdn,
-                            "Security": security,
-                            "Country": country
-                        })
+                        similar_incident.org = OrgEnrichment(
+                            cdn=cdn,
+                            security=security,
+                            country=country,
+                            company_size=company.get("estimated_num_employees", "N/A"),
+                            company_name=company["name"]
+                        )
                         flattened.append(similar_incident)
-                        seen_domains.add(company["domain"])
+                        seen_domains.add(similar_domain)
+                        on_record(similar_incident)
                     except Exception as e:
                         logger.error(f"Failed to enrich similar company {company['domain']}: {e}")
-    
-    logger.info(f"Processed {len(flattened)} incidents (original + similar).")
-    return flattened, datetime.now().strftime('%Y-%m-%d')
+    return flattened
 
-def print_simple_breaches(incidents: List[Dict]):
+def print_simple_breaches(incidents: List[IncidentRecord]):
     print("\nBreaches:\n")
     print(f"{'Date':<12} | {'Domain':<30} | {'Company':<25} | {'Name':<25} | {'Source':<10} | {'Size':<12} | Compromised Data")
     print("-" * 145)
     for incident in incidents:
-        date = incident.get('Date of Breach', 'N/A')
-        domain = incident.get('Company Website', 'N/A')
-        breach = incident.get('Breach', 'N/A')
-        name = incident.get('Company Name', 'N/A')
-        source = incident.get('Source', 'N/A')
-        company_size = incident.get('Company Size', 'N/A')
-        data = incident.get('Type of Breach', 'N/A')
+        date = incident.date or 'N/A'
+        domain = incident.website or 'N/A'
+        breach = 'N/A'
+        name = incident.org.company_name
+        source = incident.source or 'N/A'
+        company_size = str(incident.org.company_size)
+        data = incident.breach_type or 'N/A'
         
         print(f"{date:<12} | {domain:<30} | {breach:<25} | {name:<25} | {source:<10} | {company_size:<12} | {data}")
 
 
-if __name__ == "__main__":
+def install_cassette(path: str, mode: str, realtime: bool = True):
+    """Route HTTP, DNS and wafw00f through a record/replay cassette"""
+    global detect_waf
+    from utils import http_cassette
+    cassette = http_cassette.install(Path(path), mode, realtime)
+    detect_waf = cassette.wrap_call("waf", getattr(detect_waf, "__wrapped__", detect_waf))
+    return cassette
+
+
+def make_profiler(args) -> StageProfiler:
+    profiler = StageProfiler(enabled=args.profile or bool(args.profile_cpu), cpu=args.profile_cpu)
+    profiler.start()
+    return profiler
+
+
+def finish_profile(profiler: StageProfiler, max_mb_per_1k: Optional[float]) -> bool:
+    """Write the profile summary and run the peak-memory regression check"""
+    if not profiler.enabled:
+        return True
+    path = profiler.write()
+    profiler.stop()
+    check = profiler.check_peak(max_mb_per_1k)
+    print(f"Peak memory {check['peak_mb_per_1k']:.1f} MB per 1k domains "
+          f"(limit {check['limit']}): {'OK' if check['ok'] else 'FAILED'}. Profile: {path}")
+    return check["ok"]
+
+
+def run(args) -> int:
     last_run = load_last_run()
-    incidents, now = scrape_security_incidents(last_run)
+    profiler = make_profiler(args)
+    if args.full_rescan:
+        get_edge_revalidator().enabled = False
+        get_skip_list().enabled = False
+    if args.record:
+        cassette = install_cassette(args.record, "record")
+        cassette.meta.update({"last_run": last_run, "hibp_only": args.hibp_only, "budget": args.budget})
+
+    # Sinks (history, Sheets, files) write in the background as records complete
+    from modules.sinks import BackgroundWriter, build_sinks
+    writer = BackgroundWriter(build_sinks(args.sink or OUTPUT_SINKS))
+    writer.start()
+    scheduler = PriorityScheduler()
+    try:
+        incidents, now = scrape_security_incidents(last_run, include_sources=not args.hibp_only,
+                                                   budget=args.budget, scheduler=scheduler,
+                                                   profiler=profiler, on_record=writer.put)
+    finally:
+        with profiler.stage("export"):
+            results = writer.close()
 
     #print_simple_breaches(incidents)
+    memory_ok = finish_profile(profiler, args.max_peak_mb)
 
-    exporter = GoogleSheetsExporter()
-    success = exporter.export_incidents(incidents)
-
-    if success:
-        print("Incidents successfully exported to Google Sheets!")
+    failed = [name for name, ok in results.items() if not ok]
+    if not failed:
+        print(f"Incidents successfully exported ({', '.join(results)})!")
         save_last_run(now)
-    else:
-        print("Failed to export incidents.")
+        scheduler.commit()
+        return 0 if memory_ok else 1
+    print(f"Failed to export incidents to: {', '.join(failed)}")
+    return 1
+
+
+def daemon(args) -> int:
+    """Poll HIBP and the configured sources on their intervals and process only new incidents.
+
+    Sessions, the source ingestor's pool, the DNS cache, the country map and Apollo's
+    company cache stay warm between cycles. SIGTERM/SIGINT finish the cycle in progress
+    (enrichment and sink writes) before exiting.
+    """
+    from modules.daemon import ChangeTracker, PollingDaemon
+    from modules.sinks import BackgroundWriter, build_sinks
+    from modules import apollo_integration
+
+    ingestor = SourceIngestor(load_sources())
+    intervals = {"HIBP": HIBP_POLL_INTERVAL}
+    for kind, source in ingestor.sources():
+        if kind != "auth_api":
+            intervals[source["name"]] = source.get("poll_interval", SOURCE_POLL_INTERVAL)
+
+    # Per-source watermark: the day before its last successful poll. Overlap between polls
+    # is removed by the tracker, so late-published items and slow sources aren't lost.
+    last_run = load_last_run()
+    watermarks = dict.fromkeys(intervals, last_run)
+    tracker = ChangeTracker()
+    scheduler = PriorityScheduler()
+    sink_names = args.sink or OUTPUT_SINKS
+    cache_cleared = time.time()
+
+    def advance(names: List[str], watermark: str):
+        watermarks.update(dict.fromkeys(names, watermark))
+        if all(watermarks.values()):
+            save_last_run(min(watermarks.values()))  # a restart resumes from the oldest source
+
+    def cycle(names: List[str]):
+        nonlocal cache_cleared
+        watermark = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        if time.time() - cache_cleared > DAEMON_ENRICHMENT_CACHE_TTL:
+            apollo_integration.company_cache.clear()
+            cache_cleared = time.time()
+
+        logger.info(f"Polling {', '.join(names)}")
+        groups = defaultdict(list)
+        for name in names:
+            groups[watermarks[name]].append(name)
+        fetched = []
+        for since, group in groups.items():
+            fetched.extend(fetch_all_incidents(since, ingestor=ingestor, names=group))
+        incidents = tracker.new(fetched)
+        if not incidents:
+            logger.info("No new incidents this cycle.")
+            advance(names, watermark)
+            return
+
+        logger.info(f"{len(incidents)} new incidents to process")
+        writer = BackgroundWriter(build_sinks(sink_names, append=True))
+        writer.start()
+        try:
+            # No date filter: the tracker, not a global watermark, decides what is new
+            process_incidents(incidents, None, budget=args.budget, scheduler=scheduler, on_record=writer.put)
+        finally:
+            results = writer.close()
+        # Sinks report success when they had nothing to write (everything was filtered out)
+        if all(results.values()):
+            tracker.commit(incidents)
+            scheduler.commit()
+            advance(names, watermark)
+        else:
+            failed = [name for name, ok in results.items() if not ok]
+            logger.error(f"Sinks failed ({', '.join(failed)}); this cycle's incidents will be retried")
+
+    poller = PollingDaemon(intervals, cycle)
+    poller.install_signal_handlers()
+    poller.run_forever(max_cycles=args.max_cycles)
+    return 0
+
+
+def triage(args) -> int:
+    """Build the unified breach table (HIBP + B1ND [+ sources.yaml]), join it against cached
+    enrichment and filter it with column operations; only uncached domains hit the network"""
+    from modules import breach_table
+
+    frames = [breach_table.b1nd_frame()]
+    if not args.offline:
+        frames.append(breach_table.hibp_frame(iter_hibp_catalogue()))
+        if args.with_sources:
+            ingestor = SourceIngestor(load_sources())
+            names = [s["name"] for kind, s in ingestor.sources() if kind not in ("dataset", "auth_api")]
+            incidents = extract_organizations(ingestor.fetch_all(names=names), resolves=is_valid_website)
+            frames.append(breach_table.incidents_frame(incidents))
+    table = breach_table.build_breach_table(frames)
+
+    enrichment = breach_table.enrichment_table()
+    if args.enrich:
+        enrichment = breach_table.enrich_missing(
+            table, enrichment, lambda domain: OrgEnrichment(*enrich_website(domain)),
+            limit=args.enrich, max_workers=MAX_WORKERS
+        )
+    joined = breach_table.join_enrichment(table, enrichment)
+    result = breach_table.filter_table(
+        joined, regions=args.region, since=args.since,
+        exclude_sizes=None if args.include_small else breach_table.EXCLUDED_SIZES,
+        enriched_only=not args.include_unenriched
+    )
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = Path(args.output) if args.output else OUTPUT_DIR / f"triage-{datetime.now():%Y-%m-%d}.csv"
+    result.sort_values("date", ascending=False).to_csv(out_path, index=False)
+
+    missing = len(breach_table.missing_domains(table, enrichment))
+    print(f"{len(table)} breaches / {table['domain'].nunique()} domains; "
+          f"{missing} domains without cached enrichment")
+    print(result.groupby(["source"], observed=True).size().to_string())
+    print(f"{len(result)} rows match -> {out_path}")
+    return 0
+
+
+def preview(args) -> int:
+    """Estimate a full run from a stratified sample of its domains (by source, year and
+    country): the sample goes through the real filter and enrichment, and filter survivors,
+    region mix, WAF coverage, API credits and duration are extrapolated with 95% intervals.
+    Nothing is exported."""
+    from modules.preview import StratifiedSample
+
+    last_run = load_last_run()
+    incidents = deduplicate_incidents(fetch_all_incidents(last_run, include_sources=not args.hibp_only))
+    if last_run:
+        incidents = [i for i in incidents if i.get('date', '') > last_run]
+
+    # Domains keyed as in Step 2 of process_incidents, each stratified by its first incident
+    skip_list = get_skip_list()
+    units: Dict[str, Dict] = {}
+    websites: Dict[str, str] = {}
+    for incident in incidents:
+        record = IncidentRecord.from_incident(incident)
+        domain = normalize_domain(record.website) if record else ""
+        if domain and domain not in units and not skip_list.skip(domain):
+            units[domain] = incident
+            websites[domain] = record.website
+    sample = StratifiedSample(units, args.sample, seed=args.seed)
+    if not sample.sample_size:
+        print("No domains to preview.")
+        return 0
+
+    ledger = get_ledger()
+    usage: Dict[str, Dict[str, int]] = {}
+    seconds: Dict[str, float] = {}
+
+    def stage(name: str, func: Callable, *func_args):
+        before = {service: ledger.used(service) for service in API_CALLS_PER_DOMAIN}
+        start = time.perf_counter()
+        result = func(*func_args)
+        seconds[name] = time.perf_counter() - start
+        usage[name] = {s: max(0, ledger.used(s) - before[s]) for s in API_CALLS_PER_DOMAIN}
+        return result
+
+    def resolve(domains: List[str]) -> Dict[str, str]:
+        targets = {}
+        for domain in domains:
+            if is_valid_website(domain):
+                targets[domain] = domain
+            else:  # www.-only companies are enriched by host, as in a run
+                host = split_hosts(websites[domain])[0]
+                if host != domain and is_valid_website(host):
+                    targets[domain] = host
+        return targets
+
+    targets = stage("resolve", resolve, sample.units)
+    survivors = set(stage("filter", filter_domains, list(targets.values())))
+    get_waf_scanner().reset()
+    orgs = stage("enrich_orgs", bulk_enrich_organizations, sorted(survivors))
+    stage("enrich_contacts", bulk_enrich_contacts, sorted(survivors))
+    exported = [t for t in survivors if orgs.get(t, DEFAULT_ORG).country.startswith(("US-", "CA-"))]
+    similar = stage("similar", lambda: {t: len(find_similar_companies(t)) for t in exported})
+    skip_list.save()
+
+    def survived(domain: str) -> bool:
+        return targets.get(domain) in survivors
+
+    def org(domain: str) -> OrgEnrichment:
+        return orgs.get(targets.get(domain), DEFAULT_ORG)
+
+    def region(domain: str) -> str:
+        return org(domain).country.partition("-")[2] or "Unknown"
+
+    def has_waf(domain: str) -> bool:
+        return org(domain).security not in ("None", "Timeout", "Unknown", "")
+
+    survivor_count = sample.count(survived)
+    similar_count = sample.total(lambda d: similar.get(targets.get(d), 0))
+    print(f"Preview of {sample.sample_size} of {sample.population_size} domains "
+          f"({len(incidents)} incidents, {len(sample.population)} strata):")
+    print(f"  resolvable:            {sample.count(lambda d: d in targets)}")
+    print(f"  pass the size filter:  {survivor_count}")
+    print(f"  exported (US/CA):      {sample.count(lambda d: targets.get(d) in exported)}")
+    print(f"  similar companies:     {similar_count}")
+    print(f"  WAF coverage:          {sample.share(has_waf, survived).percent()} of survivors")
+    print("  region mix of survivors:")
+    for name in sorted({region(d) for d in sample.units if survived(d)}):
+        print(f"    {name:<8} {sample.count(lambda d: survived(d) and region(d) == name)}  "
+              f"{sample.share(lambda d: region(d) == name, survived).percent()}")
+
+    # Cost and time scale with the domains the run would enrich; each similar company costs
+    # about what a fresh domain's size lookup plus org enrichment cost on the sample
+    planned = min(sample.population_size, args.budget) if args.budget else sample.population_size
+    factor = planned / sample.sample_size
+    per_similar = {s: usage["filter"][s] / max(len(targets), 1) + usage["enrich_orgs"][s] / max(len(survivors), 1)
+                   for s in API_CALLS_PER_DOMAIN}
+    similar_seconds = (seconds["filter"] / max(len(targets), 1)
+                       + seconds["enrich_orgs"] / max(len(survivors), 1))
+    similar_planned = similar_count.value * planned / sample.population_size
+    print(f"Full run estimate for {planned} domains:")
+    for service in API_CALLS_PER_DOMAIN:
+        measured = sum(stage_usage[service] for stage_usage in usage.values())
+        projected = measured * factor + per_similar[service] * similar_planned
+        allowance = ledger.daily_allowance(service)
+        print(f"  {service:<8} ~{projected:,.0f} credits ({measured} used by the preview"
+              f"{'' if allowance is None else f'; {allowance} allowed today'})")
+    total_seconds = sum(seconds.values()) * factor + similar_seconds * similar_planned
+    print(f"  duration ~{total_seconds / 60:,.1f} min at this run's concurrency "
+          f"(preview took {sum(seconds.values()):.0f}s)")
+    return 0
+
+
+def serve(args) -> int:
+    """Local enrichment API for other tools, sharing this process's caches and rate limiters"""
+    from modules.enrichment_service import EnrichmentService, make_server
+
+    service = EnrichmentService(
+        enrich_org=lambda domain: OrgEnrichment(*enrich_website(domain)),
+        fetch_contact=lambda domain: ContactEnrichment.from_poc(fetch_poc_for_domain(domain)),
+        max_workers=MAX_WORKERS
+    )
+    server = make_server(service, args.host, args.port, args.socket)
+    where = args.socket or "http://%s:%d" % server.server_address[:2]
+    print(f"Enrichment service listening on {where}")
+    logger.info(f"Enrichment service listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+def replay(args) -> int:
+    """Re-run the pipeline against a recorded cassette, without network, credits or exports.
+
+    Mutable state (quota ledger, enrichment queue, CDN/WAF store, skip list, source cache)
+    lives in a throwaway directory so a replay never changes what the next real run sees.
+    """
+    global _edge_revalidator, _skip_list
+    from modules.edge_state import EdgeRevalidator, EdgeStateStore
+    from modules.skip_list import SkipList
+    from utils import quota_ledger
+
+    cassette = install_cassette(args.cassette, "replay", realtime=not args.fast)
+    meta = cassette.meta
+    profiler = make_profiler(args)
+    with tempfile.TemporaryDirectory(prefix="celestra-replay-") as sandbox:
+        sandbox = Path(sandbox)
+        if SOURCE_CACHE_DIR.exists():
+            shutil.copytree(SOURCE_CACHE_DIR, sandbox / "sources")  # recorded 304s need the cached bodies
+        quota_ledger._ledger = quota_ledger.QuotaLedger(sandbox / "quota_ledger.json", limits={})
+        _edge_revalidator = EdgeRevalidator(EdgeStateStore(sandbox / "edge_state.db"), enabled=False)
+        _skip_list = SkipList(sandbox / "skip_list.bloom", enabled=False)
+
+        start = time.perf_counter()
+        incidents, _ = scrape_security_incidents(
+            meta.get("last_run"), include_sources=not meta.get("hibp_only", False),
+            budget=meta.get("budget"), scheduler=PriorityScheduler(sandbox / "queue.json"),
+            source_cache_dir=sandbox / "sources", profiler=profiler
+        )
+        elapsed = time.perf_counter() - start
+        quota_ledger._ledger.flush()  # while the sandbox still exists
+
+    stats = cassette.stats
+    print(f"Replayed {args.cassette} ({'full speed' if args.fast else 'recorded latencies'}): "
+          f"{len(incidents)} incidents in {elapsed:.2f}s; "
+          f"{stats['replayed']} responses served, {stats['missing']} not in cassette")
+    return 0 if finish_profile(profiler, args.max_peak_mb) else 1
+
+
+def history(args) -> int:
+    from modules.history_store import HistoryStore
+    store = HistoryStore()
+    rows = store.query_domains(region=args.region, cdn=args.cdn, security=args.security,
+                               since_days=args.days)
+    print(f"{'Domain':<30} | {'Company':<25} | {'Size':<12} | {'CDN':<20} | {'Security':<15} | {'Country':<8} | Last seen")
+    print("-" * 140)
+    for row in rows:
+        print(f"{row['domain']:<30} | {str(row['company_name'])[:25]:<25} | {row['company_size']:<12} | "
+              f"{str(row['cdn'])[:20]:<20} | {row['security']:<15} | {row['country']:<8} | {row['run_ts']}")
+    print(f"\n{len(rows)} domains")
+    store.close()
+    return 0
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--profile", action="store_true",
+                       help="track per-stage time, peak memory and top allocators (logs/profile/)")
+    group.add_argument("--profile-cpu", choices=["cprofile", "sample"],
+                       help="also profile CPU per stage: cProfile of the main thread, or sampling of all threads")
+    group.add_argument("--max-peak-mb", type=float, default=PROFILE_MAX_MB_PER_1K_DOMAINS,
+                       help="fail (exit 1) when peak memory per 1k domains exceeds this many MB")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Celestra breach monitoring and enrichment")
+    commands = parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="fetch, enrich and export incidents (default)")
+    run_parser.add_argument("--hibp-only", action="store_true", help="skip the sources.yaml sources")
+    run_parser.add_argument("--budget", type=int, default=APOLLO_DOMAIN_BUDGET,
+                            help="max domains to enrich this run; the rest carry over to the next run")
+    run_parser.add_argument("--full-rescan", action="store_true",
+                            help="ignore stored CDN/WAF results and the skip list; rescan every domain")
+    run_parser.add_argument("--record", metavar="CASSETTE",
+                            help="record HTTP/DNS/WAF traffic to a cassette (.jsonl.gz); use with "
+                                 "--full-rescan to capture every lookup")
+    run_parser.add_argument("--sink", action="append", choices=["sqlite", "sheets", "csv", "jsonl"],
+                            help="output sink (repeatable); default: " + ", ".join(OUTPUT_SINKS))
+    add_profile_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    daemon_parser = commands.add_parser("daemon", help="keep running and poll sources on their intervals")
+    daemon_parser.add_argument("--budget", type=int, default=APOLLO_DOMAIN_BUDGET,
+                               help="max domains to enrich per cycle; the rest carry over")
+    daemon_parser.add_argument("--sink", action="append", choices=["sqlite", "sheets", "csv", "jsonl"],
+                               help="output sink (repeatable); default: " + ", ".join(OUTPUT_SINKS))
+    daemon_parser.add_argument("--max-cycles", type=int, help="exit after this many cycles")
+    daemon_parser.set_defaults(func=daemon)
+
+    triage_parser = commands.add_parser("triage", help="filter all breaches against cached enrichment")
+    triage_parser.add_argument("--region", action="append", help="AMER, LATAM, EMEA or APAC (repeatable)")
+    triage_parser.add_argument("--since", help="only breaches after this date (YYYY-MM-DD)")
+    triage_parser.add_argument("--include-small", action="store_true", help="keep N/A and 1–49 companies")
+    triage_parser.add_argument("--include-unenriched", action="store_true",
+                               help="keep breaches whose domain has no enrichment yet")
+    triage_parser.add_argument("--enrich", type=int, default=0, metavar="N",
+                               help="look up at most N domains missing from the enrichment cache")
+    triage_parser.add_argument("--with-sources", action="store_true", help="also fetch the sources.yaml feeds")
+    triage_parser.add_argument("--offline", action="store_true", help="local datasets only (no HIBP)")
+    triage_parser.add_argument("--output", help="CSV path (default data/exports/triage-<date>.csv)")
+    triage_parser.set_defaults(func=triage)
+
+    preview_parser = commands.add_parser("preview", help="estimate a run's results, cost and duration from a sample")
+    preview_parser.add_argument("--sample", type=int, default=PREVIEW_SAMPLE_SIZE,
+                                help="domains to enrich (stratified by source, year and country)")
+    preview_parser.add_argument("--seed", type=int, help="random seed, for a repeatable sample")
+    preview_parser.add_argument("--hibp-only", action="store_true", help="skip the sources.yaml sources")
+    preview_parser.add_argument("--budget", type=int, default=APOLLO_DOMAIN_BUDGET,
+                                help="domains the full run would enrich (default: all)")
+    preview_parser.set_defaults(func=preview)
+
+    serve_parser = commands.add_parser("serve", help="run the local enrichment API")
+    serve_parser.add_argument("--host", default=SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    serve_parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    serve_parser.set_defaults(func=serve)
+
+    replay_parser = commands.add_parser("replay", help="replay a recorded run for benchmarking")
+    replay_parser.add_argument("cassette", help="cassette written by run --record")
+    replay_parser.add_argument("--fast", action="store_true",
+                               help="serve responses immediately instead of with their recorded latency")
+    add_profile_arguments(replay_parser)
+    replay_parser.set_defaults(func=replay)
+
+    history_parser = commands.add_parser("history", help="query the local enrichment history")
+    history_parser.add_argument("--region", help="AMER, LATAM, EMEA or APAC")
+    history_parser.add_argument("--cdn", help="CDN name (substring match)")
+    history_parser.add_argument("--security", help="exact WAF value, e.g. None for no WAF")
+    history_parser.add_argument("--days", type=int, help="only runs from the last N days")
+    history_parser.set_defaults(func=history)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    argv = list(argv if argv is not None else sys.argv[1:])
+    # `run` is the default command, so `scraper.py --hibp-only` still works; argparse would
+    # reject run's options before a missing command could be noticed
+    commands = next(a for a in parser._actions if isinstance(a, argparse._SubParsersAction)).choices
+    if not argv or (argv[0] not in commands and argv[0] not in ("-h", "--help")):
+        argv = ["run"] + argv
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
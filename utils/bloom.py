@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"CBLOOM1\n"
+_HEADER = struct.Struct("<QIQd")  # bits, hash count, items, created
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives, false positives at
+    roughly `error_rate` once `capacity` distinct items were added"""
+
+    def __init__(self, capacity: int, error_rate: float, created: Optional[float] = None,
+                 num_bits: Optional[int] = None, num_hashes: Optional[int] = None,
+                 bits: Optional[bytearray] = None, count: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits or max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = num_hashes or max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+        self.created = time.time() if created is None else created
+
+    def _positions(self, key: str):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str) -> bool:
+        """Add the key; False if it was (probably) already present"""
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current number of items"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+
+class RotatingBloomFilter:
+    """Two-generation Bloom filter that forgets old entries.
+
+    Lookups check both generations; new keys go into the current one. Once the current
+    generation is `rotate_after` seconds old (or full) it becomes the previous one and the
+    old previous generation is dropped, so an entry lives between one and two rotation
+    periods. Persisted to `path` (atomically replaced on save) when one is given.
+    """
+
+    def __init__(self, path: Optional[Path] = None, capacity: int = 1000000,
+                 error_rate: float = 0.01, rotate_after: float = 30 * 86400):
+        self.path = Path(path) if path else None
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_after = rotate_after
+        self._lock = threading.Lock()
+        self.current = self._new()
+        self.previous: Optional[BloomFilter] = None
+        if self.path and self.path.exists():
+            try:
+                self._load()
+            except (OSError, ValueError, struct.error) as e:
+                logger.error(f"Could not load Bloom filter {self.path} ({e}); starting empty")
+                self.current, self.previous = self._new(), None
+
+    def _new(self) -> BloomFilter:
+        return BloomFilter(self.capacity, self.error_rate)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or (self.previous is not None and key in self.previous)
+
+    def __len__(self):
+        return self.current.count + (self.previous.count if self.previous else 0)
+
+    def add(self, key: str) -> bool:
+        with self._lock:
+            self._maybe_rotate()
+            # Keys already in the previous generation are re-added too, so entries that
+            # keep being added survive the next rotation
+            known = self.previous is not None and key in self.previous
+            return self.current.add(key) and not known
+
+    def _maybe_rotate(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        age = now - self.current.created
+        if age >= self.rotate_after or self.current.count >= self.capacity:
+            # A generation unused for two periods (e.g. a file from long ago) is dropped outright
+            self.previous = self.current if age < 2 * self.rotate_after else None
+            self.current = self._new()
+
+    def rotate_if_due(self):
+        with self._lock:
+            self._maybe_rotate()
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate of a lookup (either generation matching)"""
+        rate = self.current.false_positive_rate()
+        if self.previous is not None:
+            rate = 1 - (1 - rate) * (1 - self.previous.false_positive_rate())
+        return rate
+
+    @property
+    def size_bytes(self) -> int:
+        return self.current.size_bytes + (self.previous.size_bytes if self.previous else 0)
+
+    def save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with self._lock, open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            for generation in (self.current, self.previous):
+                if generation is None:
+                    f.write(_HEADER.pack(0, 0, 0, 0.0))
+                    continue
+                f.write(_HEADER.pack(generation.num_bits, generation.num_hashes,
+                                     generation.count, generation.created))
+                f.write(generation.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{self.path} is not a Bloom filter file")
+            generations = []
+            for _ in range(2):
+                num_bits, num_hashes, count, created = _HEADER.unpack(f.read(_HEADER.size))
+                if not num_bits:
+                    generations.append(None)
+                    continue
+                bits = bytearray(f.read((num_bits + 7) // 8))
+                if len(bits) != (num_bits + 7) // 8:
+                    raise ValueError(f"{self.path} is truncated")
+                generations.append(BloomFilter(self.capacity, self.error_rate, created=created,
+                                               num_bits=num_bits, num_hashes=num_hashes,
+                                               bits=bits, count=count))
+        self.current, self.previous = generations
+        self.rotate_if_due()
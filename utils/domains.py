@@ -0,0 +1,129 @@
+import ipaddress
+import logging
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from config.settings import PUBLIC_SUFFIX_FILE, DOMAIN_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_PATH_RE = re.compile(r"[/?#\\]")
+_rules = None
+_rules_lock = threading.Lock()
+
+
+class _SuffixRules:
+    """Public suffix list rules: plain suffixes, wildcard parents (*.ck -> "ck") and exceptions"""
+
+    def __init__(self, lines: Iterable[str]):
+        self.exact, self.wildcards, self.exceptions = set(), set(), set()
+        for line in lines:
+            rule = line.strip().split(" ", 1)[0].lower()
+            if not rule or rule.startswith("//"):
+                continue
+            for form in {rule, _ascii(rule)}:
+                if form.startswith("!"):
+                    self.exceptions.add(form[1:])
+                elif form.startswith("*."):
+                    self.wildcards.add(form[2:])
+                else:
+                    self.exact.add(form)
+
+    def suffix_length(self, labels: List[str]) -> int:
+        """Number of trailing labels that form the public suffix (longest matching rule)"""
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                return len(labels) - i - 1
+            if candidate in self.exact or ".".join(labels[i + 1:]) in self.wildcards:
+                return len(labels) - i
+        return 1  # implicit "*" rule: an unlisted TLD
+
+
+def _ascii(rule: str) -> str:
+    """Punycode form of an internationalized rule (hosts usually arrive that way)"""
+    prefix = rule[:1] if rule[:1] == "!" else ""
+    try:
+        return prefix + rule[len(prefix):].encode("idna").decode("ascii")
+    except UnicodeError:
+        return rule
+
+
+def get_suffix_rules() -> _SuffixRules:
+    """Rules from the bundled public suffix list, parsed on first use"""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                try:
+                    with open(PUBLIC_SUFFIX_FILE, encoding="utf-8") as f:
+                        _rules = _SuffixRules(f)
+                except OSError as e:
+                    logger.error(f"Public suffix list unavailable ({e}); using the last two labels")
+                    _rules = _SuffixRules([])
+    return _rules
+
+
+def clean_host(value: str) -> str:
+    """Bare lowercase host of a URL or host string: no scheme, credentials, port, path or trailing dot"""
+    value = str(value).strip().lower()
+    if "://" in value:
+        value = value.split("://", 1)[1]
+    host = _PATH_RE.split(value, 1)[0].rsplit("@", 1)[-1]
+    if host.startswith("["):  # [IPv6]:port
+        return host[1:host.find("]")] if "]" in host else host[1:]
+    return host.split(":", 1)[0].strip(".")
+
+
+def split_hosts(value: str) -> List[str]:
+    """Cleaned hosts of a comma-separated organizations/website field"""
+    return [host for host in (clean_host(part) for part in str(value).split(",")) if host]
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def registrable_domain(value: str) -> str:
+    """Registrable domain (public suffix + one label) of a URL or host:
+    https://www.shop.acme.co.uk:443/x -> acme.co.uk. IPs and bare suffixes come back as the host."""
+    host = clean_host(value)
+    if not host or _is_ip(host):
+        return host
+    labels = host.split(".")
+    suffix = get_suffix_rules().suffix_length(labels)
+    if suffix >= len(labels):
+        return host
+    return ".".join(labels[-suffix - 1:])
+
+
+def public_suffix(value: str) -> str:
+    host = clean_host(value)
+    labels = host.split(".")
+    return ".".join(labels[-get_suffix_rules().suffix_length(labels):])
+
+
+def primary_domain(value: str) -> Optional[str]:
+    """Registrable domain of the first host in a comma-separated field (None if there is none)"""
+    hosts = split_hosts(value)
+    return registrable_domain(hosts[0]) if hosts else None
+
+
+def group_by_registrable(values: Iterable[str]) -> Dict[str, List[str]]:
+    """{registrable domain: [inputs that belong to it]}, in first-seen order.
+
+    Company-level lookups run once per key; fan the result back out to every input.
+    """
+    groups: Dict[str, List[str]] = {}
+    for value in values:
+        key = registrable_domain(value)
+        if key:
+            groups.setdefault(key, []).append(value)
+    return groups
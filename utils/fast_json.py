@@ -0,0 +1,54 @@
+import json
+import logging
+from typing import Any, Dict, Optional, Union
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# msgspec decodes straight into a schema and skips unknown fields; orjson is a faster
+# full decode; the stdlib is the last resort
+BACKEND = "msgspec" if msgspec is not None else "orjson" if orjson is not None else "json"
+PROJECTS = msgspec is not None  # whether a schema actually limits what gets built
+
+_decoders: Dict[Any, Any] = {}
+
+
+def _decode_all(data: Union[bytes, str]) -> Any:
+    if msgspec is not None:
+        return msgspec.json.decode(data)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def loads(data: Union[bytes, str], schema: Optional[Any] = None) -> Any:
+    """Decode JSON, materializing only the fields of `schema` (a TypedDict / List[...] from
+    models.responses) when msgspec is installed. The result is plain dicts and lists either
+    way, so callers don't depend on the backend. Raises ValueError on invalid JSON."""
+    if msgspec is None or schema is None:
+        try:
+            return _decode_all(data)
+        except Exception as e:
+            if isinstance(e, ValueError):
+                raise
+            raise ValueError(str(e)) from e
+
+    decoder = _decoders.get(schema)
+    if decoder is None:
+        decoder = _decoders.setdefault(schema, msgspec.json.Decoder(schema))
+    try:
+        return decoder.decode(data)
+    except msgspec.ValidationError as e:
+        # Valid JSON that doesn't fit the schema (a vendor changed a type): take it all
+        logger.debug(f"Response doesn't match {getattr(schema, '__name__', schema)} ({e}); decoding in full")
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
@@ -0,0 +1,251 @@
+import atexit
+import base64
+import gzip
+import hashlib
+import io
+import json
+import logging
+import socket
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+# Query parameters and response headers that must never reach a cassette file
+SECRET_PARAMS = {"token", "api_key", "apikey", "key", "hibp-api-key", "x-api-key"}
+DROPPED_HEADERS = {"set-cookie", "x-api-key", "hibp-api-key", "authorization"}
+REDACTED = "REDACTED"
+
+_CALL_ERRORS = {
+    "gaierror": socket.gaierror,
+    "herror": socket.herror,
+    "timeout": socket.timeout,
+}
+
+
+def scrub_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(k, REDACTED if k.lower() in SECRET_PARAMS else v)
+             for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def _body_hash(body) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha1(body).hexdigest()[:16]
+
+
+class Cassette:
+    """Records outbound HTTP requests, DNS lookups and WAF scans with their latency, and
+    replays them later either at the recorded pace or at full speed.
+
+    Entries are stored as gzip'd JSON lines. API keys are scrubbed from URLs and
+    credential headers are never written; replay matching uses the scrubbed URL, so a
+    cassette recorded with one key replays with any other.
+    """
+
+    def __init__(self, path: Path, mode: str, realtime: bool = True):
+        self.path = Path(path)
+        self.mode = mode
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        self._entries = []
+        self._pending: Dict[str, deque] = defaultdict(deque)
+        self._last: Dict[str, Dict] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "missing": 0}
+        self.meta: Dict = {}  # run arguments, so a replay repeats the recorded run
+        if mode == REPLAY:
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["key"] == "meta":
+                    self.meta = entry["meta"]
+                    continue
+                self._pending[entry["key"]].append(entry)
+        logger.info(f"Loaded cassette {self.path} ({sum(len(q) for q in self._pending.values())} entries)")
+
+    def save(self):
+        if self.mode != RECORD:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"key": "meta", "meta": self.meta}) + "\n")
+            for entry in self._entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        logger.info(f"Saved {len(self._entries)} entries to cassette {self.path}")
+
+    def _add(self, entry: Dict):
+        with self._lock:
+            self._entries.append(entry)
+            self.stats["recorded"] += 1
+
+    def _take(self, key: str) -> Optional[Dict]:
+        """Next recorded entry for the key; repeats the last one if the run asks more often than recorded"""
+        with self._lock:
+            queue = self._pending.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            else:
+                entry = self._last.get(key)
+            self.stats["replayed" if entry else "missing"] += 1
+        if entry and self.realtime:
+            time.sleep(entry["elapsed"])
+        return entry
+
+    # --- HTTP ---
+
+    def http_key(self, request: requests.PreparedRequest) -> str:
+        return f"http {request.method} {scrub_url(request.url)} {_body_hash(request.body)}"
+
+    def record_response(self, request: requests.PreparedRequest, response: requests.Response, elapsed: float):
+        self._add({
+            "key": self.http_key(request),
+            "elapsed": round(elapsed, 4),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS},
+            "body": base64.b64encode(response.content).decode("ascii"),
+        })
+
+    def replay_response(self, request: requests.PreparedRequest) -> requests.Response:
+        entry = self._take(self.http_key(request))
+        if entry is None:
+            raise requests.ConnectionError(f"No recorded response for {request.method} {scrub_url(request.url)}")
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.headers.pop("Content-Encoding", None)  # body was stored decoded
+        response.raw = io.BytesIO(base64.b64decode(entry["body"]))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=entry["elapsed"])
+        return response
+
+    # --- non-HTTP calls (DNS, wafw00f) ---
+
+    def wrap_call(self, kind: str, fn: Callable) -> Callable:
+        """Record/replay a function by its arguments"""
+        def wrapper(*args, **kwargs):
+            key = f"{kind} {json.dumps([args, kwargs], default=str, sort_keys=True)}"
+            if self.mode == REPLAY:
+                entry = self._take(key)
+                if entry is None:
+                    raise socket.gaierror(f"No recorded {kind} result for {args}")
+                if "error" in entry:
+                    raise _CALL_ERRORS.get(entry["error"], RuntimeError)(entry["message"])
+                return _from_json(entry["result"])
+
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._add({"key": key, "elapsed": round(time.perf_counter() - start, 4),
+                           "error": type(e).__name__, "message": str(e)})
+                raise
+            self._add({"key": key, "elapsed": round(time.perf_counter() - start, 4),
+                       "result": _to_json(result)})
+            return result
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+
+def _to_json(value):
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, int):  # also AddressFamily/SocketKind enums
+        return int(value)
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, list):
+        return tuple(_from_json(v) for v in value) if value and not isinstance(value[0], list) else [_from_json(v) for v in value]
+    return value
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter that records through the real adapter or serves from the cassette"""
+
+    def __init__(self, cassette: Cassette, real: HTTPAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.real = real
+
+    def send(self, request, **kwargs):
+        if self.cassette.mode == REPLAY:
+            return self.cassette.replay_response(request)
+        start = time.perf_counter()
+        response = self.real.send(request, **kwargs)
+        _ = response.content  # read the body now so it can be stored (and re-read by the caller)
+        self.cassette.record_response(request, response, time.perf_counter() - start)
+        return response
+
+    def close(self):
+        self.real.close()
+
+
+_sessions = weakref.WeakSet()
+_active: Optional[Cassette] = None
+
+
+def _attach(cassette: Cassette, session: requests.Session):
+    for prefix in ("https://", "http://"):
+        real = session.adapters.get(prefix) or HTTPAdapter()
+        if isinstance(real, CassetteAdapter):
+            real = real.real
+        session.mount(prefix, CassetteAdapter(cassette, real))
+
+
+def register_session(session: requests.Session) -> requests.Session:
+    """Sessions register at creation so an installed cassette covers them"""
+    _sessions.add(session)
+    if _active is not None:
+        _attach(_active, session)
+    return session
+
+
+def install(path: Path, mode: str, realtime: bool = True) -> Cassette:
+    """Route every registered session and DNS lookup through a cassette for this process"""
+    global _active
+    cassette = Cassette(path, mode, realtime)
+    _active = cassette
+    for session in list(_sessions):
+        _attach(cassette, session)
+
+    socket.gethostbyname = cassette.wrap_call("dns", getattr(socket.gethostbyname, "__wrapped__", socket.gethostbyname))
+    socket.getaddrinfo = cassette.wrap_call("dns6", getattr(socket.getaddrinfo, "__wrapped__", socket.getaddrinfo))
+    socket.gethostbyname_ex = cassette.wrap_call(
+        "dns_ex", getattr(socket.gethostbyname_ex, "__wrapped__", socket.gethostbyname_ex))
+
+    if mode == RECORD:
+        atexit.register(cassette.save)
+    logger.info(f"Cassette {mode} mode: {path}")
+    return cassette
+
+
+def get_active() -> Optional[Cassette]:
+    return _active
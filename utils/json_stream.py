@@ -0,0 +1,64 @@
+import codecs
+import json
+from typing import Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_TAIL = set("0123456789+-.eE" + _WHITESPACE)
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """Yield the elements of a top-level JSON array as its bytes arrive.
+
+    Only the current element and the unparsed tail of the buffer are held in memory,
+    so callers can filter a large response (e.g. the HIBP catalogue) without
+    materializing the whole list.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    started = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buffer):
+                break
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element is split across chunks - wait for more data
+                break
+            if buffer[pos] not in '{["':
+                # A number may go on in the next chunk ("12" + "34", "1.5e" + "3"): only
+                # accept a scalar once the "," or "]" after it has arrived
+                if all(c in _NUMBER_TAIL for c in buffer[end:]):
+                    break
+                after = end
+                while buffer[after] in _WHITESPACE:
+                    after += 1
+                if buffer[after] not in ",]":
+                    raise ValueError(f"Unexpected {buffer[after]!r} after array element")
+            yield item
+            pos = end
+
+    raise ValueError("Truncated JSON array")
@@ -0,0 +1,201 @@
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config.settings import PROFILE_DIR, PROFILE_TOP_N, PROFILE_SAMPLE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+CPU_MODES = ("cprofile", "sample")
+
+# Frames where idle pool workers park; samples ending here aren't CPU work
+_IDLE_FILES = ("threading.py", "queue.py", "concurrent/futures/thread.py", "selectors.py")
+
+# Allocations made by tracemalloc/the import system itself; skipped when listing allocators.
+# Matching them after compare_to() is much cheaper than Snapshot.filter_traces().
+_SKIP_ALLOCATOR_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>",
+                         "<frozen importlib._bootstrap_external>")
+
+
+class _Sampler(threading.Thread):
+    """Counts the innermost frame of every other thread each interval.
+
+    cProfile only sees the thread that enabled it, while enrichment runs in worker
+    pools; sampling sys._current_frames() covers all of them.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="stage-sampler", daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                self.samples[f"{code.co_filename}:{frame.f_lineno}({code.co_name})"] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+class StageStats:
+    __slots__ = ("name", "seconds", "peak", "growth", "allocators", "hot_functions", "cprofile")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.peak = 0  # bytes traced at the stage's high-water mark
+        self.growth = 0  # bytes still held at the end of the stage
+        self.allocators: List[str] = []
+        self.hot_functions: List[str] = []
+        self.cprofile: Optional[pstats.Stats] = None
+
+
+class StageProfiler:
+    """Per-stage wall time, peak memory, top allocators and (optionally) hottest functions.
+
+    Disabled profilers cost nothing, so pipeline code always wraps its stages:
+
+        with profiler.stage("enrich_orgs"):
+            ...
+
+    Memory comes from tracemalloc snapshots at each stage boundary. `cpu` adds either a
+    cProfile of the calling thread ("cprofile") or a sampling profile of every thread
+    ("sample").
+    """
+
+    def __init__(self, enabled: bool = False, cpu: Optional[str] = None, top: int = PROFILE_TOP_N,
+                 sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        if cpu not in (None,) + CPU_MODES:
+            raise ValueError(f"Unknown CPU profiling mode: {cpu}")
+        self.enabled = enabled
+        self.cpu = cpu
+        self.top = top
+        self.sample_interval = sample_interval
+        self.stages: List[StageStats] = []
+        self.domain_count = 0
+        self._started_tracing = False
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        self.start()
+
+        stats = StageStats(name)
+        before = tracemalloc.take_snapshot()
+        start_current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile() if self.cpu == "cprofile" else None
+        sampler = _Sampler(self.sample_interval) if self.cpu == "sample" else None
+        if profile:
+            profile.enable()
+        if sampler:
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.seconds = time.perf_counter() - start
+            if profile:
+                profile.disable()
+                stats.cprofile = pstats.Stats(profile)
+                stats.hot_functions = self._top_cprofile(stats.cprofile)
+            if sampler:
+                stats.hot_functions = [f"{count:>6} samples  {where}"
+                                       for where, count in sampler.stop().most_common(self.top)]
+
+            current, peak = tracemalloc.get_traced_memory()
+            stats.peak = peak
+            stats.growth = current - start_current
+            diffs = tracemalloc.take_snapshot().compare_to(before, "lineno")
+            diffs = (d for d in diffs if d.traceback[0].filename not in _SKIP_ALLOCATOR_FILES)
+            stats.allocators = [str(d) for _, d in zip(range(self.top), diffs)]
+            self.stages.append(stats)
+            logger.info(f"[Profile] {name}: {stats.seconds:.2f}s, peak {stats.peak / 2**20:.1f} MB, "
+                        f"held {stats.growth / 2**20:+.1f} MB")
+
+    def _top_cprofile(self, stats: pstats.Stats) -> List[str]:
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(self.top)
+        lines = out.getvalue().splitlines()
+        # Keep the table only (header row onwards)
+        for i, line in enumerate(lines):
+            if line.lstrip().startswith("ncalls"):
+                return [l for l in lines[i:] if l.strip()]
+        return lines
+
+    @property
+    def peak(self) -> int:
+        return max((s.peak for s in self.stages), default=0)
+
+    def peak_mb_per_1k_domains(self) -> float:
+        """Peak MB scaled to 1k domains; smaller runs count as 1k so fixed costs don't dominate"""
+        return self.peak / 2**20 / max(self.domain_count, 1000) * 1000
+
+    def summary(self) -> str:
+        lines = [f"Profile: {len(self.stages)} stages, {self.domain_count} domains, "
+                 f"peak {self.peak / 2**20:.1f} MB ({self.peak_mb_per_1k_domains():.1f} MB per 1k domains)",
+                 "",
+                 f"{'Stage':<18} | {'Seconds':>8} | {'Peak MB':>8} | {'Held MB':>8}",
+                 "-" * 52]
+        for s in self.stages:
+            lines.append(f"{s.name:<18} | {s.seconds:>8.2f} | {s.peak / 2**20:>8.1f} | {s.growth / 2**20:>+8.1f}")
+        for s in self.stages:
+            lines += ["", f"== {s.name}: top allocators (growth over the stage) =="] + s.allocators
+            if s.hot_functions:
+                lines += ["", f"== {s.name}: hottest functions ({self.cpu}) =="] + s.hot_functions
+        return "\n".join(lines)
+
+    def write(self, directory: Path = PROFILE_DIR) -> Path:
+        """Write the summary (and cProfile dumps, if any) under `directory`; returns the summary path"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = directory / f"profile-{stamp}.txt"
+        path.write_text(self.summary() + "\n")
+        for s in self.stages:
+            if s.cprofile:
+                s.cprofile.dump_stats(str(directory / f"profile-{stamp}-{s.name}.pstats"))
+        logger.info(f"Profile summary written to {path}")
+        return path
+
+    def check_peak(self, max_mb_per_1k_domains: Optional[float]) -> Dict:
+        """Regression check: {"ok", "peak_mb_per_1k", "limit"}; ok when no limit is set"""
+        value = self.peak_mb_per_1k_domains()
+        ok = max_mb_per_1k_domains is None or value <= max_mb_per_1k_domains
+        if not ok:
+            logger.error(f"[Profile] Peak memory {value:.1f} MB per 1k domains exceeds the "
+                         f"{max_mb_per_1k_domains} MB limit")
+        return {"ok": ok, "peak_mb_per_1k": value, "limit": max_mb_per_1k_domains}
@@ -0,0 +1,220 @@
+import atexit
+import calendar
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config.settings import (
+    QUOTA_LIMITS, QUOTA_LEDGER_FILE, QUOTA_FLUSH_INTERVAL, QUOTA_FLUSH_EVERY, API_CALLS_PER_DOMAIN
+)
+
+logger = logging.getLogger(__name__)
+
+KEEP_DAYS = 40
+KEEP_MONTHS = 13
+
+
+class QuotaLedger:
+    """Persistent per-vendor credit counts by day and month, shared by every run.
+
+    Counts are kept in memory and flushed every QUOTA_FLUSH_INTERVAL seconds or
+    QUOTA_FLUSH_EVERY credits, and at exit. A flush takes an exclusive file lock, re-reads
+    the ledger, adds this process's new credits and atomically replaces the file, so
+    concurrent cron runs never lose counts. Reads re-read the file once the snapshot is
+    older than QUOTA_FLUSH_INTERVAL, so a long-lived daemon or service sees other
+    processes' usage at most that stale. reserve() checks the cap and counts the credit in one
+    step, so concurrent callers can't all pass the check before any of them is counted.
+    Limits come from QUOTA_LIMITS; a service with no limit is only counted.
+    """
+
+    def __init__(self, path: Path = QUOTA_LEDGER_FILE, limits: Dict[str, Dict] = QUOTA_LIMITS,
+                 flush_interval: float = QUOTA_FLUSH_INTERVAL, flush_every: int = QUOTA_FLUSH_EVERY):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.limits = limits
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._thread_lock = threading.RLock()
+        self._snapshot: Optional[Dict] = None  # the file as of the last sync
+        self._pending: Dict[Tuple[str, str, str], int] = defaultdict(int)  # (service, period, key) -> credits
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _periods(now: Optional[datetime] = None) -> Dict[str, str]:
+        now = now or datetime.now()
+        return {"day": now.strftime("%Y-%m-%d"), "month": now.strftime("%Y-%m")}
+
+    @contextmanager
+    def _locked(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.error(f"Corrupt quota ledger at {self.path}; counts restart from zero")
+            return {}
+
+    def _write(self, data: Dict):
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """Add this process's unflushed credits to the ledger file"""
+        with self._thread_lock:
+            if self._pending:
+                self._sync()
+
+    def _sync(self):
+        """Merge pending credits into the file (if any) and refresh the snapshot from it"""
+        with self._thread_lock:
+            try:
+                with self._locked():
+                    data = self._read()
+                    for (service, period, key), count in self._pending.items():
+                        usage = data.setdefault(service, {"day": {}, "month": {}})
+                        usage[period][key] = usage[period].get(key, 0) + count
+                        # Drop old buckets so the file stays small
+                        keep = KEEP_DAYS if period == "day" else KEEP_MONTHS
+                        for old in sorted(usage[period])[:-keep]:
+                            del usage[period][old]
+                    if self._pending:
+                        self._write(data)
+            except OSError as e:
+                logger.error(f"[Quota] Could not update {self.path}: {e}")
+                self._last_flush = time.monotonic()  # retried on the next interval, not every call
+                if self._snapshot is None:
+                    self._snapshot = {}
+                return
+            self._snapshot = data
+            self._pending.clear()
+            self._last_flush = time.monotonic()
+
+    def _maybe_flush(self):
+        if (time.monotonic() - self._last_flush >= self.flush_interval
+                or sum(self._pending.values()) >= self.flush_every):
+            self.flush()
+
+    def _add(self, service: str, count: int):
+        for period, key in self._periods().items():
+            self._pending[(service, period, key)] += count
+
+    def record(self, service: str, count: int = 1):
+        """Add `count` credits used by `service` to today's and this month's totals"""
+        with self._thread_lock:
+            self._add(service, count)
+            self._maybe_flush()
+
+    def reserve(self, service: str, count: int = 1) -> bool:
+        """Count `count` credits if they fit under the caps; False (nothing counted) if not"""
+        with self._thread_lock:
+            if not self.allow(service, count):
+                return False
+            self._add(service, count)
+            self._maybe_flush()
+            return True
+
+    def release(self, service: str, count: int = 1):
+        """Give back reserved credits the vendor didn't charge (the request failed or was refused)"""
+        self.record(service, -count)
+
+    def used(self, service: str, period: str = "day") -> int:
+        with self._thread_lock:
+            if self._snapshot is None or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._sync()
+            key = self._periods()[period]
+            stored = (self._snapshot or {}).get(service, {}).get(period, {}).get(key, 0)
+            return stored + self._pending.get((service, period, key), 0)
+
+    def remaining(self, service: str, period: Optional[str] = None) -> Optional[int]:
+        """Credits left before the tightest cap (or the given period's cap); None if uncapped"""
+        limits = self.limits.get(service, {})
+        left = []
+        for p in ([period] if period else ("day", "month")):
+            if limits.get(p) is not None:
+                left.append(limits[p] - self.used(service, p))
+        return max(0, min(left)) if left else None
+
+    def allow(self, service: str, count: int = 1) -> bool:
+        """False once using `count` more credits would cross a hard cap (check only; see reserve)"""
+        remaining = self.remaining(service)
+        if remaining is not None and remaining < count:
+            logger.warning(f"[Quota] {service} cap reached ({self.limits.get(service)}); skipping call")
+            return False
+        return True
+
+    def daily_allowance(self, service: str) -> Optional[int]:
+        """Credits this run may spend: today's remaining cap, and the month's remainder spread
+        evenly over the days left so early runs can't starve the end of the month"""
+        allowances = []
+        day_left = self.remaining(service, "day")
+        if day_left is not None:
+            allowances.append(day_left)
+        month_left = self.remaining(service, "month")
+        if month_left is not None:
+            now = datetime.now()
+            days_left = calendar.monthrange(now.year, now.month)[1] - now.day + 1
+            allowances.append(month_left // days_left + (month_left % days_left > 0))
+        return min(allowances) if allowances else None
+
+    def plan_run(self, domain_count: int, cache_hit_rates: Optional[Dict[str, float]] = None) -> Dict:
+        """Estimate a run's cost and how many domains fit within today's allowance.
+
+        Returns {"max_domains", "estimated", "allowance", "limited_by"}; max_domains is None
+        when no capped service constrains the run.
+        """
+        cache_hit_rates = cache_hit_rates or {}
+        estimated, allowance = {}, {}
+        max_domains, limited_by = None, None
+
+        for service, per_domain in API_CALLS_PER_DOMAIN.items():
+            cost = per_domain * (1 - cache_hit_rates.get(service, 0.0))
+            estimated[service] = round(cost * domain_count)
+            allowance[service] = self.daily_allowance(service)
+            if allowance[service] is None or cost <= 0:
+                continue
+            fits = int(allowance[service] // cost)
+            if max_domains is None or fits < max_domains:
+                max_domains, limited_by = fits, service
+
+        if max_domains is not None and max_domains >= domain_count:
+            max_domains = None
+        plan = {"max_domains": max_domains, "estimated": estimated, "allowance": allowance,
+                "limited_by": limited_by}
+        if max_domains is not None:
+            logger.warning(f"[Quota] {domain_count} domains need ~{estimated[limited_by]} {limited_by} "
+                           f"credits but only {allowance[limited_by]} are available today; "
+                           f"limiting this run to {max_domains} domains")
+        return plan
+
+
+_ledger = None
+
+
+def get_ledger() -> QuotaLedger:
+    global _ledger
+    if _ledger is None:
+        _ledger = QuotaLedger()
+    return _ledger
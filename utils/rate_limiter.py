@@ -1,42 +1,63 @@
+import threading
 import time
 import requests
 from collections import defaultdict
 from config.settings import RATE_LIMITS  # Ensure this is imported from the correct config
 import logging
 
-logging.basicConfig(level=logging.WARNING)  # You can adjust the level as needed
-logger = logging.getLogger(__name__)  # You can name your logger if necessary
+logger = logging.getLogger(__name__)
 
 class RateLimiter:
     def __init__(self):
         self.counts = defaultdict(int)
         self.last_reset = time.time()
+        self._lock = threading.Lock()
 
-    def check_limit(self, service: str) -> bool:
-        """Check if the rate limit is exceeded for the given service."""
-        current_time = time.time()
+    # Seconds a caller waits after being refused, before giving up on the request
+    REFUSED_DELAY = 10
+
+    def try_acquire(self, service: str) -> bool:
+        """Count one request against this minute's limit; False (without waiting) if it is used up"""
+        with self._lock:
+            current_time = time.time()
+
+            # Reset count every minute
+            if current_time - self.last_reset > 60:
+                self.counts.clear()
+                self.last_reset = current_time
 
-        # Reset count every minute
-        if current_time - self.last_reset > 60:  
-            self.counts.clear()
-            self.last_reset = current_time
+            # Check if rate limit exceeded for the service
+            if self.counts[service] >= RATE_LIMITS.get(service, 10):
+                return False
 
-        # Check if rate limit exceeded for the service
-        if self.counts[service] >= RATE_LIMITS.get(service, 10):
-            time.sleep(10)  # Sleep for 10 seconds to prevent exceeding the limit
+            self.counts[service] += 1
+            return True
+
+    def seconds_until_reset(self) -> float:
+        """Time left in the current one-minute window"""
+        return max(0.0, self.last_reset + 60 - time.time())
+
+    def check_limit(self, service: str) -> bool:
+        """Check if the rate limit is exceeded for the given service."""
+        if not self.try_acquire(service):
+            time.sleep(self.REFUSED_DELAY)  # Sleep for 10 seconds to prevent exceeding the limit
             return False
-        
-        self.counts[service] += 1
         return True
 
-    def check_rate_limits(self, response_headers):
-        """Check the remaining rate limit and delay if necessary."""
+    def rate_limit_delay(self, response_headers) -> float:
+        """Seconds to wait before the next request, from the vendor's rate-limit headers"""
         remaining_requests = int(response_headers.get('x-minute-requests-left', 0))
         
         if remaining_requests < 10:  # If fewer than 10 requests left in the minute
             reset_time = int(response_headers.get('x-rate-limit-reset', time.time()))  # When limit resets
-            sleep_time = reset_time - time.time() + 1  # Sleep until the reset time
-            time.sleep(sleep_time)
+            return max(0.0, reset_time - time.time() + 1)  # Sleep until the reset time
+        return 0.0
+
+    def check_rate_limits(self, response_headers):
+        """Check the remaining rate limit and delay if necessary."""
+        delay = self.rate_limit_delay(response_headers)
+        if delay:
+            time.sleep(delay)
 
     def enrich_website_with_apollo(self, website: str):
         """Enrich the website with Apollo data, considering rate limits."""